@@ -0,0 +1,213 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import urllib.parse
+from download_engine import (
+    DownloadEngine, DEFAULT_MAX_SCROLLS, DEFAULT_CRAWL_PAGES, CRAWL_SCOPE_HOST, CRAWL_SCOPE_PREFIX,
+    MAX_CONNECTIONS_PER_HOST, AUTO_MAX_CONCURRENCY, is_downloadable_link, get_chrome_version
+)
+
+# Códigos de saída
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+def parse_args(argv=None):
+    """Lê os argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        description="Gerenciador de Downloads sem interface gráfica. Páginas são varridas em busca "
+                    "de links; URLs que já apontam para arquivos são baixadas diretamente. "
+                    "O progresso é impresso em JSON, um evento por linha."
+    )
+    parser.add_argument("urls", nargs="*", help="páginas ou arquivos a baixar")
+    parser.add_argument("-i", "--input", help="arquivo com uma URL por linha (- para a entrada padrão)")
+    parser.add_argument("-o", "--output", default=os.path.join(os.path.expanduser("~"), "Downloads"),
+                        help="pasta de destino (padrão: ~/Downloads)")
+    parser.add_argument("-j", "--concurrency", type=int, default=3, help="downloads simultâneos (padrão: 3)")
+    parser.add_argument("-s", "--segments", type=int, default=4, help="segmentos por arquivo (padrão: 4)")
+    parser.add_argument("--auto-concurrency", type=int, nargs="?", const=AUTO_MAX_CONCURRENCY, metavar="MAX",
+                        help="ajusta os downloads simultâneos pela vazão, partindo de -j e indo até MAX "
+                             f"(padrão: {AUTO_MAX_CONCURRENCY})")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="transfere em um laço asyncio, sem uma thread por download; indicado para "
+                             "milhares de arquivos pequenos (use com -j alto, ex.: -j 500)")
+    parser.add_argument("--sync", action="store_true",
+                        help="confere os arquivos já baixados com uma requisição condicional e baixa de novo só "
+                             "os que mudaram no servidor")
+    parser.add_argument("--per-host", type=int, default=MAX_CONNECTIONS_PER_HOST,
+                        help=f"conexões simultâneas por host (padrão: {MAX_CONNECTIONS_PER_HOST})")
+    parser.add_argument("--limit", type=int, default=0,
+                        help="limite de banda total em KB/s (padrão: 0, sem limite)")
+    parser.add_argument("--limit-per-download", type=int, default=0,
+                        help="limite de banda de cada download em KB/s (padrão: 0, sem limite)")
+    parser.add_argument("--limit-per-host", type=int, default=0,
+                        help="limite de banda de cada host em KB/s (padrão: 0, sem limite)")
+    parser.add_argument("--ext", help="extensões aceitas, separadas por vírgula (ex.: pdf,zip)")
+    parser.add_argument("--include", help="baixa apenas URLs que casam com esta expressão regular")
+    parser.add_argument("--exclude", help="ignora URLs que casam com esta expressão regular")
+    parser.add_argument("--max-scrolls", type=int, default=DEFAULT_MAX_SCROLLS,
+                        help=f"rolagens máximas por página (padrão: {DEFAULT_MAX_SCROLLS})")
+    parser.add_argument("--depth", type=int, default=0,
+                        help="profundidade do rastreamento a partir de cada página (padrão: 0, só a página)")
+    parser.add_argument("--max-pages", type=int, default=DEFAULT_CRAWL_PAGES,
+                        help=f"páginas máximas por rastreamento (padrão: {DEFAULT_CRAWL_PAGES})")
+    parser.add_argument("--scope", choices=(CRAWL_SCOPE_HOST, CRAWL_SCOPE_PREFIX), default=CRAWL_SCOPE_HOST,
+                        help="rastreia o host inteiro ou apenas abaixo do caminho inicial (padrão: host)")
+    parser.add_argument("--probe", action="store_true",
+                        help="consulta o tipo dos links sem extensão conhecida (ex.: /download?id=123)")
+    parser.add_argument("--checksums", help="arquivo ou URL com os SHA-256 publicados (formato do sha256sum); "
+                                            "arquivos que não conferem são apagados e contam como falha")
+    parser.add_argument("--fast-hash", action="store_true", help="grava também o CRC32 dos arquivos no histórico")
+    parser.add_argument("--rehash", action="store_true",
+                        help="antes dos downloads, calcula o hash dos arquivos do histórico que ainda não têm")
+    parser.add_argument("--no-browser", action="store_true",
+                        help="não usa o Chrome quando a transferência direta falha (automático se o Chrome "
+                             "não estiver instalado)")
+    parser.add_argument("--email", help="email para login nas páginas")
+    parser.add_argument("--password", default=os.environ.get("PYDOWNLOAD_PASSWORD"),
+                        help="senha para login (ou variável PYDOWNLOAD_PASSWORD)")
+    parser.add_argument("--dry-run", action="store_true", help="apenas lista os links encontrados")
+    parser.add_argument("--log-level", default="WARNING", help="nível do log na saída de erro (padrão: WARNING)")
+    args = parser.parse_args(argv)
+    if args.concurrency < 1 or args.segments < 1 or args.max_pages < 1 or args.per_host < 1:
+        parser.error("--concurrency, --segments, --per-host e --max-pages devem ser positivos")
+    if args.max_scrolls < 0 or args.depth < 0:
+        parser.error("--max-scrolls e --depth não podem ser negativos")
+    if args.auto_concurrency is not None and args.auto_concurrency < 1:
+        parser.error("--auto-concurrency deve ser positivo")
+    if args.limit < 0 or args.limit_per_download < 0 or args.limit_per_host < 0:
+        parser.error("os limites de banda não podem ser negativos")
+    return args
+
+def read_urls(args):
+    """Junta as URLs dos argumentos e do arquivo de entrada, sem repetições"""
+    urls = list(args.urls)
+    if args.input:
+        if args.input == "-":
+            urls.extend(sys.stdin.read().splitlines())
+        else:
+            with open(args.input, 'r', encoding='utf-8') as f:
+                urls.extend(f.read().splitlines())
+    urls = [url.strip() for url in urls]
+    # Linhas vazias e comentários são ignorados
+    return list(dict.fromkeys(url for url in urls if url and not url.startswith("#")))
+
+def build_filter(args):
+    """Cria a função que decide se um link deve ser baixado"""
+    extensions = None
+    if args.ext:
+        extensions = {"." + ext.strip().lower().lstrip(".") for ext in args.ext.split(",") if ext.strip()}
+    include = re.compile(args.include) if args.include else None
+    exclude = re.compile(args.exclude) if args.exclude else None
+
+    def accept(url, filename=None):
+        if extensions is not None:
+            # Links consultados com --probe podem ter o nome só no Content-Disposition
+            ext = os.path.splitext(filename or urllib.parse.urlparse(url).path)[1].lower()
+            if ext not in extensions:
+                return False
+        if include and not include.search(url):
+            return False
+        if exclude and exclude.search(url):
+            return False
+        return True
+    return accept
+
+class EventPrinter:
+    """Imprime os eventos do motor como JSON, uma linha por evento"""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+def main(argv=None):
+    """Executa um lote de downloads e retorna o código de saída"""
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper(), logging.WARNING),
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        stream=sys.stderr
+    )
+    try:
+        urls = read_urls(args)
+        accept = build_filter(args)
+    except (OSError, re.error) as e:
+        logging.error(f"Erro nos argumentos: {str(e)}")
+        return EXIT_USAGE
+    if not urls:
+        logging.error("Nenhuma URL informada")
+        return EXIT_USAGE
+
+    printer = EventPrinter()
+    browser_fallback = not args.no_browser
+    if browser_fallback and get_chrome_version() is None:
+        logging.warning("Chrome não encontrado; downloads diretos que falharem não serão repetidos pelo navegador")
+        browser_fallback = False
+    engine = DownloadEngine(os.path.abspath(args.output), on_event=printer, headless=True, probe_links=args.probe,
+                            fast_hash=args.fast_hash, browser_fallback=browser_fallback)
+    engine.set_bandwidth_limits(args.limit * 1024, args.limit_per_host * 1024, args.limit_per_download * 1024)
+    search_errors = 0
+    try:
+        engine.open_history()
+        if args.checksums:
+            try:
+                printer({"event": "checksums", "total": engine.load_checksums(args.checksums)})
+            except Exception as e:
+                logging.error(f"Erro ao carregar checksums de {args.checksums}: {str(e)}")
+                return EXIT_USAGE
+        if args.rehash:
+            for future in engine.rehash_existing():
+                future.result()
+        jobs = {}  # URL -> texto do link, na ordem em que foram encontrados
+        for url in urls:
+            if is_downloadable_link(url):
+                if accept(url):
+                    jobs.setdefault(url, None)
+                continue
+            try:
+                if args.depth > 0:
+                    links = engine.crawl(url, args.depth, args.max_pages, args.scope,
+                                         args.email, args.password, args.max_scrolls)
+                else:
+                    links = engine.search(url, args.email, args.password, args.max_scrolls)
+                for href, text in links:
+                    if accept(href, engine.filename_for(href)):
+                        jobs.setdefault(href, text)
+            except Exception as e:
+                search_errors += 1
+                logging.error(f"Erro ao buscar links em {url}: {str(e)}")
+                printer({"event": "error", "url": url, "message": str(e)})
+        printer({"event": "queued", "total": len(jobs)})
+
+        if args.dry_run:
+            for href, text in jobs.items():
+                printer({"event": "link", "url": href, "text": text})
+            return EXIT_FAILED if search_errors else EXIT_OK
+
+        downloaded, skipped, failed = engine.run_downloads(list(jobs.items()), args.concurrency, args.segments,
+                                                           args.per_host, args.auto_concurrency, args.use_async, args.sync)
+        if failed or search_errors:
+            return EXIT_FAILED
+        return EXIT_OK
+    except KeyboardInterrupt:
+        # Os arquivos parciais ficam com o diário para serem retomados na próxima execução
+        engine.stop()
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        logging.error(f"Erro durante downloads: {str(e)}")
+        return EXIT_FAILED
+    finally:
+        engine.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3807 @@
+import os
+import io
+import json
+from datetime import datetime
+import threading
+import time
+import uuid
+import sqlite3
+import sys
+import select
+import struct
+import ctypes
+import ctypes.util
+import re
+import hashlib
+import zlib
+import subprocess
+import http.client
+import http.cookiejar
+import ssl
+import weakref
+import urllib.request
+import urllib.error
+import urllib.parse
+import mimetypes
+import email.message
+import email.utils
+import codecs
+import collections
+import heapq
+import itertools
+import html.parser
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+import logging
+import queue
+import asyncio
+
+# O Selenium é importado sob demanda por load_selenium(), pois a importação
+# atrasa a abertura da janela
+webdriver = None
+By = None
+WebDriverWait = None
+EC = None
+Service = None
+Options = None
+
+# Cache do caminho do ChromeDriver por versão do Chrome
+DRIVER_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".gerenciador_downloads", "chromedriver_cache.json")
+
+# Lista de extensões comuns para download
+DOWNLOAD_EXTENSIONS = {'.pdf', '.zip', '.rar', '.doc', '.docx', '.xls', '.xlsx', '.mp3', '.mp4', '.avi', '.mov'}
+# Extrai href, texto, atributo download e type dos links ainda não extraídos,
+# em uma única chamada
+EXTRACT_LINKS_SCRIPT = """
+var seen = window.__pydlSeen = window.__pydlSeen || new WeakSet();
+return Array.from(document.querySelectorAll('a[href]')).filter(function (a) {
+    return !seen.has(a);
+}).map(function (a) {
+    seen.add(a);
+    return [
+        a.href,
+        (a.innerText || a.textContent || '').trim(),
+        a.hasAttribute('download') ? a.getAttribute('download') : null,
+        a.type || ''
+    ];
+});
+"""
+# Registra o horário da última alteração do DOM ou requisição de rede concluída
+INSTALL_SCROLL_OBSERVER_SCRIPT = """
+if (!window.__pydlScroll) {
+    var state = window.__pydlScroll = {lastChange: performance.now()};
+    var touch = function () { state.lastChange = performance.now(); };
+    new MutationObserver(touch).observe(document.body, {childList: true, subtree: true});
+    try {
+        new PerformanceObserver(touch).observe({entryTypes: ['resource']});
+    } catch (e) {}
+}
+return document.body.scrollHeight;
+"""
+# Rola até o fim e espera surgirem links novos ou a página ficar quieta
+SCROLL_AND_WAIT_SCRIPT = """
+var quietMs = arguments[0], limitMs = arguments[1], callback = arguments[arguments.length - 1];
+var state = window.__pydlScroll;
+var baseline = document.querySelectorAll('a[href]').length;
+var started = performance.now();
+state.lastChange = started;
+window.scrollTo(0, document.body.scrollHeight);
+(function check() {
+    var now = performance.now();
+    var grew = document.querySelectorAll('a[href]').length > baseline;
+    if (grew || now - state.lastChange >= quietMs || now - started >= limitMs) {
+        callback([grew, document.body.scrollHeight]);
+    } else {
+        setTimeout(check, 50);
+    }
+})();
+"""
+# Tempo sem alterações no DOM/rede para considerar que a rolagem não carregou nada (ms)
+SCROLL_QUIET_MS = 400
+# Tempo máximo de espera por rolagem (ms)
+SCROLL_WAIT_LIMIT_MS = 5000
+# Número padrão de rolagens antes de desistir de carregar mais conteúdo
+DEFAULT_MAX_SCROLLS = 50
+# Tamanho dos blocos lidos da rede em cada iteração
+CHUNK_SIZE = 64 * 1024
+# Intervalo mínimo entre notificações de progresso (segundos)
+PROGRESS_INTERVAL = 0.25
+# Tempo sem nenhum progresso na pasta antes de considerar um download do navegador perdido
+DOWNLOAD_IDLE_TIMEOUT = 60
+# Máscaras do inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+# Linhas do histórico inseridas na interface por ciclo do loop do Tk
+HISTORY_CHUNK_SIZE = 500
+# Downloads atendidos por uma instância do Chrome do pool antes de ser reciclada
+DRIVER_MAX_JOBS = 20
+# Menor faixa que vale a pena abrir em uma conexão separada
+MIN_SEGMENT_SIZE = 2 * 1024 * 1024
+# Tentativas por segmento antes de desistir do download
+SEGMENT_RETRIES = 3
+# Intervalo entre gravações do diário de downloads parciais (segundos)
+JOURNAL_INTERVAL = 1.0
+# Consultas de tipo (HEAD) simultâneas no total e por host
+PROBE_WORKERS = 16
+PROBE_PER_HOST = 4
+# Tempo limite de cada consulta de tipo (s)
+PROBE_TIMEOUT = 10
+# Por quanto tempo o resultado de uma consulta de tipo continua válido (s)
+PROBE_CACHE_TTL = 24 * 3600
+# Tipos que indicam uma página, e não um arquivo
+PAGE_CONTENT_TYPES = {"text/html", "application/xhtml+xml"}
+# Tipos de arquivo aceitos além dos que o mimetypes associa a DOWNLOAD_EXTENSIONS;
+# feeds, JSON, CSS, texto e imagens de navegação não são downloads
+FILE_CONTENT_TYPES = {
+    "application/octet-stream", "application/x-download", "application/force-download",
+    "application/x-rar-compressed", "application/x-zip-compressed", "application/x-7z-compressed",
+    "application/gzip", "application/x-gzip", "application/x-tar", "application/x-bzip2", "application/x-xz",
+    "application/x-msdownload", "application/x-iso9660-image", "application/vnd.android.package-archive"
+}
+# Conexões simultâneas por host (esquema, host e porta)
+MAX_CONNECTIONS_PER_HOST = 4
+# Conexões ociosas há mais tempo que isso são descartadas (s)
+POOL_IDLE_TIMEOUT = 30
+MAX_REDIRECTS = 10
+# Rajada máxima aceita pelos limites de banda, em segundos de transferência
+BANDWIDTH_BURST = 0.5
+# Intervalo entre as medições da taxa efetiva (s)
+RATE_INTERVAL = 1.0
+# Ajuste automático de downloads simultâneos: intervalo entre ajustes (s),
+# teto padrão e variação mínima da vazão considerada como ganho ou perda
+ADAPT_INTERVAL = 2.0
+AUTO_MAX_CONCURRENCY = 32
+ADAPT_TOLERANCE = 0.1
+# Respostas que indicam que o servidor pede menos conexões
+THROTTLE_STATUS = (429, 503)
+# Novas tentativas após essas respostas, espera inicial (dobra a cada vez) e espera máxima (s);
+# o Retry-After do servidor substitui a espera calculada
+THROTTLE_RETRIES = 3
+THROTTLE_BACKOFF = 2.0
+THROTTLE_MAX_DELAY = 60.0
+# Instâncias do Chrome abertas ao mesmo tempo para downloads pelo navegador
+MAX_BROWSER_DOWNLOADS = 10
+# Downloads simultâneos padrão no modo asyncio (uma tarefa por download, não uma thread)
+ASYNC_MAX_CONCURRENT = 256
+# Tamanho das leituras ao calcular o hash de arquivos já gravados
+HASH_READ_SIZE = 1024 * 1024
+# Reverificação em segundo plano dos arquivos do histórico: threads e leitura máxima (bytes/s)
+REHASH_WORKERS = 2
+REHASH_RATE = 50 * 1024 * 1024
+# Páginas buscadas em paralelo no modo de rastreamento
+CRAWL_WORKERS = 8
+DEFAULT_CRAWL_DEPTH = 2
+DEFAULT_CRAWL_PAGES = 100
+# Limites do rastreamento: mesmo host ou apenas abaixo do caminho inicial
+CRAWL_SCOPE_HOST = "host"
+CRAWL_SCOPE_PREFIX = "prefix"
+# Tamanho máximo de HTML lido de uma página (bytes)
+MAX_PAGE_SIZE = 5 * 1024 * 1024
+# Elementos onde frameworks JavaScript (React, Vue, Next, Nuxt, Angular) montam a página
+SPA_ROOT_IDS = {"root", "app", "__next", "__nuxt", "___gatsby"}
+SPA_ROOT_ATTRS = {"ng-app", "ng-version", "data-reactroot"}
+# Com um desses elementos, menos texto visível que isso indica uma página ainda vazia
+SPA_MAX_TEXT = 200
+# Perfis do Chrome: downloads pelo navegador e busca de links
+DOWNLOAD_PROFILE = "download"
+DISCOVERY_PROFILE = "discovery"
+# Recursos que a busca de links não precisa carregar
+DISCOVERY_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.m4v", "*.mov", "*.mp3", "*.ogg", "*.wav", "*.m4a"
+]
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+def load_selenium():
+    """Importa o Selenium na primeira vez que o Chrome for necessário"""
+    global webdriver, By, WebDriverWait, EC, Service, Options
+    if webdriver is not None:
+        return
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from selenium import webdriver
+
+def get_chrome_version():
+    """Descobre a versão do Chrome instalado sem abrir o navegador"""
+    try:
+        if sys.platform == "win32":
+            import winreg
+            for hive in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+                try:
+                    with winreg.OpenKey(hive, r"Software\Google\Chrome\BLBeacon") as key:
+                        return winreg.QueryValueEx(key, "version")[0]
+                except OSError:
+                    continue
+            return None
+        
+        if sys.platform == "darwin":
+            candidates = ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"]
+        else:
+            candidates = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser"]
+        for binary in candidates:
+            try:
+                output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=5).stdout
+            except (OSError, subprocess.SubprocessError):
+                continue
+            match = re.search(r"\d+(\.\d+)+", output)
+            if match:
+                return match.group(0)
+    except Exception as e:
+        logging.warning(f"Não foi possível descobrir a versão do Chrome: {str(e)}")
+    return None
+
+_driver_path_lock = threading.Lock()
+_driver_path = None
+
+def resolve_chromedriver():
+    """Retorna o caminho do ChromeDriver, consultando a rede só quando o Chrome muda de versão.
+
+    Sem rede, reaproveita o driver em cache da mesma versão principal (ou o
+    mais recente). Retorna None para deixar o Selenium Manager resolver.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+        
+        try:
+            with open(DRIVER_CACHE_FILE, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        
+        version = get_chrome_version()
+        cached = cache.get(version) if version else None
+        if cached and os.path.exists(cached):
+            _driver_path = cached
+            return cached
+        
+        try:
+            from webdriver_manager.chrome import ChromeDriverManager
+            path = ChromeDriverManager().install()
+            if version:
+                cache[version] = path
+                os.makedirs(os.path.dirname(DRIVER_CACHE_FILE), exist_ok=True)
+                with open(DRIVER_CACHE_FILE, 'w', encoding='utf-8') as f:
+                    json.dump(cache, f, indent=2)
+            _driver_path = path
+            return path
+        except Exception as e:
+            logging.warning(f"Não foi possível baixar o ChromeDriver, usando cache: {str(e)}")
+        
+        # Sem rede: prefere um driver da mesma versão principal do Chrome
+        major = version.split(".")[0] if version else None
+        available = [(v, p) for v, p in cache.items() if os.path.exists(p)]
+        available.sort(key=lambda item: [int(part) for part in item[0].split(".") if part.isdigit()], reverse=True)
+        for cached_version, path in available:
+            if major is None or cached_version.split(".")[0] == major:
+                _driver_path = path
+                return path
+        return available[0][1] if available else None
+
+def setup_driver(download_folder, profile=DOWNLOAD_PROFILE, headless=False):
+    """Configura o driver do Chrome para o perfil de download ou de descoberta de links"""
+    load_selenium()
+    chrome_options = Options()
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-notifications")
+    
+    if profile == DISCOVERY_PROFILE:
+        # Só precisamos do DOM: sem janela, sem imagens e sem esperar recursos secundários
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--window-size=1920,1080")
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2
+        })
+        chrome_options.page_load_strategy = "eager"
+    else:
+        chrome_options.add_experimental_option("prefs", {
+            "download.default_directory": download_folder,
+            "download.prompt_for_download": False,
+            "download.directory_upgrade": True,
+            "safebrowsing.enabled": True
+        })
+        chrome_options.add_argument("--disable-popup-blocking")
+        # Em servidores sem tela os downloads pelo navegador também rodam sem janela
+        if headless:
+            chrome_options.add_argument("--headless=new")
+        # Eventos de download do DevTools chegam pelo log de desempenho
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        chrome_options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": False, "enablePage": True})
+    
+    driver_path = resolve_chromedriver()
+    service = Service(driver_path) if driver_path else Service()
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    
+    if profile == DISCOVERY_PROFILE:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": DISCOVERY_BLOCKED_URLS})
+            # Alguns sites recusam o User-Agent do modo headless, que também é
+            # repassado às transferências diretas
+            user_agent = driver.execute_script("return navigator.userAgent")
+            driver.execute_cdp_cmd("Network.setUserAgentOverride", {
+                "userAgent": user_agent.replace("HeadlessChrome", "Chrome")
+            })
+        except Exception as e:
+            logging.warning(f"Não foi possível bloquear recursos na descoberta: {str(e)}")
+    return driver
+
+def is_downloadable_link(url, download_attr=None, type_hint=None):
+    """Verifica se o link é provavelmente um arquivo para download"""
+    try:
+        # O atributo download pede ao navegador para baixar, mesmo vazio
+        if download_attr is not None:
+            return True
+        
+        # Verifica a extensão do arquivo na URL
+        parsed = urllib.parse.urlparse(url)
+        ext = os.path.splitext(parsed.path)[1].lower()
+        
+        # Se tem uma extensão conhecida, considera como downloadável
+        if ext in DOWNLOAD_EXTENSIONS:
+            return True
+        
+        # O atributo type do link pode indicar o tipo do arquivo
+        if type_hint and is_file_content_type(type_hint):
+            return True
+            
+        return False
+    except:
+        return False
+
+def is_file_content_type(content_type):
+    """Indica se o tipo MIME é de um arquivo a baixar"""
+    mime = content_type.split(";")[0].strip().lower()
+    return mime in FILE_CONTENT_TYPES or bool(DOWNLOAD_EXTENSIONS.intersection(mimetypes.guess_all_extensions(mime)))
+
+def is_probe_candidate(url):
+    """Indica se vale consultar o tipo de um link sem extensão de download conhecida.
+
+    Links com query (ex.: /download.php?id=1) ou sem extensão podem servir
+    arquivos; pastas (/docs/) e caminhos com outra extensão (.html, .css,
+    .png...) não são consultados.
+    """
+    parsed = urllib.parse.urlparse(url)
+    if parsed.query:
+        return True
+    return not parsed.path.endswith("/") and not os.path.splitext(parsed.path)[1]
+
+def classify_probe(info):
+    """Decide, pelos cabeçalhos da resposta, se o link serve um arquivo"""
+    disposition = info.get("disposition") or ""
+    filename = None
+    if disposition:
+        message = email.message.Message()
+        message["Content-Disposition"] = disposition
+        filename = message.get_filename()
+        if filename:
+            # Nunca aceita caminhos vindos do servidor
+            filename = os.path.basename(filename.replace("\\", "/")) or None
+    mime = (info.get("content_type") or "").split(";")[0].strip().lower()
+    downloadable = disposition.lower().startswith("attachment") or bool(filename) or \
+        bool(mime) and is_file_content_type(mime)
+    return {
+        "downloadable": downloadable,
+        "content_type": mime,
+        "size": info.get("size"),
+        "filename": filename
+    }
+
+def response_info(headers):
+    """Campos usados por classify_probe, tirados dos cabeçalhos de uma resposta GET"""
+    length = headers.get("Content-Length", "")
+    return {
+        "size": int(length) if length.isdigit() else None,
+        "content_type": headers.get("Content-Type", ""),
+        "disposition": headers.get("Content-Disposition")
+    }
+
+def normalize_url(url):
+    """Normaliza a URL para evitar visitar a mesma página duas vezes"""
+    parsed = urllib.parse.urlsplit(url)
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    if parsed.port and (scheme, parsed.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parsed.port}"
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)))
+    return urllib.parse.urlunsplit((scheme, host, parsed.path or "/", query, ""))
+
+def in_crawl_scope(url, start_url, scope=CRAWL_SCOPE_HOST):
+    """Verifica se a URL está dentro dos limites do rastreamento"""
+    parsed = urllib.parse.urlsplit(url)
+    start = urllib.parse.urlsplit(start_url)
+    if parsed.scheme not in ("http", "https") or parsed.netloc != start.netloc:
+        return False
+    if scope == CRAWL_SCOPE_PREFIX:
+        # Apenas a pasta da página inicial e suas subpastas
+        return parsed.path.startswith(start.path[:start.path.rfind("/") + 1])
+    return True
+
+class LinkExtractor(html.parser.HTMLParser):
+    """Extrai os links do HTML à medida que ele chega, no mesmo formato de EXTRACT_LINKS_SCRIPT"""
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.links = []  # [href, texto, atributo download, type]
+        self.current = None  # Link aberto cujo texto ainda está sendo lido
+        self.text_length = 0  # Texto visível, fora de script e style
+        self.hidden_depth = 0
+        self.spa_root = False  # Encontrou um elemento raiz de framework JavaScript
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in ("script", "style", "template"):
+            self.hidden_depth += 1
+        if attrs.get("id") in SPA_ROOT_IDS or SPA_ROOT_ATTRS.intersection(attrs):
+            self.spa_root = True
+        if tag == "base" and attrs.get("href"):
+            self.base_url = urllib.parse.urljoin(self.base_url, attrs["href"])
+        elif tag == "a" and attrs.get("href"):
+            download_attr = None
+            if "download" in attrs:
+                download_attr = attrs["download"] or ""
+            self.current = [
+                urllib.parse.urljoin(self.base_url, attrs["href"].strip()),
+                [],
+                download_attr,
+                attrs.get("type") or ""
+            ]
+            self.links.append(self.current)
+
+    def handle_data(self, data):
+        if self.hidden_depth:
+            return
+        self.text_length += len(data.strip())
+        if self.current is not None:
+            self.current[1].append(data)
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "template") and self.hidden_depth:
+            self.hidden_depth -= 1
+        if tag == "a" and self.current is not None:
+            self.current[1] = "".join(self.current[1]).strip()
+            self.current = None
+
+    def close(self):
+        super().close()
+        # Links sem </a> também entram na lista
+        for link in self.links:
+            if isinstance(link[1], list):
+                link[1] = "".join(link[1]).strip()
+        self.current = None
+
+def looks_js_rendered(extractor):
+    """Indica se o HTML recebido depende de JavaScript para mostrar os links"""
+    if not extractor.links:
+        return True
+    # Casca de aplicação (ex.: <div id="root"></div>) ainda sem conteúdo
+    return extractor.spa_root and extractor.text_length < SPA_MAX_TEXT
+
+def fetch_page_links(downloader, url):
+    """Baixa a página via HTTP e extrai os links enquanto lê.
+
+    Retorna (URL final, cabeçalhos da resposta, LinkExtractor); o extrator
+    é None quando a resposta não é HTML.
+    """
+    with downloader.open(url) as response:
+        if response.headers.get_content_type() not in PAGE_CONTENT_TYPES:
+            return response.url, response.headers, None
+        try:
+            decoder = codecs.getincrementaldecoder(response.headers.get_content_charset() or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        extractor = LinkExtractor(response.url)
+        received = 0
+        while received < MAX_PAGE_SIZE:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            extractor.feed(decoder.decode(chunk))
+        extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+        return response.url, response.headers, extractor
+
+def get_download_filename(url):
+    """Extrai o nome do arquivo da URL"""
+    try:
+        return os.path.basename(urllib.parse.urlparse(url).path)
+    except:
+        return "arquivo_desconhecido"
+
+def qualified_filename(url, filename):
+    """Prefixa o nome com as pastas do caminho da URL (ex.: /docs/v2/a.pdf -> docs_v2_a.pdf)"""
+    folders = [part for part in urllib.parse.urlparse(url).path.split("/")[:-1] if part]
+    return "_".join(folders + [filename])
+
+def numbered_filename(filename, number):
+    """Acrescenta um número ao nome, antes da extensão (ex.: a.pdf -> a (2).pdf)"""
+    root, ext = os.path.splitext(filename)
+    return f"{root} ({number}){ext}"
+
+def is_already_downloaded(download_folder, filename):
+    """Verifica se o arquivo já existe na pasta de downloads"""
+    # Downloads parciais ficam em .part até terminar e são retomados pelo HttpDownloader
+    return os.path.exists(os.path.join(download_folder, filename))
+
+def parse_checksums(text):
+    """Lê uma lista de SHA-256 no formato do sha256sum ou BSD e retorna nome -> hash"""
+    checksums = {}
+    for line in text.splitlines():
+        line = line.strip()
+        match = re.match(r'^SHA256 \((.+)\) = ([0-9a-fA-F]{64})$', line)
+        if match:
+            name, digest = match.groups()
+        else:
+            match = re.match(r'^([0-9a-fA-F]{64}) [ *]?(.+)$', line)
+            if not match:
+                continue
+            digest, name = match.groups()
+        checksums[os.path.basename(name.strip())] = digest.lower()
+    return checksums
+
+class ContentHasher:
+    """SHA-256 (e, opcionalmente, CRC32) calculado enquanto os bytes são gravados.
+
+    Downloads gravados fora de ordem (segmentados) ou pelo navegador não
+    passam pelo hasher bloco a bloco; para eles update_file relê o arquivo.
+    """
+
+    def __init__(self, fast=False):
+        self.sha256 = hashlib.sha256()
+        self.crc32 = 0 if fast else None
+        self.size = 0
+
+    def update(self, data):
+        self.sha256.update(data)
+        if self.crc32 is not None:
+            self.crc32 = zlib.crc32(data, self.crc32)
+        self.size += len(data)
+
+    def update_file(self, path, bucket=None, should_stop=None):
+        """Inclui o conteúdo de um arquivo já gravado, limitando a leitura pelo balde, se houver"""
+        with open(path, 'rb') as f:
+            while True:
+                if should_stop and should_stop():
+                    raise DownloadCancelled()
+                data = f.read(HASH_READ_SIZE)
+                if not data:
+                    break
+                self.update(data)
+                if bucket:
+                    bucket.consume(len(data))
+        return self
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+    def fast_digest(self):
+        return f"{self.crc32:08x}" if self.crc32 is not None else None
+
+class CompletionNotifier:
+    """Avisa quando arquivos esperados terminam de ser gravados na pasta.
+
+    No Linux usa inotify (IN_CLOSE_WRITE/IN_MOVED_TO); nos demais sistemas um
+    único thread varre a pasta com os.scandir para todos os downloads.
+    """
+
+    def __init__(self, folder, poll_interval=0.2):
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self.waiters = {}  # Nome do arquivo esperado -> threading.Event
+        self.lock = threading.Lock()
+        self.last_activity = time.monotonic()
+        self.partial_sizes = {}
+        self.thread = None
+        self.stopped = False
+
+    def start(self):
+        """Inicia o thread de observação da pasta"""
+        if self.thread:
+            return
+        inotify_fd = self.open_inotify()
+        if inotify_fd is not None:
+            target = partial(self.watch_inotify, inotify_fd)
+        else:
+            target = self.watch_scandir
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Encerra o thread de observação"""
+        self.stopped = True
+
+    def expect(self, filename):
+        """Registra um arquivo esperado; chame antes de iniciar o download"""
+        with self.lock:
+            return self.waiters.setdefault(filename, threading.Event())
+
+    def discard(self, filename):
+        """Deixa de esperar pelo arquivo"""
+        with self.lock:
+            self.waiters.pop(filename, None)
+
+    def notify(self, filename):
+        """Marca o arquivo como concluído"""
+        with self.lock:
+            event = self.waiters.get(filename)
+        if event:
+            event.set()
+
+    def is_complete(self, filename):
+        """O arquivo final existe e o Chrome não está mais gravando nele"""
+        file_path = os.path.join(self.folder, filename)
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return False
+        if os.path.exists(file_path + '.crdownload'):
+            return False
+        if size == 0:
+            # O Chrome pode reservar o nome final com um arquivo vazio enquanto
+            # o conteúdo ainda está em um "Unconfirmed *.crdownload"
+            with os.scandir(self.folder) as entries:
+                return not any(entry.name.endswith('.crdownload') for entry in entries)
+        return True
+
+    def wait(self, filename, idle_timeout=DOWNLOAD_IDLE_TIMEOUT, should_stop=None):
+        """Espera o arquivo ficar pronto.
+
+        Só desiste se nenhum download da pasta progredir por idle_timeout
+        segundos, então transferências longas não expiram.
+        """
+        event = self.expect(filename)
+        started = time.monotonic()
+        try:
+            if self.is_complete(filename):
+                return True
+            # O intervalo do wait só controla as verificações de parada; a
+            # conclusão acorda o thread imediatamente
+            while not event.wait(1):
+                if should_stop and should_stop():
+                    return False
+                if time.monotonic() - max(started, self.last_activity) > idle_timeout:
+                    logging.warning(f"Download de {filename} sem progresso por {idle_timeout} segundos")
+                    return False
+            return True
+        finally:
+            self.discard(filename)
+
+    def handle_name(self, name, finished):
+        """Processa uma alteração de arquivo na pasta"""
+        if name.endswith(('.crdownload', '.part', '.tmp')):
+            self.last_activity = time.monotonic()
+        elif finished and name in self.waiters and self.is_complete(name):
+            self.notify(name)
+
+    def open_inotify(self):
+        """Cria o observador inotify, se disponível"""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                return None
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+            if libc.inotify_add_watch(fd, os.fsencode(self.folder), mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except Exception as e:
+            logging.warning(f"inotify indisponível, usando varredura da pasta: {str(e)}")
+            return None
+
+    def watch_inotify(self, fd):
+        """Lê eventos do inotify e acorda quem espera pelo arquivo"""
+        header = struct.Struct("iIII")
+        while not self.stopped:
+            try:
+                # O timeout permite encerrar o thread quando o observador é parado
+                readable, _, _ = select.select([fd], [], [], 1)
+                if not readable:
+                    continue
+                data = os.read(fd, 64 * 1024)
+            except OSError as e:
+                logging.error(f"Erro no inotify: {str(e)}")
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = header.unpack_from(data, offset)
+                raw_name = data[offset + header.size:offset + header.size + length]
+                offset += header.size + length
+                name = os.fsdecode(raw_name.rstrip(b"\0"))
+                if name:
+                    self.handle_name(name, bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO)))
+        os.close(fd)
+
+    def watch_scandir(self):
+        """Varre a pasta periodicamente enquanto houver arquivos esperados"""
+        while not self.stopped:
+            time.sleep(self.poll_interval)
+            if not self.waiters:
+                continue
+            try:
+                partial_sizes = {}
+                names = set()
+                with os.scandir(self.folder) as entries:
+                    for entry in entries:
+                        names.add(entry.name)
+                        if entry.name.endswith('.crdownload'):
+                            partial_sizes[entry.name] = entry.stat().st_size
+                if partial_sizes != self.partial_sizes:
+                    self.last_activity = time.monotonic()
+                    self.partial_sizes = partial_sizes
+                for filename in list(self.waiters):
+                    if filename in names and self.is_complete(filename):
+                        self.notify(filename)
+            except Exception as e:
+                logging.error(f"Erro ao verificar pasta de downloads: {str(e)}")
+
+class DevToolsDownloadTracker:
+    """Acompanha os downloads do Chrome pelos eventos do DevTools.
+
+    Os eventos downloadWillBegin/downloadProgress chegam pelo log de desempenho
+    do ChromeDriver com o GUID, os bytes recebidos e o total de cada download.
+    """
+
+    def __init__(self, driver, download_folder):
+        self.driver = driver
+        self.downloads = {}  # GUID -> informações do download
+        self.enabled = True
+        try:
+            driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+                "behavior": "allow",
+                "downloadPath": download_folder,
+                "eventsEnabled": True
+            })
+        except Exception as e:
+            logging.warning(f"Eventos de download do DevTools indisponíveis: {str(e)}")
+            self.enabled = False
+
+    def poll(self):
+        """Consome os eventos pendentes e retorna os downloads que mudaram"""
+        if not self.enabled:
+            return []
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception as e:
+            logging.warning(f"Não foi possível ler eventos do DevTools: {str(e)}")
+            self.enabled = False
+            return []
+
+        changed = {}
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method", "")
+            params = message.get("params", {})
+
+            if method in ("Browser.downloadWillBegin", "Page.downloadWillBegin"):
+                download = self.downloads.setdefault(params["guid"], {
+                    "received": 0, "total": 0, "state": "inProgress"
+                })
+                download["url"] = params.get("url", "")
+                download["filename"] = params.get("suggestedFilename", "")
+                changed[params["guid"]] = download
+
+            elif method in ("Browser.downloadProgress", "Page.downloadProgress"):
+                download = self.downloads.get(params["guid"])
+                if download is None:
+                    continue
+                download["received"] = params.get("receivedBytes", 0)
+                download["total"] = params.get("totalBytes", 0)
+                download["state"] = params.get("state", "inProgress")
+                changed[params["guid"]] = download
+                if download["state"] != "inProgress":
+                    del self.downloads[params["guid"]]
+
+        return list(changed.values())
+
+class BrowserWorker:
+    """Instância do Chrome do pool, com a sua própria pasta de downloads"""
+
+    def __init__(self, driver, folder):
+        self.driver = driver
+        self.folder = folder
+        self.jobs = 0
+        self.lock = threading.Lock()  # O WebDriver não é thread-safe
+        self.tracker = DevToolsDownloadTracker(driver, folder)
+        self.notifier = CompletionNotifier(folder)
+        self.notifier.start()
+
+    def quit(self):
+        """Fecha o Chrome e remove a pasta se estiver vazia"""
+        self.notifier.stop()
+        try:
+            with self.lock:
+                self.driver.quit()
+        except Exception as e:
+            logging.error(f"Erro ao fechar driver do pool: {str(e)}")
+        try:
+            os.rmdir(self.folder)
+        except OSError:
+            pass
+
+class DriverPool:
+    """Pool de instâncias do Chrome para downloads que dependem do navegador.
+
+    Cada instância baixa para uma subpasta própria, o que torna a detecção de
+    conclusão inequívoca, e recebe uma cópia dos cookies da sessão logada.
+    As instâncias são criadas sob demanda e recicladas após max_jobs downloads
+    para limitar o uso de memória do Chrome.
+    """
+
+    def __init__(self, create_driver, base_folder, size, cookies=None, max_jobs=DRIVER_MAX_JOBS):
+        self.create_driver = create_driver
+        self.base_folder = base_folder
+        self.size = size
+        self.cookies = cookies or []
+        self.max_jobs = max_jobs
+        self.idle = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+        self.counter = 0
+        self.creating = 0
+        self.closed = False
+
+    def acquire(self):
+        """Retorna uma instância livre, criando uma nova se o pool não estiver cheio"""
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                worker = None
+            if worker:
+                return worker
+
+            with self.lock:
+                create = len(self.workers) + self.creating < self.size
+                if create:
+                    self.creating += 1
+                    self.counter += 1
+                    index = self.counter
+            if create:
+                try:
+                    worker = self.create_worker(index)
+                    with self.lock:
+                        self.workers.append(worker)
+                    return worker
+                finally:
+                    with self.lock:
+                        self.creating -= 1
+
+            # None indica que uma instância reciclada liberou uma vaga
+            worker = self.idle.get()
+            if worker:
+                return worker
+
+    def release(self, worker):
+        """Devolve a instância ao pool, reciclando-a se já atendeu max_jobs downloads"""
+        worker.jobs += 1
+        if self.closed or worker.jobs >= self.max_jobs:
+            with self.lock:
+                if worker in self.workers:
+                    self.workers.remove(worker)
+            worker.quit()
+            # Acorda quem estiver esperando para que uma nova instância seja criada
+            self.idle.put(None)
+        else:
+            self.idle.put(worker)
+
+    def create_worker(self, index):
+        """Abre um Chrome com pasta de downloads própria e os cookies da sessão"""
+        folder = os.path.join(self.base_folder, f"worker-{index}")
+        os.makedirs(folder, exist_ok=True)
+        driver = self.create_driver(folder)
+        if self.cookies:
+            try:
+                # Network.setCookies não exige navegar até cada domínio antes
+                driver.execute_cdp_cmd("Network.setCookies", {"cookies": [
+                    {key: value for key, value in {
+                        "name": cookie["name"],
+                        "value": cookie["value"],
+                        "domain": cookie.get("domain"),
+                        "path": cookie.get("path", "/"),
+                        "secure": cookie.get("secure", False),
+                        "httpOnly": cookie.get("httpOnly", False),
+                        "expires": cookie.get("expiry"),
+                        "sameSite": cookie.get("sameSite")
+                    }.items() if value is not None}
+                    for cookie in self.cookies
+                ]})
+            except Exception as e:
+                logging.warning(f"Não foi possível copiar os cookies para o pool: {str(e)}")
+        return BrowserWorker(driver, folder)
+
+    def snapshot(self):
+        """Instâncias ativas no momento"""
+        with self.lock:
+            return list(self.workers)
+
+    def close(self):
+        """Fecha as instâncias livres; as ocupadas fecham ao serem devolvidas"""
+        self.closed = True
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is None:
+                continue
+            with self.lock:
+                if worker in self.workers:
+                    self.workers.remove(worker)
+            worker.quit()
+
+class DownloadCancelled(Exception):
+    """Indica que o download foi interrompido pelo usuário"""
+
+class NotModified(Exception):
+    """Indica que o servidor respondeu 304: o arquivo local continua atual"""
+
+def conditional_headers(validators):
+    """Cabeçalhos If-None-Match/If-Modified-Since a partir dos validadores guardados"""
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+def cookiejar_from_driver(driver_cookies):
+    """Converte os cookies do Selenium em um CookieJar do urllib"""
+    jar = http.cookiejar.CookieJar()
+    for cookie in driver_cookies:
+        domain = cookie.get("domain", "")
+        jar.set_cookie(http.cookiejar.Cookie(
+            version=0,
+            name=cookie["name"],
+            value=cookie["value"],
+            port=None,
+            port_specified=False,
+            domain=domain,
+            domain_specified=bool(domain),
+            domain_initial_dot=domain.startswith("."),
+            path=cookie.get("path", "/"),
+            path_specified=True,
+            secure=cookie.get("secure", False),
+            expires=cookie.get("expiry"),
+            discard=False,
+            comment=None,
+            comment_url=None,
+            rest={"HttpOnly": None} if cookie.get("httpOnly") else {}
+        ))
+    return jar
+
+def check_content_type(content_type, file_path):
+    """Recusa páginas HTML no lugar do arquivo, o que normalmente indica login expirado"""
+    if content_type.startswith("text/html") and not file_path.lower().endswith((".htm", ".html")):
+        raise IOError(f"Resposta inesperada do servidor ({content_type})")
+
+def connection_key(url):
+    """Esquema, host e porta da URL, que identificam uma conexão reaproveitável"""
+    parsed = urllib.parse.urlsplit(url)
+    scheme = parsed.scheme.lower()
+    return scheme, (parsed.hostname or "").lower(), parsed.port or (443 if scheme == "https" else 80)
+
+class ConnectionPool:
+    """Conexões HTTP persistentes (keep-alive), separadas por esquema, host e porta.
+
+    Cada host tem no máximo max_per_host conexões em uso; quem pedir mais
+    espera uma ser devolvida. Conexões ociosas há mais de POOL_IDLE_TIMEOUT
+    segundos são fechadas em vez de reaproveitadas.
+    """
+
+    def __init__(self, max_per_host=MAX_CONNECTIONS_PER_HOST):
+        self.max_per_host = max_per_host
+        self.lock = threading.Lock()
+        self.limits = {}  # Chave -> semáforo das conexões em uso
+        self.idle = {}  # Chave -> [(conexão, horário em que foi devolvida)]
+        self.ssl_context = ssl.create_default_context()
+
+    def limit(self, key):
+        """Semáforo que limita as conexões em uso para a chave"""
+        with self.lock:
+            if key not in self.limits:
+                self.limits[key] = threading.BoundedSemaphore(self.max_per_host)
+            return self.limits[key]
+
+    def acquire(self, key, timeout):
+        """Retorna (conexão, reaproveitada), esperando se o host estiver no limite"""
+        self.limit(key).acquire()
+        now = time.monotonic()
+        with self.lock:
+            idle = self.idle.get(key, [])
+            while idle:
+                connection, since = idle.pop()
+                if now - since < POOL_IDLE_TIMEOUT:
+                    return connection, True
+                connection.close()
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def release(self, key, connection, reusable):
+        """Devolve a conexão ao pool, ou a fecha se ela não puder ser reaproveitada"""
+        if reusable:
+            with self.lock:
+                self.idle.setdefault(key, []).append((connection, time.monotonic()))
+        else:
+            connection.close()
+        self.limits[key].release()
+
+    def close(self):
+        """Fecha as conexões ociosas"""
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for connection, _ in connections:
+                connection.close()
+
+class PooledResponse:
+    """Resposta lida de uma conexão do pool; ao ser fechada, devolve a conexão"""
+
+    def __init__(self, pool, key, connection, response, url):
+        self.pool = pool
+        self.key = key
+        self.connection = connection
+        self.response = response
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.msg
+
+    def read(self, amt=None):
+        return self.response.read(amt)
+
+    def info(self):
+        return self.headers
+
+    def close(self):
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        reusable = not self.response.will_close
+        if reusable and not self.response.isclosed():
+            # Só vale terminar de ler o corpo para reaproveitar a conexão se faltar pouco
+            if self.response.length is not None and self.response.length <= CHUNK_SIZE:
+                try:
+                    self.response.read()
+                except Exception:
+                    reusable = False
+            else:
+                reusable = False
+        if not reusable:
+            self.response.close()
+        self.pool.release(self.key, connection, reusable)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        # Garante que o limite do host seja liberado mesmo se a resposta for esquecida
+        try:
+            self.close()
+        except Exception:
+            pass
+
+class TokenBucket:
+    """Balde de fichas para limitar a taxa de transferência (bytes/s, 0 = sem limite).
+
+    Cada bloco recebido consome as fichas de uma vez; se faltarem, a thread
+    dorme o tempo necessário para pagar a diferença. Assim o custo é de uma
+    trava por bloco, não por byte.
+    """
+
+    def __init__(self, rate=0):
+        self.rate = rate
+        self.tokens = 0.0
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.rate = rate
+            self.tokens = min(self.tokens, 0.0)
+
+    def consume(self, amount):
+        """Desconta amount bytes, esperando se a taxa tiver sido excedida"""
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+
+    def reserve(self, amount):
+        """Desconta amount bytes e retorna quanto tempo (s) esperar antes de continuar"""
+        with self.lock:
+            if self.rate <= 0:
+                return 0
+            now = time.monotonic()
+            capacity = self.rate * BANDWIDTH_BURST
+            self.tokens = min(capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            # As fichas podem ficar negativas: quem vier depois espera também esta dívida
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+class BandwidthLimiter:
+    """Limites de banda global, por host e por download, ajustáveis durante as transferências.
+
+    Também mede a taxa efetiva de todas as transferências somadas.
+    """
+
+    def __init__(self, global_rate=0, per_host=0, per_download=0):
+        self.lock = threading.Lock()
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_host = per_host
+        self.per_download = per_download
+        self.host_buckets = {}  # Chave do host -> balde
+        self.download_buckets = weakref.WeakSet()  # Baldes dos downloads em andamento
+        self.transferred = 0
+        self.last_measure = time.monotonic()
+        self.last_transferred = 0
+
+    def set_limits(self, global_rate, per_host, per_download):
+        """Altera os limites (bytes/s, 0 = sem limite); vale também para os downloads em andamento"""
+        with self.lock:
+            self.per_host = per_host
+            self.per_download = per_download
+            host_buckets = list(self.host_buckets.values())
+            download_buckets = list(self.download_buckets)
+        self.global_bucket.set_rate(global_rate)
+        for bucket in host_buckets:
+            bucket.set_rate(per_host)
+        for bucket in download_buckets:
+            bucket.set_rate(per_download)
+
+    def for_download(self, url):
+        """Cria o limitador usado pelas conexões de um download"""
+        key = connection_key(url)
+        with self.lock:
+            if key not in self.host_buckets:
+                self.host_buckets[key] = TokenBucket(self.per_host)
+            bucket = TokenBucket(self.per_download)
+            self.download_buckets.add(bucket)
+            return DownloadThrottle(self, self.host_buckets[key], bucket)
+
+    def measure(self):
+        """Taxa efetiva (bytes/s) desde a medição anterior"""
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.last_measure
+            rate = (self.transferred - self.last_transferred) / elapsed if elapsed > 0 else 0
+            self.last_measure = now
+            self.last_transferred = self.transferred
+        return rate
+
+class DownloadThrottle:
+    """Aplica os limites global, do host e do download a cada bloco recebido"""
+
+    def __init__(self, limiter, host_bucket, download_bucket):
+        self.limiter = limiter
+        self.buckets = (limiter.global_bucket, host_bucket, download_bucket)
+
+    def consume(self, amount):
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+
+    def reserve(self, amount):
+        """Desconta o bloco em todos os limites e retorna a maior espera (s)"""
+        with self.limiter.lock:
+            self.limiter.transferred += amount
+        return max(bucket.reserve(amount) for bucket in self.buckets)
+
+class HttpDownloader:
+    """Transfere arquivos diretamente via HTTP, sem passar pelo navegador.
+
+    Com um ConnectionPool, as requisições reaproveitam conexões abertas e
+    respeitam o limite de conexões por host; sem ele (ou atrás de um proxy)
+    usa o urllib, uma conexão por requisição.
+    """
+
+    def __init__(self, cookies=None, user_agent=None, timeout=30, pool=None, limiter=None):
+        self.cookie_jar = cookiejar_from_driver(cookies or [])
+        self.user_agent = user_agent or DEFAULT_USER_AGENT
+        self.timeout = timeout
+        self.pool = pool
+        self.limiter = limiter
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookie_jar))
+        self.proxies = urllib.request.getproxies()
+
+    @classmethod
+    def from_driver(cls, driver, pool=None, limiter=None):
+        """Cria o downloader reaproveitando a sessão (cookies e User-Agent) do navegador"""
+        if not driver:
+            return cls(pool=pool, limiter=limiter)
+        try:
+            cookies = driver.get_cookies()
+            user_agent = driver.execute_script("return navigator.userAgent")
+            return cls(cookies=cookies, user_agent=user_agent, pool=pool, limiter=limiter)
+        except Exception as e:
+            logging.error(f"Erro ao copiar sessão do navegador: {str(e)}")
+            return cls(pool=pool, limiter=limiter)
+
+    def open(self, url, method="GET", headers=None):
+        """Abre uma requisição usando a sessão copiada do navegador"""
+        request_headers = {"User-Agent": self.user_agent}
+        request_headers.update(headers or {})
+        if not self.pool or self.uses_proxy(url):
+            request = urllib.request.Request(url, headers=request_headers, method=method)
+            return self.opener.open(request, timeout=self.timeout)
+
+        for _ in range(MAX_REDIRECTS + 1):
+            request = urllib.request.Request(url, headers=request_headers, method=method)
+            self.cookie_jar.add_cookie_header(request)
+            response = self.send(request)
+            self.cookie_jar.extract_cookies(response, request)
+            location = response.headers.get("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                response.close()
+                url = urllib.parse.urljoin(url, location)
+                if response.status == 303:
+                    method = "GET"
+                continue
+            if response.status >= 400:
+                response.close()
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+            return response
+        raise urllib.error.HTTPError(url, response.status, "Redirecionamentos demais", response.headers, None)
+
+    def uses_proxy(self, url):
+        """Indica se a URL deve passar por um proxy configurado no ambiente"""
+        parsed = urllib.parse.urlsplit(url)
+        return parsed.scheme in self.proxies and not urllib.request.proxy_bypass(parsed.hostname or "")
+
+    def send(self, request):
+        """Envia a requisição por uma conexão do pool"""
+        key = connection_key(request.full_url)
+        for attempt in range(2):
+            connection, reused = self.pool.acquire(key, self.timeout)
+            try:
+                connection.timeout = self.timeout
+                if connection.sock:
+                    connection.sock.settimeout(self.timeout)
+                connection.request(request.get_method(), request.selector, headers=dict(request.header_items()))
+                response = connection.getresponse()
+            except (ConnectionError, http.client.BadStatusLine):
+                self.pool.release(key, connection, False)
+                # O servidor pode ter fechado a conexão ociosa: tenta uma vez com outra
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                self.pool.release(key, connection, False)
+                raise
+            return PooledResponse(self.pool, key, connection, response, request.full_url)
+
+    def probe(self, url):
+        """Consulta tamanho e suporte a Range sem baixar o conteúdo"""
+        try:
+            response = self.open(url, method="HEAD")
+        except urllib.error.HTTPError as e:
+            if e.code not in (403, 405, 501):
+                raise
+            # Alguns servidores não aceitam HEAD; pede apenas o primeiro byte
+            response = self.open(url, headers={"Range": "bytes=0-0"})
+
+        with response:
+            headers = response.headers
+            size = None
+            content_range = headers.get("Content-Range", "")
+            if response.status == 206 and "/" in content_range:
+                total = content_range.rsplit("/", 1)[1]
+                size = int(total) if total.isdigit() else None
+            elif headers.get("Content-Length"):
+                size = int(headers["Content-Length"])
+
+            return {
+                "url": response.url,
+                "size": size,
+                "accept_ranges": response.status == 206 or headers.get("Accept-Ranges", "").lower() == "bytes",
+                "content_type": headers.get("Content-Type", ""),
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "disposition": headers.get("Content-Disposition")
+            }
+
+    def download(self, url, file_path, progress_callback=None, should_stop=None, connections=1, hasher=None,
+                 validators=None):
+        """Baixa a URL direto para o disco e retorna o número de bytes recebidos.
+
+        Com um ContentHasher, o hash é calculado durante a transferência; nos
+        downloads segmentados, que gravam fora de ordem, o arquivo é relido
+        ao final. Se validators (ETag/Last-Modified) for informado, o GET é
+        condicional e NotModified indica que nada mudou; se mudou, a mesma
+        resposta decide entre segmentos e uma conexão, como num download
+        novo. Um download parcial é retomado sem a requisição condicional,
+        pois o diário já guarda os validadores da versão nova. Em todo caso o
+        dicionário recebe os validadores da versão baixada.
+        """
+        temp_path = file_path + '.part'
+        journal = TransferJournal.load(temp_path)
+        if journal is None:
+            journal = self.adopt_browser_partial(url, file_path)
+
+        # Mais segmentos que o limite de conexões do host só ficariam esperando
+        if self.pool:
+            connections = min(connections, self.pool.max_per_host)
+
+        throttle = self.limiter.for_download(url) if self.limiter else None
+        if journal:
+            # Só vale consultar o servidor antes se houver algo a retomar
+            info = None
+            try:
+                info = self.probe(url)
+            except Exception as e:
+                logging.warning(f"Não foi possível consultar {url} para retomar o download: {str(e)}")
+            if info and info["size"] and journal.matches(url, info):
+                logging.info(f"Retomando {url} a partir de {journal.completed_bytes()} bytes")
+                return self.download_segmented(url, info, file_path, journal, connections, progress_callback,
+                                               should_stop, throttle, hasher, validators)
+            logging.info(f"Download parcial de {url} não pode ser retomado, reiniciando")
+            journal.discard()
+
+        # Sem nada a retomar, a resposta do próprio GET decide se o arquivo é dividido
+        return self.download_stream(url, file_path, progress_callback, should_stop, throttle, hasher, validators,
+                                    connections)
+
+    def download_segmented(self, url, info, file_path, journal, connections, progress_callback=None,
+                           should_stop=None, throttle=None, hasher=None, validators=None):
+        """Baixa o arquivo em segmentos paralelos, retomando o diário informado ou criando um novo"""
+        check_content_type(info["content_type"], file_path)
+        journal = journal or TransferJournal(file_path + '.part', url, info["size"],
+                                             info["etag"], info["last_modified"])
+        transfer = SegmentedTransfer(self, info["url"], file_path, journal,
+                                     connections, progress_callback, should_stop, throttle)
+        received = transfer.run()
+        if hasher:
+            hasher.update_file(file_path)
+        if validators is not None:
+            validators.update(etag=info["etag"], last_modified=info["last_modified"], size=info["size"])
+        return received
+
+    def adopt_browser_partial(self, url, file_path):
+        """Aproveita um .crdownload deixado pelo Chrome como início do arquivo"""
+        crdownload_path = file_path + '.crdownload'
+        if not os.path.exists(crdownload_path):
+            return None
+        try:
+            info = self.probe(url)
+            partial_size = os.path.getsize(crdownload_path)
+            if not info["accept_ranges"] or not info["size"] or partial_size > info["size"]:
+                return None
+            os.replace(crdownload_path, file_path + '.part')
+            journal = TransferJournal(file_path + '.part', url, info["size"],
+                                      info["etag"], info["last_modified"])
+            journal.add_range(0, partial_size)
+            journal.save()
+            return journal
+        except Exception as e:
+            logging.warning(f"Não foi possível aproveitar {crdownload_path}: {str(e)}")
+            return None
+
+    def download_stream(self, url, file_path, progress_callback=None, should_stop=None, throttle=None,
+                        hasher=None, validators=None, connections=1):
+        """Baixa a URL em uma única conexão.
+
+        Com connections > 1, se a resposta mostrar um arquivo grande com
+        suporte a Range, ela só serve para conhecer o tamanho: a conexão é
+        descartada e o download segue em segmentos, sem um HEAD antes de
+        cada arquivo pequeno.
+        """
+        temp_path = file_path + '.part'
+        journal = None
+        received = 0
+
+        try:
+            response = self.open(url, headers=conditional_headers(validators))
+        except urllib.error.HTTPError as e:
+            # O urllib trata o 304 como erro
+            if e.code == 304:
+                raise NotModified()
+            raise
+        if response.status == 304:
+            response.close()
+            raise NotModified()
+        headers = response.headers
+        size = int(headers.get("Content-Length") or 0) or None
+        if connections > 1 and size and size >= 2 * MIN_SEGMENT_SIZE and \
+                headers.get("Accept-Ranges", "").lower() == "bytes":
+            response.close()
+            info = {
+                "url": response.url,
+                "size": size,
+                "accept_ranges": True,
+                "content_type": headers.get("Content-Type", ""),
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified")
+            }
+            return self.download_segmented(url, info, file_path, None, connections, progress_callback,
+                                           should_stop, throttle, hasher, validators)
+
+        try:
+            with response:
+                check_content_type(response.headers.get("Content-Type", ""), file_path)
+
+                total = int(response.headers.get("Content-Length") or 0) or None
+                if validators is not None:
+                    validators.update(etag=response.headers.get("ETag"),
+                                      last_modified=response.headers.get("Last-Modified"), size=total)
+                # Só registra o diário se o servidor permitir continuar depois
+                if total and response.headers.get("Accept-Ranges", "").lower() == "bytes":
+                    journal = TransferJournal(temp_path, url, total,
+                                              response.headers.get("ETag"),
+                                              response.headers.get("Last-Modified"))
+                last_report = 0
+                last_save = time.monotonic()
+
+                with open(temp_path, 'wb') as f:
+                    while True:
+                        if should_stop and should_stop():
+                            raise DownloadCancelled()
+                        chunk = response.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        received += len(chunk)
+                        if hasher:
+                            hasher.update(chunk)
+                        if throttle:
+                            throttle.consume(len(chunk))
+
+                        now = time.monotonic()
+                        if progress_callback and now - last_report >= PROGRESS_INTERVAL:
+                            progress_callback(received, total)
+                            last_report = now
+                        if journal and now - last_save >= JOURNAL_INTERVAL:
+                            f.flush()
+                            journal.ranges = [[0, received]]
+                            journal.save()
+                            last_save = now
+
+            if total is not None and received < total:
+                raise IOError(f"Transferência incompleta: {received} de {total} bytes")
+
+            os.replace(temp_path, file_path)
+            if journal:
+                journal.discard()
+            if progress_callback:
+                progress_callback(received, received)
+            return received
+
+        except BaseException:
+            if journal and received:
+                # Mantém o arquivo parcial para retomar na próxima execução
+                journal.ranges = [[0, received]]
+                journal.save()
+            elif os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            raise
+
+class AsyncConnectionPool:
+    """Conexões keep-alive para o laço asyncio, com limite por host e no total.
+
+    Equivalente ao ConnectionPool, mas com semáforos do asyncio: um download
+    esperando vaga não ocupa uma thread.
+    """
+
+    def __init__(self, max_per_host, max_total):
+        self.max_per_host = max_per_host
+        self.total = asyncio.BoundedSemaphore(max_total)
+        self.limits = {}  # Chave -> semáforo das conexões em uso
+        self.idle = {}  # Chave -> [(leitor, escritor, horário em que foi devolvida)]
+        self.ssl_context = ssl.create_default_context()
+
+    def limit(self, key):
+        if key not in self.limits:
+            self.limits[key] = asyncio.BoundedSemaphore(self.max_per_host)
+        return self.limits[key]
+
+    async def acquire(self, key, timeout):
+        """Retorna (leitor, escritor, reaproveitada), esperando se não houver vaga"""
+        await self.total.acquire()
+        try:
+            await self.limit(key).acquire()
+        except BaseException:
+            self.total.release()
+            raise
+        now = time.monotonic()
+        idle = self.idle.get(key, [])
+        while idle:
+            reader, writer, since = idle.pop()
+            if now - since < POOL_IDLE_TIMEOUT and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self.ssl_context if scheme == "https" else None),
+                timeout
+            )
+        except BaseException:
+            self.limits[key].release()
+            self.total.release()
+            raise
+        return reader, writer, False
+
+    def release(self, key, reader, writer, reusable):
+        """Devolve a conexão ao pool, ou a fecha se ela não puder ser reaproveitada"""
+        if reusable:
+            self.idle.setdefault(key, []).append((reader, writer, time.monotonic()))
+        else:
+            writer.close()
+        self.limits[key].release()
+        self.total.release()
+
+    def close(self):
+        """Fecha as conexões ociosas"""
+        idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for reader, writer, _ in connections:
+                writer.close()
+
+class AsyncResponse:
+    """Resposta HTTP/1.1 lida de uma conexão do AsyncConnectionPool"""
+
+    def __init__(self, pool, key, reader, writer, status, reason, headers, url, method, timeout):
+        self.pool = pool
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.url = url
+        self.timeout = timeout
+        self.chunked = "chunked" in headers.get("Transfer-Encoding", "").lower()
+        self.chunk_left = 0
+        length = headers.get("Content-Length", "")
+        if method == "HEAD" or status in (204, 304):
+            self.remaining = 0
+        elif not self.chunked and length.isdigit():
+            self.remaining = int(length)
+        else:
+            self.remaining = None  # Corpo em partes ou até o servidor fechar a conexão
+        self.finished = self.remaining == 0
+        self.keep_alive = (headers.get("Connection", "").lower() != "close"
+                           and (self.chunked or self.remaining is not None))
+
+    def info(self):
+        return self.headers
+
+    async def read(self, amount=CHUNK_SIZE):
+        """Lê até amount bytes do corpo; retorna b"" no fim"""
+        if self.finished:
+            return b""
+        if self.chunked:
+            return await self.read_chunked(amount)
+        if self.remaining is not None:
+            amount = min(amount, self.remaining)
+        data = await asyncio.wait_for(self.reader.read(amount), self.timeout)
+        if self.remaining is None:
+            self.finished = not data
+            return data
+        if not data:
+            raise ConnectionResetError("Conexão fechada antes do fim da resposta")
+        self.remaining -= len(data)
+        self.finished = self.remaining == 0
+        return data
+
+    async def read_chunked(self, amount):
+        if self.chunk_left == 0:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if not line:
+                raise ConnectionResetError("Conexão fechada antes do fim da resposta")
+            size = int(line.split(b";")[0].strip(), 16)
+            if size == 0:
+                # Ignora os trailers até a linha em branco
+                while (await asyncio.wait_for(self.reader.readline(), self.timeout)).strip():
+                    pass
+                self.finished = True
+                return b""
+            self.chunk_left = size
+        data = await asyncio.wait_for(self.reader.read(min(amount, self.chunk_left)), self.timeout)
+        if not data:
+            raise ConnectionResetError("Conexão fechada antes do fim da resposta")
+        self.chunk_left -= len(data)
+        if self.chunk_left == 0:
+            await asyncio.wait_for(self.reader.readexactly(2), self.timeout)
+        return data
+
+    async def discard(self):
+        """Descarta um corpo pequeno (redirecionamentos, erros) para reaproveitar a conexão"""
+        try:
+            if self.remaining is not None and self.remaining <= CHUNK_SIZE:
+                while await self.read():
+                    pass
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            pass
+        self.close()
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.pool.release(self.key, self.reader, self.writer, self.finished and self.keep_alive)
+        self.writer = None
+
+class AsyncHttpDownloader:
+    """Versão asyncio do HttpDownloader, para lotes de muitos arquivos pequenos.
+
+    Usa a sessão de um HttpDownloader (cookies, User-Agent, limites de banda)
+    e fala HTTP/1.1 diretamente sobre asyncio.open_connection, então milhares
+    de downloads em andamento cabem em uma única thread. Cada arquivo é
+    baixado em uma conexão; a divisão em segmentos fica com o HttpDownloader.
+    """
+
+    def __init__(self, session, pool):
+        self.session = session
+        self.pool = pool
+        self.timeout = session.timeout
+
+    async def open(self, url, method="GET", headers=None):
+        """Abre uma requisição usando a sessão copiada do navegador"""
+        request_headers = {"User-Agent": self.session.user_agent}
+        request_headers.update(headers or {})
+        for _ in range(MAX_REDIRECTS + 1):
+            request = urllib.request.Request(url, headers=request_headers, method=method)
+            self.session.cookie_jar.add_cookie_header(request)
+            response = await self.send(request)
+            self.session.cookie_jar.extract_cookies(response, request)
+            location = response.headers.get("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                await response.discard()
+                url = urllib.parse.urljoin(url, location)
+                if response.status == 303:
+                    method = "GET"
+                continue
+            if response.status >= 400:
+                await response.discard()
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+            return response
+        raise urllib.error.HTTPError(url, response.status, "Redirecionamentos demais", response.headers, None)
+
+    async def send(self, request):
+        """Envia a requisição por uma conexão do pool e lê o cabeçalho da resposta"""
+        key = connection_key(request.full_url)
+        lines = [f"{request.get_method()} {request.selector} HTTP/1.1", f"Host: {request.host}",
+                 "Accept-Encoding: identity"]
+        lines.extend(f"{name}: {value}" for name, value in request.header_items())
+        payload = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        for attempt in range(2):
+            reader, writer, reused = await self.pool.acquire(key, self.timeout)
+            try:
+                writer.write(payload)
+                await asyncio.wait_for(writer.drain(), self.timeout)
+                status_line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if not status_line:
+                    raise ConnectionResetError("Conexão fechada pelo servidor")
+                parts = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+                status = int(parts[1])
+                header_lines = []
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), self.timeout)
+                    if not line.strip():
+                        break
+                    header_lines.append(line)
+                headers = http.client.parse_headers(io.BytesIO(b"".join(header_lines) + b"\r\n"))
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.pool.release(key, reader, writer, False)
+                # O servidor pode ter fechado a conexão ociosa: tenta uma vez com outra
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                self.pool.release(key, reader, writer, False)
+                raise
+            return AsyncResponse(self.pool, key, reader, writer, status, parts[2] if len(parts) > 2 else "",
+                                 headers, request.full_url, request.get_method(), self.timeout)
+
+    async def download(self, url, file_path, progress_callback=None, should_stop=None, hasher=None,
+                       validators=None):
+        """Baixa a URL direto para o disco e retorna o número de bytes recebidos.
+
+        Com validators, a requisição é condicional, como no HttpDownloader.
+        """
+        temp_path = file_path + '.part'
+        throttle = self.session.limiter.for_download(url) if self.session.limiter else None
+        journal = None
+        received = 0
+
+        response = await self.open(url, headers=conditional_headers(validators))
+        if response.status == 304:
+            await response.discard()
+            raise NotModified()
+        try:
+            check_content_type(response.headers.get("Content-Type", ""), file_path)
+
+            total = int(response.headers.get("Content-Length") or 0) or None
+            if validators is not None:
+                validators.update(etag=response.headers.get("ETag"),
+                                  last_modified=response.headers.get("Last-Modified"), size=total)
+            # Só registra o diário se o servidor permitir continuar depois (pelo HttpDownloader)
+            if total and response.headers.get("Accept-Ranges", "").lower() == "bytes":
+                journal = TransferJournal(temp_path, url, total,
+                                          response.headers.get("ETag"),
+                                          response.headers.get("Last-Modified"))
+            last_report = 0
+
+            with open(temp_path, 'wb') as f:
+                while True:
+                    if should_stop and should_stop():
+                        raise DownloadCancelled()
+                    chunk = await response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    received += len(chunk)
+                    if hasher:
+                        hasher.update(chunk)
+                    if throttle:
+                        delay = throttle.reserve(len(chunk))
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+
+                    now = time.monotonic()
+                    if progress_callback and now - last_report >= PROGRESS_INTERVAL:
+                        progress_callback(received, total)
+                        last_report = now
+
+            if total is not None and received < total:
+                raise IOError(f"Transferência incompleta: {received} de {total} bytes")
+
+            os.replace(temp_path, file_path)
+            if progress_callback:
+                progress_callback(received, received)
+            return received
+
+        except BaseException:
+            if journal and received:
+                # Mantém o arquivo parcial para retomar na próxima execução
+                journal.ranges = [[0, received]]
+                journal.save()
+            elif os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            raise
+        finally:
+            response.close()
+
+class TransferJournal:
+    """Diário de um download parcial, gravado ao lado do arquivo .part.
+
+    Guarda a URL, os validadores (ETag/Last-Modified) e as faixas já gravadas,
+    permitindo retomar a transferência com requisições Range.
+    """
+
+    def __init__(self, temp_path, url, size, etag=None, last_modified=None, ranges=None):
+        self.temp_path = temp_path
+        self.path = temp_path + '.json'
+        self.url = url
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.ranges = ranges or []
+
+    @classmethod
+    def load(cls, temp_path):
+        """Carrega o diário de um arquivo parcial, se existir"""
+        path = temp_path + '.json'
+        if not os.path.exists(path) or not os.path.exists(temp_path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(temp_path, data["url"], data["size"], data.get("etag"),
+                       data.get("last_modified"), data.get("ranges"))
+        except Exception as e:
+            logging.error(f"Erro ao ler diário {path}: {str(e)}")
+            return None
+
+    def save(self):
+        """Grava o diário de forma atômica"""
+        temp = self.path + '.tmp'
+        try:
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "url": self.url,
+                    "size": self.size,
+                    "etag": self.etag,
+                    "last_modified": self.last_modified,
+                    "ranges": self.ranges
+                }, f)
+            os.replace(temp, self.path)
+        except Exception as e:
+            logging.error(f"Erro ao gravar diário {self.path}: {str(e)}")
+
+    def discard(self):
+        """Remove o diário e o arquivo parcial"""
+        for path in (self.path, self.temp_path):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def matches(self, url, info):
+        """Verifica se o arquivo no servidor ainda é o mesmo do download parcial"""
+        if self.url != url or self.size != info["size"] or not info["accept_ranges"]:
+            return False
+        if self.etag and info["etag"]:
+            return self.etag == info["etag"]
+        if self.last_modified and info["last_modified"]:
+            return self.last_modified == info["last_modified"]
+        return True
+
+    def add_range(self, start, end):
+        """Registra uma faixa concluída, unindo faixas adjacentes"""
+        if end <= start:
+            return
+        merged = []
+        for current_start, current_end in sorted(self.ranges + [[start, end]]):
+            if merged and current_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], current_end)
+            else:
+                merged.append([current_start, current_end])
+        self.ranges = merged
+
+    def completed_bytes(self):
+        """Total de bytes já gravados"""
+        return sum(end - start for start, end in self.ranges)
+
+    def missing_ranges(self):
+        """Faixas que ainda faltam baixar"""
+        missing = []
+        position = 0
+        for start, end in sorted(self.ranges):
+            if start > position:
+                missing.append((position, start))
+            position = max(position, end)
+        if position < self.size:
+            missing.append((position, self.size))
+        return missing
+
+class Segment:
+    """Faixa de bytes [start, end) de um download segmentado"""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.position = start  # Próximo byte reservado para gravação
+        self.written = start  # Bytes efetivamente gravados no disco
+
+    @property
+    def remaining(self):
+        return self.end - self.position
+
+class SegmentedTransfer:
+    """Baixa um arquivo em várias conexões simultâneas usando HTTP Range.
+
+    O arquivo é pré-alocado e cada faixa é gravada na sua posição. Quando uma
+    conexão termina a sua faixa, ela divide ao meio a faixa com mais bytes
+    pendentes, de forma que conexões lentas não atrasem o final do arquivo.
+    O progresso é registrado no diário para que a transferência possa ser
+    retomada se for interrompida.
+    """
+
+    def __init__(self, downloader, url, file_path, journal, connections, progress_callback=None, should_stop=None,
+                 throttle=None):
+        self.downloader = downloader
+        self.url = url
+        self.file_path = file_path
+        self.temp_path = journal.temp_path
+        self.journal = journal
+        self.size = journal.size
+        self.connections = max(1, min(connections, self.size // MIN_SEGMENT_SIZE))
+        self.progress_callback = progress_callback
+        self.should_stop = should_stop
+        self.throttle = throttle
+        self.lock = threading.Lock()
+        self.journal_lock = threading.Lock()
+        self.pending = []
+        self.segments = []
+        self.errors = []
+        self.last_report = 0
+        self.last_save = time.monotonic()
+
+    def run(self):
+        """Executa a transferência e retorna o número de bytes recebidos"""
+        try:
+            if not os.path.exists(self.temp_path):
+                self.journal.ranges = []
+                with open(self.temp_path, 'wb') as f:
+                    f.truncate(self.size)
+            elif os.path.getsize(self.temp_path) != self.size:
+                # Arquivos parciais gravados em sequência ainda não têm o tamanho final
+                with open(self.temp_path, 'r+b') as f:
+                    f.truncate(self.size)
+
+            self.pending = self.split(self.journal.missing_ranges())
+
+            workers = [threading.Thread(target=self.worker, daemon=True)
+                       for _ in range(min(self.connections, len(self.pending)))]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+            if self.should_stop and self.should_stop():
+                raise DownloadCancelled()
+
+            received = self.received()
+            if received < self.size:
+                error = self.errors[0] if self.errors else "segmentos incompletos"
+                raise IOError(f"Transferência incompleta: {received} de {self.size} bytes ({error})")
+
+            self.report(force=True)
+            os.replace(self.temp_path, self.file_path)
+            self.journal.discard()
+            return received
+
+        except BaseException:
+            # Mantém o arquivo parcial e o diário para retomar depois
+            if os.path.exists(self.temp_path):
+                self.save_journal()
+            raise
+
+    def split(self, ranges):
+        """Divide as faixas pendentes entre as conexões disponíveis"""
+        segments = [Segment(start, end) for start, end in ranges]
+        while len(segments) < self.connections:
+            largest = max(segments, key=lambda s: s.remaining, default=None)
+            if largest is None or largest.remaining < 2 * MIN_SEGMENT_SIZE:
+                break
+            middle = largest.start + largest.remaining // 2
+            segments.append(Segment(middle, largest.end))
+            largest.end = middle
+        return sorted(segments, key=lambda s: s.start)
+
+    def completed_ranges(self):
+        """Faixas do diário somadas ao que já foi gravado nesta execução"""
+        with self.lock:
+            written = [(s.start, s.written) for s in self.segments]
+        journal = TransferJournal(self.temp_path, self.url, self.size, ranges=[list(r) for r in self.journal.ranges])
+        for start, end in written:
+            journal.add_range(start, end)
+        return journal.ranges
+
+    def save_journal(self):
+        """Atualiza o diário com as faixas concluídas"""
+        with self.journal_lock:
+            self.journal.ranges = self.completed_ranges()
+            self.journal.save()
+
+    def received(self):
+        """Total de bytes já gravados"""
+        return sum(end - start for start, end in self.completed_ranges())
+
+    def next_segment(self):
+        """Retorna a próxima faixa a baixar, dividindo a mais lenta se necessário"""
+        with self.lock:
+            if self.errors or (self.should_stop and self.should_stop()):
+                return None
+
+            if self.pending:
+                segment = self.pending.pop(0)
+            else:
+                active = [s for s in self.segments if s.remaining >= 2 * MIN_SEGMENT_SIZE]
+                if not active:
+                    return None
+                slowest = max(active, key=lambda s: s.remaining)
+                middle = slowest.position + slowest.remaining // 2
+                segment = Segment(middle, slowest.end)
+                slowest.end = middle
+
+            self.segments.append(segment)
+            self.segments.sort(key=lambda s: s.start)
+            return segment
+
+    def worker(self):
+        """Baixa faixas até não restar trabalho"""
+        while True:
+            segment = self.next_segment()
+            if segment is None:
+                return
+
+            for attempt in range(SEGMENT_RETRIES):
+                try:
+                    self.fetch(segment)
+                    break
+                except DownloadCancelled:
+                    return
+                except Exception as e:
+                    logging.warning(f"Segmento {segment.start}-{segment.end} de {self.url} falhou: {str(e)}")
+                    if attempt == SEGMENT_RETRIES - 1:
+                        with self.lock:
+                            self.errors.append(str(e))
+                        return
+                    time.sleep(1 + attempt)
+
+    def fetch(self, segment):
+        """Baixa uma faixa, respeitando o fim que pode encolher durante a transferência"""
+        with self.lock:
+            # Descarta o que foi reservado e não chegou a ser gravado
+            segment.position = segment.written
+            if segment.remaining <= 0:
+                return
+            headers = {"Range": f"bytes={segment.position}-{segment.end - 1}"}
+        validator = self.journal.etag or self.journal.last_modified
+        if validator:
+            headers["If-Range"] = validator
+
+        with self.downloader.open(self.url, headers=headers) as response:
+            if response.status != 206:
+                raise IOError("O servidor ignorou o cabeçalho Range")
+
+            with open(self.temp_path, 'r+b', buffering=0) as f:
+                while True:
+                    if self.should_stop and self.should_stop():
+                        raise DownloadCancelled()
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if self.throttle:
+                        self.throttle.consume(len(chunk))
+
+                    # Reserva a posição antes de gravar para que outra conexão
+                    # não divida uma faixa que já está sendo escrita
+                    with self.lock:
+                        chunk = chunk[:segment.remaining]
+                        offset = segment.position
+                        segment.position += len(chunk)
+                    if chunk:
+                        f.seek(offset)
+                        f.write(chunk)
+                        with self.lock:
+                            segment.written = offset + len(chunk)
+                    self.report()
+                    if not chunk or segment.remaining <= 0:
+                        break
+
+        if segment.remaining > 0:
+            raise IOError(f"Conexão encerrada com {segment.remaining} bytes pendentes")
+
+    def report(self, force=False):
+        """Envia o progresso total e o de cada faixa e grava o diário periodicamente"""
+        now = time.monotonic()
+        with self.lock:
+            save_due = now - self.last_save >= JOURNAL_INTERVAL
+            if save_due:
+                self.last_save = now
+        if save_due:
+            self.save_journal()
+
+        if not self.progress_callback:
+            return
+        with self.lock:
+            if not force and now - self.last_report < PROGRESS_INTERVAL:
+                return
+            self.last_report = now
+            snapshot = [(s.start, s.end, s.written) for s in self.segments]
+        self.progress_callback(self.received(), self.size, snapshot)
+
+class HistoryStore:
+    """Histórico de downloads em SQLite (modo WAL) com gravações em lote.
+
+    As entradas alteradas são enfileiradas e gravadas por um único thread a
+    cada flush_interval segundos, então os workers não esperam pelo disco e
+    o custo por download não cresce com o tamanho do histórico.
+    """
+
+    COLUMNS = ("id", "url", "filename", "display_name", "status", "date", "size", "bytes", "sha256", "crc32")
+
+    def __init__(self, path, flush_interval=0.5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()  # Protege a conexão
+        self.pending = {}  # ID -> cópia da entrada a gravar
+        self.pending_validators = {}  # URL -> validadores a gravar
+        self.pending_lock = threading.Lock()
+        self.closed = threading.Event()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS history (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                url TEXT,
+                filename TEXT,
+                display_name TEXT,
+                status TEXT,
+                date TEXT,
+                size TEXT
+            )
+        """)
+        self.ensure_columns()
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_history_url ON history(url)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_history_filename ON history(filename)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_history_status ON history(status)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_history_sha256 ON history(sha256)")
+        # Resultados das consultas de tipo dos links (LinkProber)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS probes (
+                url TEXT PRIMARY KEY,
+                downloadable INTEGER,
+                content_type TEXT,
+                size INTEGER,
+                filename TEXT,
+                checked REAL
+            )
+        """)
+        # Validadores da última versão baixada de cada URL, para a sincronização
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER,
+                checked REAL
+            )
+        """)
+        self.connection.commit()
+
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def ensure_columns(self):
+        """Adiciona colunas novas a bancos criados por versões anteriores"""
+        existing = {row["name"] for row in self.connection.execute("PRAGMA table_info(history)")}
+        for column in self.COLUMNS:
+            if column not in existing:
+                self.connection.execute(f"ALTER TABLE history ADD COLUMN {column} TEXT")
+
+    def import_json(self, json_path):
+        """Importa o histórico antigo em JSON, uma única vez"""
+        if not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            for entry in entries:
+                entry.setdefault("display_name", entry.get("filename"))
+                entry.setdefault("id", uuid.uuid4().hex)
+                self.save(entry)
+            self.flush()
+            os.replace(json_path, json_path + '.migrated')
+            logging.info(f"{len(entries)} entradas importadas de {json_path}")
+        except Exception as e:
+            logging.error(f"Erro ao importar histórico de {json_path}: {str(e)}")
+
+    def save(self, entry):
+        """Enfileira a entrada para a próxima gravação em lote"""
+        with self.pending_lock:
+            self.pending[entry["id"]] = dict(entry)
+
+    def flush(self):
+        """Grava as entradas pendentes em uma única transação"""
+        with self.pending_lock:
+            entries = list(self.pending.values())
+            self.pending = {}
+            validators, self.pending_validators = self.pending_validators, {}
+        if validators:
+            self.write_validators(validators)
+        if not entries:
+            return
+
+        columns = ", ".join(self.COLUMNS)
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in self.COLUMNS if column != "id")
+        rows = [tuple(entry.get(column) for column in self.COLUMNS) for entry in entries]
+        try:
+            with self.lock:
+                self.connection.executemany(
+                    f"INSERT INTO history ({columns}) VALUES ({placeholders}) "
+                    f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                    rows
+                )
+                self.connection.commit()
+        except Exception as e:
+            logging.error(f"Erro ao salvar histórico: {str(e)}")
+
+    def write_loop(self):
+        """Grava periodicamente as entradas pendentes"""
+        while not self.closed.wait(self.flush_interval):
+            self.flush()
+
+    def iter_pages(self, page_size=HISTORY_CHUNK_SIZE):
+        """Percorre o histórico em páginas, na ordem de inserção"""
+        last_seq = 0
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    f"SELECT seq, {', '.join(self.COLUMNS)} FROM history WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (last_seq, page_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_seq = rows[-1]["seq"]
+            yield [{column: row[column] for column in self.COLUMNS} for row in rows]
+
+    def find(self, column, value):
+        """Busca entradas por uma coluna indexada (url, filename, status ou sha256)"""
+        if column not in ("url", "filename", "status", "sha256"):
+            raise ValueError(f"Coluna sem índice: {column}")
+        self.flush()
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM history WHERE {column} = ? ORDER BY seq",
+                (value,)
+            ).fetchall()
+        return [{column: row[column] for column in self.COLUMNS} for row in rows]
+
+    def find_unhashed(self):
+        """Entradas de arquivos baixados que ainda não têm hash"""
+        self.flush()
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM history "
+                f"WHERE status IN ('Concluído', 'Já existente') AND (sha256 IS NULL OR sha256 = '') ORDER BY seq"
+            ).fetchall()
+        return [{column: row[column] for column in self.COLUMNS} for row in rows]
+
+    def save_validators(self, url, validators):
+        """Enfileira os validadores (ETag, Last-Modified, tamanho) da URL para a próxima gravação"""
+        with self.pending_lock:
+            self.pending_validators[url] = dict(validators)
+
+    def write_validators(self, validators):
+        now = time.time()
+        rows = [(url, value.get("etag"), value.get("last_modified"), value.get("size"), now)
+                for url, value in validators.items()]
+        try:
+            with self.lock:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO validators (url, etag, last_modified, size, checked) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self.connection.commit()
+        except Exception as e:
+            logging.error(f"Erro ao salvar validadores: {str(e)}")
+
+    def get_validators(self, urls):
+        """Retorna URL -> validadores guardados"""
+        results = {}
+        urls = list(urls)
+        with self.pending_lock:
+            pending = {url: self.pending_validators[url] for url in urls if url in self.pending_validators}
+        with self.lock:
+            # Respeita o limite de parâmetros do SQLite
+            for start in range(0, len(urls), 500):
+                batch = urls[start:start + 500]
+                rows = self.connection.execute(
+                    f"SELECT url, etag, last_modified, size FROM validators "
+                    f"WHERE url IN ({', '.join('?' for _ in batch)})",
+                    batch
+                ).fetchall()
+                for row in rows:
+                    results[row["url"]] = {
+                        "etag": row["etag"],
+                        "last_modified": row["last_modified"],
+                        "size": row["size"]
+                    }
+        results.update(pending)
+        return results
+
+    def get_probes(self, urls, max_age=PROBE_CACHE_TTL):
+        """Retorna URL -> resultado das consultas de tipo ainda válidas"""
+        results = {}
+        urls = list(urls)
+        oldest = time.time() - max_age
+        with self.lock:
+            # Respeita o limite de parâmetros do SQLite
+            for start in range(0, len(urls), 500):
+                batch = urls[start:start + 500]
+                rows = self.connection.execute(
+                    f"SELECT url, downloadable, content_type, size, filename FROM probes "
+                    f"WHERE checked >= ? AND url IN ({', '.join('?' for _ in batch)})",
+                    [oldest] + batch
+                ).fetchall()
+                for row in rows:
+                    results[row["url"]] = {
+                        "downloadable": bool(row["downloadable"]),
+                        "content_type": row["content_type"],
+                        "size": row["size"],
+                        "filename": row["filename"]
+                    }
+        return results
+
+    def save_probes(self, results):
+        """Grava os resultados das consultas de tipo em uma única transação"""
+        if not results:
+            return
+        now = time.time()
+        rows = [(url, int(result["downloadable"]), result["content_type"], result["size"], result["filename"], now)
+                for url, result in results.items()]
+        try:
+            with self.lock:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO probes (url, downloadable, content_type, size, filename, checked) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self.connection.commit()
+        except Exception as e:
+            logging.error(f"Erro ao salvar consultas de links: {str(e)}")
+
+    def clear(self):
+        """Remove todo o histórico"""
+        with self.pending_lock:
+            self.pending = {}
+        with self.lock:
+            self.connection.execute("DELETE FROM history")
+            self.connection.commit()
+
+    def close(self):
+        """Grava o que estiver pendente e fecha o banco"""
+        self.closed.set()
+        self.flush()
+        with self.lock:
+            self.connection.close()
+
+class LinkProber:
+    """Consulta em paralelo os cabeçalhos dos links para descobrir quais servem arquivos.
+
+    Cobre links como /download?id=123, que a extensão não identifica. As
+    consultas ficam limitadas a PROBE_WORKERS no total e a PROBE_PER_HOST por
+    host, e os resultados são guardados no histórico por PROBE_CACHE_TTL.
+    """
+
+    def __init__(self, downloader, store=None, workers=PROBE_WORKERS, per_host=PROBE_PER_HOST):
+        self.downloader = downloader
+        self.store = store
+        self.per_host = per_host
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.host_limits = {}  # Host -> semáforo com as consultas em andamento
+        self.seen = set()
+        self.futures = []
+        self.results = {}  # URL -> resultado das consultas feitas nesta rodada
+
+    def submit(self, urls, callback):
+        """Consulta as URLs ainda não vistas; callback(url, resultado) roda ao fim de cada uma"""
+        with self.lock:
+            urls = [url for url in urls if url not in self.seen]
+            self.seen.update(urls)
+        if not urls:
+            return
+        cached = self.store.get_probes(urls) if self.store else {}
+        for url in urls:
+            if url in cached:
+                callback(url, cached[url])
+            else:
+                self.futures.append(self.executor.submit(self.run, url, callback))
+
+    def host_limit(self, url):
+        """Semáforo que limita as consultas simultâneas ao host da URL"""
+        host = urllib.parse.urlparse(url).netloc.lower()
+        with self.lock:
+            if host not in self.host_limits:
+                self.host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_limits[host]
+
+    def run(self, url, callback):
+        """Consulta uma URL respeitando o limite do host"""
+        try:
+            with self.host_limit(url):
+                result = classify_probe(self.downloader.probe(url))
+        except Exception as e:
+            # Falhas de rede não vão para o cache, para serem tentadas de novo
+            logging.info(f"Não foi possível consultar {url}: {str(e)}")
+            return
+        with self.lock:
+            self.results[url] = result
+        callback(url, result)
+
+    def finish(self):
+        """Espera as consultas pendentes e grava os resultados no cache"""
+        for future in self.futures:
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"Erro ao consultar link: {str(e)}")
+        self.executor.shutdown()
+        if self.store:
+            self.store.save_probes(self.results)
+
+class HostQueue:
+    """Fila de prioridade dos downloads, com limite de downloads simultâneos por host.
+
+    Cada host tem seu heap; next_job entrega o download de menor chave
+    entre os hosts que ainda estão abaixo de max_per_host, então a ordem de
+    prioridade é respeitada sem sobrecarregar nenhum servidor. A chave vem
+    de priority(url); empates seguem a ordem de chegada. Downloads podem ser
+    adicionados e repriorizados enquanto o lote roda, e o futuro de watch()
+    é concluído a cada mudança para acordar o agendador.
+    """
+
+    def __init__(self, jobs, max_per_host, priority=None):
+        self.max_per_host = max_per_host
+        self.priority = priority or (lambda url: ())
+        self.lock = threading.Lock()
+        self.heaps = {}  # Host -> [(chave, sequência, (url, texto))]
+        self.active = collections.Counter()  # Host -> downloads em andamento
+        self.queued = {}  # URL -> entrada válida no heap
+        self.total = 0  # Downloads enfileirados neste lote
+        self.seen = set()
+        self.counter = itertools.count()
+        self.closed = False
+        self.changed = Future()
+        for job in jobs:
+            self.add(job)
+
+    @property
+    def pending(self):
+        return len(self.queued)
+
+    def add(self, job):
+        """Enfileira um download (url, texto); retorna False se o lote já terminou"""
+        with self.lock:
+            if self.closed:
+                return False
+            if job[0] not in self.seen:
+                self.seen.add(job[0])
+                self.total += 1
+                self.push(job)
+            return True
+
+    def reprioritize(self, url):
+        """Recalcula a chave de um download que ainda está na fila"""
+        with self.lock:
+            if url in self.queued:
+                # A entrada antiga fica no heap e é descartada quando chegar ao topo
+                self.push(self.queued[url][2])
+
+    def push(self, job):
+        entry = (self.priority(job[0]), next(self.counter), job)
+        self.queued[job[0]] = entry
+        heapq.heappush(self.heaps.setdefault(connection_key(job[0]), []), entry)
+        if not self.changed.done():
+            self.changed.set_result(None)
+
+    def next_job(self):
+        """Retorna (host, download) de maior prioridade entre os hosts com vaga, ou None"""
+        with self.lock:
+            best = None
+            for host, heap in list(self.heaps.items()):
+                while heap and self.queued.get(heap[0][2][0]) is not heap[0]:
+                    heapq.heappop(heap)
+                if not heap:
+                    del self.heaps[host]
+                elif self.active[host] < self.max_per_host and (best is None or heap[0] < self.heaps[best][0]):
+                    best = host
+            if best is None:
+                return None
+            job = heapq.heappop(self.heaps[best])[2]
+            del self.queued[job[0]]
+            self.active[best] += 1
+            return best, job
+
+    def done(self, host):
+        """Libera a vaga do host quando um download termina"""
+        with self.lock:
+            self.active[host] -= 1
+
+    def watch(self):
+        """Retorna um futuro que será concluído na próxima mudança da fila"""
+        with self.lock:
+            if self.changed.done():
+                self.changed = Future()
+            return self.changed
+
+    def close(self):
+        """Encerra a fila se não há nada pendente; retorna False se ainda há downloads"""
+        with self.lock:
+            if self.queued:
+                return False
+            self.closed = True
+            return True
+
+class ConcurrencyController:
+    """Ajusta o número de downloads simultâneos pela vazão medida (AIMD).
+
+    Enquanto todas as vagas chegam a ficar ocupadas e cada vaga a mais
+    aumenta a vazão, o limite cresce de um em um; uma queda clara da vazão tira uma
+    vaga, e respostas 429/503 ou uma maioria de falhas cortam o limite pela
+    metade. A melhor vazão vista decai aos poucos para que o controlador
+    volte a testar limites maiores quando a rede melhora.
+    """
+
+    def __init__(self, minimum, maximum, start=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = min(max(start or minimum, minimum), maximum)
+        self.lock = threading.Lock()
+        self.best_rate = 0
+        self.last_time = time.monotonic()
+        self.last_bytes = None
+        self.peak = 0  # Maior número de downloads em andamento na janela atual
+        self.completed = 0
+        self.failed = 0
+        self.throttled = 0
+
+    def throttle(self):
+        """Registra uma resposta 429/503 do servidor"""
+        with self.lock:
+            self.throttled += 1
+
+    def record(self, result):
+        """Contabiliza o resultado de um download ("downloaded", "skipped" ou "failed")"""
+        with self.lock:
+            if result == "failed":
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def occupy(self, active):
+        """Registra quantos downloads estão em andamento depois de preencher as vagas"""
+        with self.lock:
+            self.peak = max(self.peak, active)
+
+    def update(self, transferred, active, ceiling=None):
+        """Recalcula o limite a partir do total de bytes transferidos; retorna True se ele mudou.
+
+        O limite é comparado com o pico de downloads da janela, e não só com
+        os ativos agora: o agendador chama update logo depois de retirar os
+        downloads que terminaram, quando sempre há vagas livres.
+        """
+        with self.lock:
+            self.peak = max(self.peak, active)
+            now = time.monotonic()
+            if self.last_bytes is None:
+                self.last_time, self.last_bytes = now, transferred
+                return False
+            elapsed = now - self.last_time
+            if elapsed < ADAPT_INTERVAL:
+                return False
+            rate = (transferred - self.last_bytes) / elapsed
+            self.last_time, self.last_bytes = now, transferred
+            limit = self.limit
+            saturated = self.peak >= limit
+            if self.throttled or (self.failed >= 2 and self.failed > self.completed):
+                limit = limit // 2
+                self.best_rate = rate
+            elif rate < self.best_rate * (1 - ADAPT_TOLERANCE) and saturated:
+                limit -= 1
+                self.best_rate = rate
+            elif saturated and rate > self.best_rate * (1 + ADAPT_TOLERANCE):
+                limit += 1
+                self.best_rate = rate
+            else:
+                self.best_rate *= 1 - ADAPT_TOLERANCE / 2
+            self.completed = self.failed = self.throttled = self.peak = 0
+            limit = min(max(limit, self.minimum), ceiling or self.maximum, self.maximum)
+            changed = limit != self.limit
+            self.limit = limit
+            return changed
+
+def format_size(size):
+    """Formata o tamanho do arquivo"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+class DownloadEngine:
+    """Descoberta de links, agendamento, transferência e histórico, sem interface.
+
+    Tudo o que acontece é informado pela função on_event, que recebe dicionários
+    com a chave "event"; a interface gráfica e a linha de comando apenas
+    consomem esses eventos. Ela é chamada nas threads do motor.
+    """
+    def __init__(self, downloads_folder, on_event=None, headless=False, probe_links=False, fast_hash=False,
+                 browser_fallback=True):
+        self.downloads_folder = downloads_folder
+        self.on_event = on_event
+        self.headless = headless
+        self.probe_links = probe_links
+        self.fast_hash = fast_hash  # Também calcula CRC32, mais rápido de comparar que o SHA-256
+        self.browser_fallback = browser_fallback  # Repete pelo Chrome as transferências diretas que falharem
+        self.found_lock = threading.Lock()
+        self.link_filenames = {}  # URL -> nome informado pelo servidor (Content-Disposition)
+        self.link_sizes = {}  # URL -> tamanho informado pelo servidor
+        self.pinned = set()  # URLs que o usuário mandou baixar primeiro
+        self.batch_targets = {}  # Nome do arquivo -> URL que o grava no lote atual
+        self.expected_checksums = {}  # Nome do arquivo -> SHA-256 publicado
+        self.rehash_pool = None
+        self.rehash_bucket = TokenBucket(REHASH_RATE)
+        self.history_file = os.path.join(downloads_folder, "download_history.db")
+        self.history_store = None
+        self.stop_downloads = False
+        self.closing = False
+        self.driver = None
+        self.driver_lock = threading.Lock()  # O WebDriver não é thread-safe
+        self.driver_pool = None
+        self.max_concurrent = 3
+        self.concurrency = None  # Controlador do ajuste automático, se ativo
+        self.max_per_host = MAX_CONNECTIONS_PER_HOST
+        self.connection_pool = None
+        self.download_queue = None  # Fila do lote em andamento
+        self.bandwidth = BandwidthLimiter()
+        self.http_downloader = None
+        self.segments_per_file = 1
+        self.sync = False  # Baixa de novo os arquivos existentes que mudaram no servidor
+        self.active_downloads = {}  # Armazena informações dos downloads ativos
+        self.download_start_times = {}  # Armazena horário de início dos downloads
+
+    def emit(self, event, **fields):
+        """Envia um evento para quem estiver acompanhando o motor"""
+        if not self.on_event:
+            return
+        try:
+            self.on_event(dict(event=event, **fields))
+        except Exception as e:
+            logging.error(f"Erro ao repassar evento {event}: {str(e)}")
+
+    def open_history(self):
+        """Abre o histórico de downloads, importando o JSON de versões anteriores"""
+        os.makedirs(self.downloads_folder, exist_ok=True)
+        self.history_store = HistoryStore(self.history_file)
+        self.history_store.import_json(os.path.splitext(self.history_file)[0] + ".json")
+        return self.history_store
+
+    def add_history_entry(self, entry):
+        """Adiciona uma entrada ao histórico"""
+        entry.setdefault("id", uuid.uuid4().hex)
+        self.touch_history(entry)
+        return entry
+
+    def touch_history(self, entry):
+        """Grava uma entrada alterada e avisa quem acompanha o histórico"""
+        if self.history_store:
+            self.history_store.save(entry)
+        self.emit("history", entry=entry)
+
+    def search(self, url, email=None, password=None, max_scrolls=DEFAULT_MAX_SCROLLS):
+        """Coleta os links da página, fazendo login e rolando no navegador se preciso.
+
+        Sem credenciais, a página é buscada primeiro via HTTP; o Chrome só é
+        usado se o HTML parecer montado por JavaScript. Os links chegam aos
+        poucos pelo evento "links"; a lista completa, sem repetições, é
+        retornada no final. Com probe_links, os demais links da página são
+        consultados em paralelo e os tamanhos chegam pelo evento "link_info".
+        """
+        found = {}
+        prober = None
+        try:
+            # Sem login, páginas renderizadas no servidor dispensam o navegador
+            page = None if email or password else self.fetch_static_page(url)
+            if page is not None:
+                final_url, headers, extractor = page
+                if self.probe_links:
+                    prober = LinkProber(HttpDownloader(timeout=PROBE_TIMEOUT), self.history_store)
+                if extractor is None:
+                    # A URL leva direto a um arquivo; o nome pode vir só no Content-Disposition
+                    result = classify_probe(response_info(headers))
+                    name = result["filename"] or get_download_filename(final_url) or "Link sem texto"
+                    if self.add_found_link(found, url, name):
+                        self.report_probe(url, result)
+                else:
+                    self.report_links(extractor.links, found, prober)
+            else:
+                with self.driver_lock:
+                    # Inicializa o driver se necessário
+                    if not self.driver:
+                        self.driver = self.setup_driver(profile=DISCOVERY_PROFILE)
+            
+                    # Tenta fazer login se necessário
+                    login_result = self.login(self.driver, url, email, password)
+                    if not login_result and (email or password):
+                        self.emit("warning", message="Não foi possível fazer login. Alguns links podem não estar disponíveis.")
+            
+                    # Navega para a URL
+                    self.driver.get(url)
+            
+                    # Espera página carregar
+                    WebDriverWait(self.driver, 10).until(
+                        EC.presence_of_element_located((By.TAG_NAME, "body"))
+                    )
+            
+                    if self.probe_links:
+                        downloader = HttpDownloader.from_driver(self.driver)
+                        downloader.timeout = PROBE_TIMEOUT
+                        prober = LinkProber(downloader, self.history_store)
+                    self.scroll_and_collect(max_scrolls, found, prober)
+        finally:
+            # As consultas não usam o navegador, então terminam fora da trava
+            if prober:
+                prober.finish()
+        with self.found_lock:
+            links = list(found.items())
+        self.assign_unique_filenames([href for href, _ in links])
+        return links
+
+    def fetch_static_page(self, url):
+        """Busca a página via HTTP, sem o navegador.
+
+        Retorna (URL final, cabeçalhos da resposta, LinkExtractor), ou None
+        quando a página precisa do navegador (erro na busca ou conteúdo montado por
+        JavaScript).
+        """
+        started = time.perf_counter()
+        try:
+            final_url, headers, extractor = fetch_page_links(HttpDownloader(), url)
+        except Exception as e:
+            logging.info(f"Busca direta de {url} falhou, usando o navegador: {str(e)}")
+            return None
+        if extractor is None and not classify_probe(response_info(headers))["downloadable"]:
+            return None
+        if extractor is not None and looks_js_rendered(extractor):
+            logging.info(f"{url} parece montada por JavaScript, usando o navegador")
+            return None
+        logging.info(f"Links de {url} obtidos sem o navegador em {(time.perf_counter() - started) * 1000:.0f} ms")
+        return final_url, headers, extractor
+
+    def scroll_and_collect(self, max_scrolls, found, prober=None):
+        """Rola a página enquanto surgirem links novos, enviando-os a cada rolagem"""
+        last_height = self.driver.execute_script(INSTALL_SCROLL_OBSERVER_SCRIPT)
+        self.driver.set_script_timeout(SCROLL_WAIT_LIMIT_MS / 1000 + 5)
+        pages = self.report_links(self.driver.execute_script(EXTRACT_LINKS_SCRIPT) or [], found, prober)
+        
+        for _ in range(max_scrolls):
+            grew, height = self.driver.execute_async_script(SCROLL_AND_WAIT_SCRIPT, SCROLL_QUIET_MS, SCROLL_WAIT_LIMIT_MS)
+            new_links = self.driver.execute_script(EXTRACT_LINKS_SCRIPT) or []
+            pages.extend(self.report_links(new_links, found, prober))
+            # A página não carregou nada novo dentro do período de silêncio
+            if not grew and not new_links and height == last_height:
+                break
+            last_height = height
+        return pages
+
+    def report_links(self, links, found, prober=None):
+        """Filtra os links extraídos e envia os novos no evento "links" """
+        rows = []
+        candidates = {}  # Links sem extensão conhecida, a consultar
+        pages = []  # Links para outras páginas, usados pelo rastreamento
+        with self.found_lock:
+            for href, text, download_attr, type_hint in links:
+                if href and not href.startswith("mailto:") and href not in found:
+                    text = " ".join(text.split()) or "Link sem texto"
+                    if is_downloadable_link(href, download_attr, type_hint):
+                        found[href] = text
+                        rows.append((href, text))
+                    elif href.startswith(("http://", "https://")):
+                        pages.append(href)
+                        if prober and is_probe_candidate(href):
+                            candidates.setdefault(urllib.parse.urldefrag(href)[0], text)
+        if rows:
+            self.emit("links", rows=rows)
+        if prober:
+            # Os links já aceitos também são consultados, para mostrar o tamanho
+            prober.submit([href for href, _ in rows], self.report_probe)
+            prober.submit(list(candidates), partial(self.report_probed_link, found, candidates))
+        return pages
+
+    def report_probed_link(self, found, candidates, url, result):
+        """Aceita um link sem extensão conhecida se a consulta indicar um arquivo"""
+        if result["downloadable"] and self.add_found_link(found, url, candidates[url]):
+            self.report_probe(url, result)
+
+    def add_found_link(self, found, url, text):
+        """Envia um link avulso no evento "links", se ele ainda não foi encontrado"""
+        with self.found_lock:
+            if url in found:
+                return False
+            found[url] = text
+        self.emit("links", rows=[(url, text)])
+        return True
+
+    def report_probe(self, url, result):
+        """Guarda o nome informado pelo servidor e envia o tamanho no evento "link_info" """
+        if result["filename"]:
+            self.link_filenames[url] = result["filename"]
+        if result["size"] is not None:
+            self.link_sizes[url] = result["size"]
+        self.emit("link_info", url=url, size=result["size"], content_type=result["content_type"])
+
+    def crawl(self, url, max_depth=DEFAULT_CRAWL_DEPTH, max_pages=DEFAULT_CRAWL_PAGES, scope=CRAWL_SCOPE_HOST,
+              email=None, password=None, max_scrolls=DEFAULT_MAX_SCROLLS):
+        """Percorre as páginas a partir da URL, coletando os links de download de todas.
+
+        Até CRAWL_WORKERS páginas são buscadas ao mesmo tempo, via HTTP; o
+        navegador só é usado para login e para páginas montadas por
+        JavaScript. No máximo max_pages URLs entram na fila, então a
+        fronteira nunca cresce além disso. Os links chegam pelo evento
+        "links" enquanto o rastreamento continua.
+        """
+        start_url = normalize_url(url)
+        found = {}
+        prober = None
+        with self.driver_lock:
+            if email or password:
+                if not self.driver:
+                    self.driver = self.setup_driver(profile=DISCOVERY_PROFILE)
+                if not self.login(self.driver, url, email, password):
+                    self.emit("warning", message="Não foi possível fazer login. Alguns links podem não estar disponíveis.")
+            # As páginas são buscadas com a sessão do navegador, se houver
+            downloader = HttpDownloader.from_driver(self.driver)
+            if self.probe_links:
+                probe_downloader = HttpDownloader.from_driver(self.driver)
+                probe_downloader.timeout = PROBE_TIMEOUT
+                prober = LinkProber(probe_downloader, self.history_store)
+        
+        seen = {start_url}
+        frontier = collections.deque([(start_url, 0)])
+        running = {}  # Future -> (URL, profundidade)
+        visited = 0
+        try:
+            with ThreadPoolExecutor(max_workers=CRAWL_WORKERS) as executor:
+                while (frontier or running) and not self.closing:
+                    while frontier and len(running) < CRAWL_WORKERS:
+                        page_url, depth = frontier.popleft()
+                        future = executor.submit(self.crawl_page, downloader, page_url, max_scrolls, found, prober)
+                        running[future] = (page_url, depth)
+                    
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        page_url, depth = running.pop(future)
+                        visited += 1
+                        try:
+                            links = future.result()
+                        except Exception as e:
+                            logging.warning(f"Erro ao rastrear {page_url}: {str(e)}")
+                            continue
+                        if depth >= max_depth:
+                            continue
+                        for link in links:
+                            link = normalize_url(link)
+                            if len(seen) >= max_pages:
+                                break
+                            if link not in seen and in_crawl_scope(link, start_url, scope):
+                                seen.add(link)
+                                frontier.append((link, depth + 1))
+                    
+                    with self.found_lock:
+                        total_links = len(found)
+                    self.emit("status", message=f"Rastreando... {visited} páginas visitadas, {total_links} links encontrados")
+        finally:
+            if prober:
+                prober.finish()
+        with self.found_lock:
+            links = list(found.items())
+        # Pastas diferentes do site costumam repetir nomes (ex.: /v1/manual.pdf e /v2/manual.pdf)
+        self.assign_unique_filenames([href for href, _ in links])
+        return links
+
+    def crawl_page(self, downloader, url, max_scrolls, found, prober=None):
+        """Coleta os links de uma página do rastreamento e retorna os links para outras páginas"""
+        try:
+            final_url, headers, extractor = fetch_page_links(downloader, url)
+        except urllib.error.HTTPError as e:
+            if e.code in (404, 410):
+                return []
+            logging.info(f"Busca direta de {url} falhou, usando o navegador: {str(e)}")
+            return self.browse_page(url, max_scrolls, found, prober)
+        
+        if extractor is None:
+            # O link leva direto a um arquivo; o nome pode vir só no Content-Disposition
+            result = classify_probe(response_info(headers))
+            name = result["filename"] or get_download_filename(final_url) or "Link sem texto"
+            if result["downloadable"] and self.add_found_link(found, url, name):
+                self.report_probe(url, result)
+            return []
+        if looks_js_rendered(extractor):
+            return self.browse_page(url, max_scrolls, found, prober)
+        return self.report_links(extractor.links, found, prober)
+
+    def browse_page(self, url, max_scrolls, found, prober=None):
+        """Carrega a página no navegador, para conteúdo gerado por JavaScript"""
+        with self.driver_lock:
+            if not self.driver:
+                self.driver = self.setup_driver(profile=DISCOVERY_PROFILE)
+            self.driver.get(url)
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.TAG_NAME, "body"))
+            )
+            return self.scroll_and_collect(max_scrolls, found, prober)
+
+    def filename_for(self, link):
+        """Nome do arquivo do link, preferindo o informado pelo servidor"""
+        return self.link_filenames.get(link) or get_download_filename(link)
+
+    def assign_unique_filenames(self, links):
+        """Dá nomes distintos aos links encontrados que gravariam no mesmo arquivo.
+
+        O link de caminho mais curto fica com o nome original; os demais
+        ganham as pastas da URL no nome e, se ainda houver conflito, um número.
+        """
+        groups = collections.defaultdict(list)  # Nome -> links
+        for link in links:
+            groups[self.filename_for(link)].append(link)
+        taken = set(groups)
+        for filename, group in groups.items():
+            if len(group) < 2:
+                continue
+            group.sort(key=lambda link: (urllib.parse.urlparse(link).path.count("/"), link))
+            for link in group[1:]:
+                name = qualified_filename(link, filename)
+                number = 2
+                while name in taken:
+                    name = numbered_filename(filename, number)
+                    number += 1
+                taken.add(name)
+                self.link_filenames[link] = name
+
+    def download_priority(self, url):
+        """Chave de prioridade: fixados primeiro, depois os menores de tamanho conhecido"""
+        size = self.link_sizes.get(url)
+        return (url not in self.pinned, size is None, size or 0)
+
+    def pin_download(self, url, pinned=True):
+        """Fixa (ou solta) um link no topo da fila, inclusive durante o lote"""
+        if pinned:
+            self.pinned.add(url)
+        else:
+            self.pinned.discard(url)
+        download_queue = self.download_queue
+        if download_queue:
+            download_queue.reprioritize(url)
+
+    def enqueue_downloads(self, jobs):
+        """Acrescenta links [(url, texto)] ao lote em andamento.
+
+        Retorna False se não há lote rodando; nesse caso é preciso chamar
+        run_downloads.
+        """
+        download_queue = self.download_queue
+        if not download_queue or self.stop_downloads:
+            return False
+        for job in jobs:
+            if not download_queue.add(job):
+                return False
+        return True
+
+    def run_downloads(self, jobs, max_concurrent, segments_per_file=1, max_per_host=None, auto_concurrency=None,
+                      use_async=False, sync=False):
+        """Baixa os links [(url, texto)] e retorna (baixados, ignorados, falhas).
+
+        Os menores arquivos (e os fixados pelo usuário) saem primeiro, e cada
+        resultado é contabilizado assim que o download termina, em qualquer
+        ordem. Links podem ser acrescentados com enqueue_downloads enquanto
+        o lote roda. Com auto_concurrency, max_concurrent é só o ponto de
+        partida: o número de downloads simultâneos varia entre 1 e
+        auto_concurrency conforme a vazão medida. Com use_async, as
+        transferências rodam em um laço asyncio em vez de uma thread por
+        download, o que comporta milhares de arquivos pequenos ao mesmo tempo.
+        Com sync, arquivos que já existem são conferidos com uma requisição
+        condicional (ETag/Last-Modified) e só baixados de novo se mudaram; o
+        evento "finished" traz então o resumo de novos, alterados e inalterados.
+        """
+        if auto_concurrency:
+            self.concurrency = ConcurrencyController(1, auto_concurrency, max_concurrent)
+            max_workers = auto_concurrency
+        else:
+            self.concurrency = None
+            max_workers = max_concurrent
+        self.max_concurrent = max_workers
+        self.segments_per_file = segments_per_file
+        self.max_per_host = max_per_host or self.max_per_host
+        self.sync = sync
+        self.batch_targets = {}
+        
+        # O navegador fica restrito à descoberta e ao login; os bytes
+        # são transferidos diretamente usando a sessão dele, com conexões
+        # reaproveitadas entre os arquivos do mesmo host
+        self.connection_pool = ConnectionPool(self.max_per_host)
+        self.http_downloader = HttpDownloader.from_driver(self.driver, self.connection_pool, self.bandwidth)
+        host_queue = HostQueue(jobs, self.max_per_host, self.download_priority)
+        self.download_queue = host_queue
+        totals = collections.Counter()  # Resultado -> quantidade
+        
+        # O progresso dos downloads do navegador chega pelos eventos do DevTools
+        batch_done = threading.Event()
+        monitor = threading.Thread(target=self.monitor_browser_downloads, args=(batch_done,), daemon=True)
+        monitor.start()
+        
+        try:
+            if use_async:
+                asyncio.run(self.run_async_batch(host_queue, totals))
+            else:
+                self.run_thread_batch(host_queue, totals)
+        finally:
+            host_queue.closed = True
+            self.download_queue = None
+            batch_done.set()
+            self.connection_pool.close()
+            self.close_driver_pool()
+            if self.stop_downloads:
+                self.close_driver()
+            if self.history_store:
+                self.history_store.flush()
+        
+        downloaded = totals["downloaded"] + totals["changed"]
+        skipped = totals["skipped"] + totals["unchanged"]
+        failed = totals["failed"]
+        if sync:
+            new, changed, unchanged = totals["downloaded"], totals["changed"], skipped
+            summary = f"{new} novos, {changed} alterados, {unchanged} inalterados"
+            if failed:
+                summary += f", {failed} falhas"
+            self.emit("finished", downloaded=downloaded, skipped=skipped, failed=failed,
+                      new=new, changed=changed, unchanged=unchanged, summary=summary)
+        else:
+            self.emit("finished", downloaded=downloaded, skipped=skipped, failed=failed)
+        return downloaded, skipped, failed
+
+    def run_thread_batch(self, host_queue, totals):
+        """Executa o lote com uma thread por download"""
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
+            running = {}  # Future -> host
+            try:
+                while True:
+                    changed = host_queue.watch()
+                    limit = self.concurrency_limit(len(running))
+                    # Ocupa as vagas livres com downloads de hosts que ainda estão abaixo do limite
+                    while len(running) < limit and not self.stop_downloads:
+                        entry = host_queue.next_job()
+                        if entry is None:
+                            break
+                        host, (link, link_text) = entry
+                        running[executor.submit(self.process_single_download, link, link_text)] = host
+                    if self.concurrency:
+                        self.concurrency.occupy(len(running))
+                    if not running and (self.stop_downloads or host_queue.close()):
+                        break
+                    self.emit("status", message=self.concurrency_status(len(running), limit))
+                    
+                    # Acorda também quando links são acrescentados ou repriorizados e,
+                    # no modo automático, a cada ajuste do limite
+                    done, _ = wait(list(running) + [changed], return_when=FIRST_COMPLETED,
+                                   timeout=ADAPT_INTERVAL if self.concurrency else None)
+                    for future in done:
+                        if future in running:
+                            host_queue.done(running.pop(future))
+                            self.record_result(future, totals, host_queue)
+                self.emit("status", message=self.concurrency_status(0, limit))
+            except KeyboardInterrupt:
+                # Sem isso o executor esperaria todos os downloads terminarem
+                self.stop_downloads = True
+                raise
+
+    async def run_async_batch(self, host_queue, totals):
+        """Executa o lote em um laço asyncio, com uma tarefa por download.
+
+        Os semáforos do AsyncConnectionPool limitam as conexões por host e no
+        total; os eventos seguem pelo on_event, como no modo com threads.
+        """
+        pool = AsyncConnectionPool(self.max_per_host, self.max_concurrent)
+        downloader = AsyncHttpDownloader(self.http_downloader, pool)
+        running = {}  # Tarefa -> host
+        watched = changed = None
+        try:
+            while True:
+                # O futuro da fila é concluído por outras threads; só é embrulhado quando muda
+                future = host_queue.watch()
+                if future is not watched:
+                    watched, changed = future, asyncio.wrap_future(future)
+                limit = self.concurrency_limit(len(running))
+                while len(running) < limit and not self.stop_downloads:
+                    entry = host_queue.next_job()
+                    if entry is None:
+                        break
+                    host, (link, link_text) = entry
+                    running[asyncio.create_task(self.process_async_download(downloader, link, link_text))] = host
+                if self.concurrency:
+                    self.concurrency.occupy(len(running))
+                if not running and (self.stop_downloads or host_queue.close()):
+                    break
+                self.emit("status", message=self.concurrency_status(len(running), limit))
+                
+                done, _ = await asyncio.wait(list(running) + [changed], return_when=asyncio.FIRST_COMPLETED,
+                                             timeout=ADAPT_INTERVAL if self.concurrency else None)
+                for task in done:
+                    if task in running:
+                        host_queue.done(running.pop(task))
+                        self.record_result(task, totals, host_queue)
+            self.emit("status", message=self.concurrency_status(0, limit))
+        except asyncio.CancelledError:
+            # Ctrl+C: as transferências param no próximo bloco e gravam o diário
+            self.stop_downloads = True
+            raise
+        finally:
+            if running:
+                await asyncio.wait(list(running))
+            pool.close()
+
+    def record_result(self, future, totals, host_queue):
+        """Contabiliza um download terminado e informa o progresso do lote"""
+        try:
+            result = future.result()
+        except Exception as e:
+            result = "failed"
+            logging.error(f"Erro no download: {str(e)}")
+        if result not in ("downloaded", "skipped", "changed", "unchanged"):
+            result = "failed"
+        totals[result] += 1
+        if self.concurrency:
+            self.concurrency.record(result)
+        self.emit("batch", done=sum(totals.values()), total=host_queue.total)
+
+    def concurrency_limit(self, active):
+        """Número de downloads simultâneos permitido agora"""
+        if not self.concurrency:
+            return self.max_concurrent
+        # Downloads pelo navegador dependem das instâncias do Chrome; enquanto houver
+        # algum, o limite não passa do tamanho do pool de navegadores
+        browser_bound = any(info.get('engine') == 'browser' for info in list(self.active_downloads.values()))
+        self.concurrency.update(self.bandwidth.transferred, active,
+                                MAX_BROWSER_DOWNLOADS if browser_bound else None)
+        return self.concurrency.limit
+
+    def concurrency_status(self, active, limit):
+        """Texto do status com os downloads ativos e o limite em uso"""
+        if self.concurrency:
+            return f"Downloads ativos: {active} / {limit} (automático)"
+        return f"Downloads ativos: {active} / {limit}"
+
+    def begin_download(self, link, link_text=None):
+        """Registra o início de um download no histórico e no monitoramento.
+
+        Retorna (nome do arquivo, entrada do histórico, validadores); a
+        entrada é None se o arquivo já existe na pasta. Levanta ValueError se
+        outro link do lote já grava no mesmo arquivo. Os validadores vão
+        para a transferência: na sincronização, os de um arquivo existente
+        tornam a requisição condicional; nos demais casos o dicionário vazio
+        só recebe os da versão baixada.
+        """
+        filename = self.filename_for(link)
+        display_name = link_text if link_text else filename
+        history_fields = {
+            "url": link,
+            "filename": filename,
+            "display_name": display_name,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        
+        # Dois links do lote com o mesmo nome gravariam o mesmo .part e o mesmo diário
+        owner = self.batch_targets.setdefault(filename, link)
+        if owner != link:
+            message = f"{filename} já é o destino de {owner}"
+            self.add_history_entry(dict(history_fields, status=f"Erro: {message}", size="N/A"))
+            raise ValueError(message)
+        
+        # Verificar se já existe
+        validators = {}
+        previous = None
+        if self.sync and is_already_downloaded(self.downloads_folder, filename):
+            # Sincronização: a entrada do histórico é reaproveitada, para que
+            # sincronizações diárias não a multipliquem
+            previous = self.latest_entry(link, filename)
+        if self.is_complete(link, filename):
+            if not self.sync:
+                self.add_history_entry(dict(history_fields,
+                    status="Já existente",
+                    size=self.get_file_size(filename)
+                ))
+                return filename, None, None
+            # Sincronização: o arquivo só é baixado de novo se mudou no servidor
+            validators = self.stored_validators(link, filename)
+        
+        # O mesmo conteúdo já foi baixado com outro nome: liga o arquivo a ele
+        record = None if validators else self.link_known_content(link, filename)
+        if record:
+            self.add_history_entry(dict(history_fields,
+                status="Já existente",
+                size=self.get_file_size(filename),
+                bytes=record["bytes"],
+                sha256=record["sha256"],
+                crc32=record["crc32"]
+            ))
+            return filename, None, None
+        
+        # Adicionar entrada inicial no histórico
+        download_entry = self.add_history_entry(dict(previous or {}, **history_fields,
+            status="Baixando...",
+            size="N/A"
+        ))
+        self.active_downloads[filename] = {
+            'url': link,
+            'display_name': display_name,
+            'status': 'Iniciando...',
+            'engine': 'http'
+        }
+        self.download_start_times[filename] = time.time()
+        return filename, download_entry, validators
+
+    def latest_entry(self, link, filename):
+        """Última entrada do histórico do link para o mesmo arquivo, se houver"""
+        if not self.history_store:
+            return None
+        entries = [entry for entry in self.history_store.find("url", link) if entry["filename"] == filename]
+        return entries[-1] if entries else None
+
+    def stored_validators(self, link, filename):
+        """Validadores para conferir se um arquivo existente mudou no servidor"""
+        path = os.path.join(self.downloads_folder, filename)
+        stored = self.history_store.get_validators([link]).get(link) if self.history_store else None
+        if stored and (stored["etag"] or stored["last_modified"]) and stored["size"] in (None, os.path.getsize(path)):
+            return {"etag": stored["etag"], "last_modified": stored["last_modified"]}
+        # Arquivo baixado antes da sincronização existir: compara com a data do arquivo local
+        return {"last_modified": email.utils.formatdate(os.path.getmtime(path), usegmt=True)}
+
+    def finish_download(self, filename, download_entry, completed=False, error=None, hasher=None,
+                        link=None, validators=None, replaced=False):
+        """Registra o fim de um download.
+
+        Retorna "downloaded", "changed" (arquivo existente que mudou no
+        servidor), "unchanged" (o servidor respondeu 304) ou "failed".
+        """
+        try:
+            if isinstance(error, NotModified):
+                download_entry["status"] = "Inalterado"
+                download_entry["size"] = self.get_file_size(filename)
+                return "unchanged"
+            if error is None and completed:
+                if hasher and not self.record_content(filename, download_entry, hasher):
+                    return "failed"
+                download_entry["status"] = "Concluído"
+                download_entry["size"] = self.get_file_size(filename)
+                if link and self.history_store and conditional_headers(validators):
+                    self.history_store.save_validators(link, validators)
+                return "changed" if replaced else "downloaded"
+            if isinstance(error, DownloadCancelled):
+                if os.path.exists(os.path.join(self.downloads_folder, filename + '.part')):
+                    download_entry["status"] = "Interrompido (será retomado)"
+                else:
+                    download_entry["status"] = "Cancelado"
+            elif error is not None:
+                download_entry["status"] = f"Erro: {str(error)}"
+            else:
+                download_entry["status"] = "Erro no download"
+            return "failed"
+        finally:
+            # Remove do monitoramento
+            self.active_downloads.pop(filename, None)
+            self.download_start_times.pop(filename, None)
+            self.touch_history(download_entry)
+
+    def content_record(self, filename):
+        """Última entrada do histórico com hash para o nome de arquivo, se houver"""
+        if not self.history_store:
+            return None
+        records = [entry for entry in self.history_store.find("filename", filename) if entry["sha256"]]
+        return records[-1] if records else None
+
+    def is_complete(self, link, filename):
+        """Verifica se o arquivo já está na pasta e inteiro.
+
+        Um arquivo com o nome certo é baixado de novo se o tamanho não bate com
+        o informado pelo servidor ou com o registrado no histórico (download
+        truncado), ou se o hash não confere com o checksum publicado.
+        """
+        if not is_already_downloaded(self.downloads_folder, filename):
+            return False
+        path = os.path.join(self.downloads_folder, filename)
+        size = os.path.getsize(path)
+        record = self.content_record(filename)
+        expected_size = self.link_sizes.get(link) or (record and int(record["bytes"] or 0))
+        if expected_size and expected_size != size:
+            logging.info(f"{filename} tem {size} bytes em vez de {expected_size}, baixando de novo")
+            return False
+        expected = self.expected_checksums.get(filename)
+        if expected:
+            if record and int(record["bytes"] or 0) == size:
+                digest = record["sha256"]
+            else:
+                digest = ContentHasher().update_file(path).hexdigest()
+            if digest != expected:
+                logging.info(f"{filename} não confere com o checksum publicado, baixando de novo")
+                return False
+        return True
+
+    def find_content(self, sha256, exclude=None):
+        """Caminho de um arquivo da pasta com o hash informado, se ainda existir intacto"""
+        if not self.history_store or not sha256:
+            return None, None
+        for entry in self.history_store.find("sha256", sha256):
+            if entry["filename"] == exclude:
+                continue
+            path = os.path.join(self.downloads_folder, entry["filename"])
+            if os.path.isfile(path) and os.path.getsize(path) == int(entry["bytes"] or 0):
+                return path, entry
+        return None, None
+
+    def link_known_content(self, link, filename):
+        """Se a URL já foi baixada com outro nome, cria um hardlink em vez de baixar.
+
+        Retorna a entrada do histórico do conteúdo reaproveitado, ou None.
+        """
+        if not self.history_store:
+            return None
+        for entry in reversed(self.history_store.find("url", link)):
+            expected = self.expected_checksums.get(filename)
+            if expected and entry["sha256"] != expected:
+                continue
+            source, record = self.find_content(entry["sha256"], exclude=filename)
+            if source:
+                try:
+                    os.link(source, os.path.join(self.downloads_folder, filename))
+                except OSError as e:
+                    # Sistemas de arquivos sem hardlink: baixa normalmente
+                    logging.warning(f"Não foi possível ligar {filename} a {source}: {str(e)}")
+                    return None
+                logging.info(f"{filename} ligado a {source}, conteúdo já baixado")
+                return record
+        return None
+
+    def record_content(self, filename, download_entry, hasher):
+        """Guarda o hash do download, confere o checksum publicado e remove duplicatas.
+
+        Retorna False se o arquivo não confere com o checksum (ele é apagado).
+        """
+        path = os.path.join(self.downloads_folder, filename)
+        digest = hasher.hexdigest()
+        expected = self.expected_checksums.get(filename)
+        if expected and digest != expected:
+            os.remove(path)
+            download_entry["status"] = "Erro: checksum não confere"
+            logging.error(f"Checksum de {filename} não confere: esperado {expected}, obtido {digest}")
+            return False
+        download_entry["bytes"] = hasher.size
+        download_entry["sha256"] = digest
+        download_entry["crc32"] = hasher.fast_digest()
+
+        # O mesmo conteúdo com outro nome: troca a cópia por um hardlink
+        source, _ = self.find_content(digest, exclude=filename)
+        if source and not os.path.samefile(source, path):
+            temp_path = path + '.link'
+            try:
+                os.link(source, temp_path)
+                os.replace(temp_path, path)
+                logging.info(f"{filename} é igual a {source}; cópia trocada por um hardlink")
+            except OSError as e:
+                logging.warning(f"Não foi possível ligar {filename} a {source}: {str(e)}")
+        return True
+
+    def load_checksums(self, source):
+        """Carrega checksums publicados (arquivo ou URL no formato do sha256sum) e retorna quantos"""
+        if urllib.parse.urlparse(source).scheme in ("http", "https"):
+            downloader = self.http_downloader or HttpDownloader.from_driver(self.driver)
+            with downloader.open(source) as response:
+                text = response.read().decode("utf-8", errors="replace")
+        else:
+            with open(source, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        checksums = parse_checksums(text)
+        self.expected_checksums.update(checksums)
+        return len(checksums)
+
+    def rehash_existing(self):
+        """Calcula em segundo plano o hash dos arquivos do histórico que ainda não têm.
+
+        Usa no máximo REHASH_WORKERS threads e REHASH_RATE bytes/s de leitura,
+        para não disputar o disco com os downloads. Retorna os futuros.
+        """
+        if not self.history_store:
+            return []
+        if self.rehash_pool is None:
+            self.rehash_pool = ThreadPoolExecutor(max_workers=REHASH_WORKERS)
+        return [self.rehash_pool.submit(self.rehash_entry, entry) for entry in self.history_store.find_unhashed()]
+
+    def rehash_entry(self, entry):
+        """Calcula o hash de um arquivo já baixado e o grava no histórico"""
+        path = os.path.join(self.downloads_folder, entry["filename"] or "")
+        if self.closing or not os.path.isfile(path):
+            return
+        try:
+            hasher = ContentHasher(self.fast_hash).update_file(path, self.rehash_bucket, lambda: self.closing)
+        except DownloadCancelled:
+            return
+        except OSError as e:
+            logging.error(f"Erro ao calcular hash de {path}: {str(e)}")
+            return
+        entry["bytes"] = hasher.size
+        entry["sha256"] = hasher.hexdigest()
+        entry["crc32"] = hasher.fast_digest()
+        if not self.closing:
+            self.touch_history(entry)
+
+    def throttle_delay(self, error, attempt):
+        """Espera antes de repetir uma transferência recusada com 429/503.
+
+        Retorna None se o erro não é desse tipo ou se as tentativas acabaram.
+        """
+        if not (isinstance(error, urllib.error.HTTPError) and error.code in THROTTLE_STATUS):
+            return None
+        if self.concurrency:
+            # O servidor pediu menos conexões; o controlador reduz o limite
+            self.concurrency.throttle()
+        if attempt >= THROTTLE_RETRIES:
+            return None
+        delay = THROTTLE_BACKOFF * 2 ** attempt
+        retry_after = error.headers.get("Retry-After") if error.headers else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    when = email.utils.parsedate_to_datetime(retry_after)
+                    delay = when.timestamp() - time.time()
+                except (TypeError, ValueError):
+                    pass
+        return min(max(delay, 0), THROTTLE_MAX_DELAY)
+
+    def fall_back_to_browser(self, link, filename, error):
+        """Registra a falha da transferência direta; retorna False se o navegador não deve ser usado"""
+        if isinstance(error, urllib.error.HTTPError) and error.code in THROTTLE_STATUS:
+            # O navegador só mandaria mais pedidos ao servidor que pediu menos conexões
+            return False
+        if not self.browser_fallback:
+            return False
+        # Alguns sites só entregam o arquivo pelo navegador (links gerados via JS)
+        logging.warning(f"Transferência direta falhou para {link}, usando o navegador: {str(error)}")
+        self.active_downloads[filename]['engine'] = 'browser'
+        return True
+
+    def transfer(self, link, filename, validators):
+        """Transfere o arquivo diretamente ou, se isso falhar, pelo navegador.
+
+        Respostas 429/503 são repetidas com espera crescente, sem recorrer ao
+        navegador. Se o navegador também falhar, o erro informado é o da
+        transferência direta. Retorna (concluído, hasher).
+        """
+        attempt = 0
+        while True:
+            hasher = ContentHasher(self.fast_hash)
+            try:
+                return self.download_via_http(link, filename, hasher, validators), hasher
+            except (DownloadCancelled, NotModified):
+                raise
+            except Exception as e:
+                delay = self.throttle_delay(e, attempt)
+                if delay is None:
+                    if not self.fall_back_to_browser(link, filename, e):
+                        raise
+                    hasher = ContentHasher(self.fast_hash)
+                    try:
+                        return self.download_via_browser(link, filename, hasher), hasher
+                    except DownloadCancelled:
+                        raise
+                    except Exception as browser_error:
+                        # O erro da transferência direta explica a falha melhor que o do navegador
+                        logging.error(f"Erro no download pelo navegador de {link}: {str(browser_error)}")
+                        raise e
+            attempt += 1
+            logging.warning(f"Servidor pediu menos conexões para {link}; nova tentativa em {delay:.1f}s")
+            deadline = time.monotonic() + delay
+            while time.monotonic() < deadline:
+                if self.stop_downloads:
+                    raise DownloadCancelled()
+                time.sleep(min(0.5, deadline - time.monotonic()))
+
+    async def transfer_async(self, downloader, link, filename, validators):
+        """Equivalente de transfer para o laço asyncio"""
+        attempt = 0
+        while True:
+            hasher = ContentHasher(self.fast_hash)
+            try:
+                return await self.download_via_async(downloader, link, filename, hasher, validators), hasher
+            except (DownloadCancelled, NotModified):
+                raise
+            except Exception as e:
+                delay = self.throttle_delay(e, attempt)
+                if delay is None:
+                    if not self.fall_back_to_browser(link, filename, e):
+                        raise
+                    hasher = ContentHasher(self.fast_hash)
+                    loop = asyncio.get_running_loop()
+                    try:
+                        completed = await loop.run_in_executor(None, self.download_via_browser, link, filename, hasher)
+                        return completed, hasher
+                    except DownloadCancelled:
+                        raise
+                    except Exception as browser_error:
+                        # O erro da transferência direta explica a falha melhor que o do navegador
+                        logging.error(f"Erro no download pelo navegador de {link}: {str(browser_error)}")
+                        raise e
+            attempt += 1
+            logging.warning(f"Servidor pediu menos conexões para {link}; nova tentativa em {delay:.1f}s")
+            deadline = time.monotonic() + delay
+            while time.monotonic() < deadline:
+                if self.stop_downloads:
+                    raise DownloadCancelled()
+                await asyncio.sleep(min(0.5, deadline - time.monotonic()))
+
+    def process_single_download(self, link, link_text=None):
+        """Processa um único download"""
+        try:
+            filename, download_entry, validators = self.begin_download(link, link_text)
+            if download_entry is None:
+                return "skipped"
+            # O arquivo da pasta só é trocado no fim, então ainda indica se a versão é nova
+            replaced = is_already_downloaded(self.downloads_folder, filename)
+            try:
+                completed, hasher = self.transfer(link, filename, validators)
+            except Exception as e:
+                return self.finish_download(filename, download_entry, error=e)
+            return self.finish_download(filename, download_entry, completed, hasher=hasher,
+                                        link=link, validators=validators, replaced=replaced)
+        except Exception as e:
+            logging.error(f"Erro ao processar download de {link}: {str(e)}")
+            return "failed"
+
+    async def process_async_download(self, downloader, link, link_text=None):
+        """Processa um único download no laço asyncio.
+
+        Arquivos grandes que seriam divididos em segmentos, downloads a retomar
+        e links atrás de proxy seguem pelo process_single_download, em uma
+        thread, sem bloquear o laço.
+        """
+        loop = asyncio.get_running_loop()
+        if self.needs_thread(link):
+            return await loop.run_in_executor(None, self.process_single_download, link, link_text)
+        try:
+            filename, download_entry, validators = self.begin_download(link, link_text)
+            if download_entry is None:
+                return "skipped"
+            replaced = is_already_downloaded(self.downloads_folder, filename)
+            try:
+                completed, hasher = await self.transfer_async(downloader, link, filename, validators)
+            except Exception as e:
+                return self.finish_download(filename, download_entry, error=e)
+            return self.finish_download(filename, download_entry, completed, hasher=hasher,
+                                        link=link, validators=validators, replaced=replaced)
+        except Exception as e:
+            logging.error(f"Erro ao processar download de {link}: {str(e)}")
+            return "failed"
+
+    def needs_thread(self, link):
+        """Indica se o download precisa do HttpDownloader (segmentos, retomada ou proxy)"""
+        if self.http_downloader.uses_proxy(link):
+            return True
+        size = self.link_sizes.get(link)
+        if self.segments_per_file > 1 and size and size >= 2 * MIN_SEGMENT_SIZE:
+            return True
+        file_path = os.path.join(self.downloads_folder, self.filename_for(link))
+        return os.path.exists(file_path + '.part.json') or os.path.exists(file_path + '.crdownload')
+    
+    def progress_reporter(self, link):
+        """Cria a função que repassa o progresso de uma transferência direta"""
+        def on_progress(received, total, segments=None):
+            if total:
+                progress = int(received * 100 / total)
+                status = f"Baixando - {format_size(received)}/{format_size(total)}"
+            else:
+                progress = 0
+                status = f"Baixando - {format_size(received)}"
+            self.emit("progress", url=link, progress=progress, status=status,
+                      received=received, total=total)
+            if segments:
+                self.emit("segments", url=link, segments=segments)
+        return on_progress
+
+    def download_via_http(self, link, filename, hasher=None, validators=None):
+        """Transfere o arquivo diretamente, sem passar pelo navegador"""
+        file_path = os.path.join(self.downloads_folder, filename)
+        try:
+            self.http_downloader.download(link, file_path, self.progress_reporter(link), lambda: self.stop_downloads,
+                                          connections=self.segments_per_file, hasher=hasher, validators=validators)
+        finally:
+            self.emit("segments", url=link, segments=[])
+        self.emit("progress", url=link, progress=100, status="Concluído")
+        return True
+
+    async def download_via_async(self, downloader, link, filename, hasher=None, validators=None):
+        """Transfere o arquivo pelo laço asyncio"""
+        file_path = os.path.join(self.downloads_folder, filename)
+        await downloader.download(link, file_path, self.progress_reporter(link), lambda: self.stop_downloads,
+                                  hasher, validators)
+        self.emit("progress", url=link, progress=100, status="Concluído")
+        return True
+
+    def download_via_browser(self, link, filename, hasher=None):
+        """Baixa o arquivo com uma instância do Chrome do pool e o move para a pasta final"""
+        pool = self.get_driver_pool()
+        worker = pool.acquire()
+        try:
+            # Registra antes de navegar para não perder o evento de conclusão
+            worker.notifier.expect(filename)
+            with worker.lock:
+                worker.driver.get(link)
+            if not worker.notifier.wait(filename, should_stop=lambda: self.stop_downloads):
+                return False
+            os.replace(os.path.join(worker.folder, filename), os.path.join(self.downloads_folder, filename))
+            if hasher:
+                # O Chrome grava o arquivo sozinho; o hash exige uma nova leitura
+                hasher.update_file(os.path.join(self.downloads_folder, filename))
+            return True
+        finally:
+            pool.release(worker)
+
+    def get_driver_pool(self):
+        """Cria o pool de navegadores na primeira vez que um download precisar dele"""
+        with self.driver_lock:
+            if self.driver_pool is None:
+                cookies = []
+                if self.driver:
+                    try:
+                        cookies = self.driver.get_cookies()
+                    except Exception as e:
+                        logging.error(f"Erro ao copiar cookies do navegador: {str(e)}")
+                self.driver_pool = DriverPool(
+                    self.setup_driver,
+                    os.path.join(self.downloads_folder, ".navegadores"),
+                    min(self.max_concurrent, MAX_BROWSER_DOWNLOADS),
+                    cookies
+                )
+            return self.driver_pool
+
+    def close_driver_pool(self):
+        """Fecha as instâncias do pool de navegadores"""
+        with self.driver_lock:
+            pool, self.driver_pool = self.driver_pool, None
+        if pool:
+            pool.close()
+
+    def set_bandwidth_limits(self, global_rate=0, per_host=0, per_download=0):
+        """Limita a banda (bytes/s, 0 = sem limite), inclusive dos downloads em andamento"""
+        self.bandwidth.set_limits(global_rate, per_host, per_download)
+
+    def monitor_browser_downloads(self, done):
+        """Repassa o progresso dos downloads do navegador e a taxa efetiva até o lote terminar"""
+        self.bandwidth.measure()
+        last_rate = time.monotonic()
+        while not done.wait(0.5):
+            if time.monotonic() - last_rate >= RATE_INTERVAL:
+                self.emit("rate", bytes_per_second=self.bandwidth.measure())
+                last_rate = time.monotonic()
+            try:
+                pool = self.driver_pool
+                if pool:
+                    for worker in pool.snapshot():
+                        self.pump_worker_events(worker)
+            except Exception as e:
+                logging.error(f"Erro no monitoramento: {str(e)}")
+
+    def pump_worker_events(self, worker):
+        """Repassa os eventos de uma instância do pool"""
+        # Não espera o driver: se ele estiver navegando, os eventos ficam para a próxima rodada
+        if not worker.lock.acquire(blocking=False):
+            return
+        try:
+            updates = worker.tracker.poll()
+        finally:
+            worker.lock.release()
+
+        for download in updates:
+            filename = download.get("filename", "")
+            if filename not in self.active_downloads:
+                filename = next((name for name, info in self.active_downloads.items()
+                                 if info['url'] == download.get("url")), filename)
+            link = self.active_downloads.get(filename, {}).get('url', download.get("url"))
+
+            received, total = download["received"], download["total"]
+            if download["state"] == "completed":
+                worker.notifier.notify(filename)
+                progress, status = 100, "Concluído"
+            elif download["state"] == "canceled":
+                progress, status = 0, "Cancelado"
+            elif total:
+                progress = int(received * 100 / total)
+                status = f"Baixando - {format_size(received)}/{format_size(total)}"
+            else:
+                progress, status = 0, f"Baixando - {format_size(received)}"
+            self.emit("progress", url=link, progress=progress, status=status,
+                      received=received, total=total)
+
+    def get_file_size(self, filename):
+        """Retorna o tamanho do arquivo em formato legível"""
+        try:
+            file_path = os.path.join(self.downloads_folder, filename)
+            if os.path.exists(file_path):
+                size = os.path.getsize(file_path)
+                if size < 1024:
+                    return f"{size} B"
+                elif size < 1024 * 1024:
+                    return f"{size/1024:.1f} KB"
+                elif size < 1024 * 1024 * 1024:
+                    return f"{size/(1024*1024):.1f} MB"
+                else:
+                    return f"{size/(1024*1024*1024):.1f} GB"
+            return "N/A"
+        except:
+            return "N/A"
+
+    def setup_driver(self, download_folder=None, profile=DOWNLOAD_PROFILE):
+        """Configura o driver do Chrome com opções otimizadas"""
+        return setup_driver(download_folder or self.downloads_folder, profile, self.headless)
+
+    def prewarm_driver(self):
+        """Importa o Selenium, resolve o ChromeDriver e abre o Chrome de descoberta antes da primeira busca"""
+        try:
+            load_selenium()
+            resolve_chromedriver()
+            # Se uma busca já estiver usando o driver, ela mesma o inicializa
+            if not self.driver_lock.acquire(blocking=False):
+                return
+            try:
+                if self.driver is None and not self.closing:
+                    self.driver = self.setup_driver(profile=DISCOVERY_PROFILE)
+                    if self.closing:
+                        self.close_driver()
+            finally:
+                self.driver_lock.release()
+        except Exception as e:
+            logging.error(f"Erro ao pré-aquecer o Chrome: {str(e)}")
+
+    def login(self, driver, url, email, password):
+        """Tenta fazer login no site se as credenciais forem fornecidas"""
+        try:
+            # Se não houver credenciais, assume que não precisa de login
+            if not email and not password:
+                logging.info("Nenhuma credencial fornecida, tentando acessar diretamente")
+                return True
+
+            # Tenta encontrar o formulário de login
+            driver.get(url)
+            time.sleep(2)  # Espera a página carregar
+            
+            # Procura por campos de login comuns
+            email_fields = driver.find_elements(By.CSS_SELECTOR, 'input[type="email"], input[name="email"]')
+            password_fields = driver.find_elements(By.CSS_SELECTOR, 'input[type="password"]')
+            submit_buttons = driver.find_elements(By.CSS_SELECTOR, 'button[type="submit"], input[type="submit"]')
+            
+            if email_fields and password_fields and submit_buttons:
+                email_fields[0].send_keys(email)
+                password_fields[0].send_keys(password)
+                submit_buttons[0].click()
+                time.sleep(3)  # Espera o login processar
+                return True
+            
+            return True  # Retorna True se não encontrar formulário de login
+            
+        except Exception as e:
+            logging.error(f"Erro ao tentar fazer login: {str(e)}")
+            return False
+
+    def stop(self):
+        """Interrompe os downloads e fecha os navegadores"""
+        self.stop_downloads = True
+        self.close_driver()
+        self.close_driver_pool()
+
+    def close_driver(self):
+        """Fecha o driver do Chrome de forma segura"""
+        try:
+            if self.driver:
+                self.driver.quit()
+                self.driver = None
+        except Exception as e:
+            logging.error(f"Erro ao fechar driver: {str(e)}")
+
+    def close(self):
+        """Fecha navegadores, reverificação e histórico"""
+        self.closing = True
+        if self.rehash_pool:
+            self.rehash_pool.shutdown(wait=True, cancel_futures=True)
+        self.close_driver()
+        self.close_driver_pool()
+        if self.history_store:
+            self.history_store.close()
+            self.history_store = None
@@ -1,22 +1,19 @@
+import time
+# Marca o início do processo para medir o tempo até a janela aparecer
+STARTUP_TIME = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import os
-import json
-from datetime import datetime
 import threading
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-import urllib.parse
-import mimetypes
-from concurrent.futures import ThreadPoolExecutor
-from functools import partial
+import itertools
 import logging
 import queue
+from download_engine import (
+    DownloadEngine, DEFAULT_MAX_SCROLLS, DEFAULT_CRAWL_PAGES, HISTORY_CHUNK_SIZE,
+    CRAWL_SCOPE_HOST, CRAWL_SCOPE_PREFIX, MAX_CONNECTIONS_PER_HOST, AUTO_MAX_CONCURRENCY,
+    ASYNC_MAX_CONCURRENT, format_size
+)
 
 # Configurar logging
 logging.basicConfig(
@@ -25,89 +22,12 @@ logging.basicConfig(
     filename='download_manager.log'
 )
 
-def setup_driver(download_folder):
-    """Configura o driver do Chrome para downloads automáticos"""
-    chrome_options = Options()
-    chrome_options.add_experimental_option("prefs", {
-        "download.default_directory": download_folder,
-        "download.prompt_for_download": False,
-        "download.directory_upgrade": True,
-        "safebrowsing.enabled": True
-    })
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    return driver
-
-def is_downloadable_link(url):
-    """Verifica se o link é provavelmente um arquivo para download"""
-    try:
-        # Lista de extensões comuns para download
-        download_extensions = {'.pdf', '.zip', '.rar', '.doc', '.docx', '.xls', '.xlsx', '.mp3', '.mp4', '.avi', '.mov'}
-        
-        # Verifica a extensão do arquivo na URL
-        parsed = urllib.parse.urlparse(url)
-        ext = os.path.splitext(parsed.path)[1].lower()
-        
-        # Se tem uma extensão conhecida, considera como downloadável
-        if ext in download_extensions:
-            return True
-            
-        return False
-    except:
-        return False
-
-def get_download_filename(url):
-    """Extrai o nome do arquivo da URL"""
-    try:
-        return os.path.basename(urllib.parse.urlparse(url).path)
-    except:
-        return "arquivo_desconhecido"
-
-def is_already_downloaded(download_folder, filename):
-    """Verifica se o arquivo já existe na pasta de downloads"""
-    return os.path.exists(os.path.join(download_folder, filename))
-
-def is_download_complete(download_folder, filename):
-    """Verifica se o download foi concluído"""
-    file_path = os.path.join(download_folder, filename)
-    temp_path = os.path.join(download_folder, filename + '.crdownload')
-    partial_path = os.path.join(download_folder, 'download.crdownload')
-    
-    # Espera até 30 segundos pelo download
-    for _ in range(30):
-        # Verifica se o arquivo final existe
-        if os.path.exists(file_path):
-            # Verifica se não está mais sendo modificado
-            if not is_file_being_downloaded(file_path):
-                return True
-        # Verifica se existe algum arquivo temporário
-        elif os.path.exists(temp_path) or os.path.exists(partial_path):
-            time.sleep(1)
-            continue
-        # Se não encontrar nem arquivo temporário nem final, espera um pouco
-        else:
-            # Procura por arquivos .crdownload na pasta
-            for f in os.listdir(download_folder):
-                if f.endswith('.crdownload'):
-                    time.sleep(1)
-                    break
-            else:
-                # Se não encontrar nenhum .crdownload, espera um pouco mais
-                time.sleep(1)
-    return False
-
-def is_file_being_downloaded(file_path):
-    """Verifica se um arquivo ainda está sendo baixado"""
-    try:
-        # Tenta abrir o arquivo em modo exclusivo
-        with open(file_path, 'ab') as f:
-            return False
-    except:
-        return True
+# Tempo máximo aceitável até a janela aparecer (ms)
+STARTUP_BUDGET_MS = 1500
+# Intervalo para repassar os eventos do motor à interface (ms)
+EVENT_INTERVAL = 50
+# Status do histórico que indicam que o arquivo está na pasta
+FINISHED_STATUSES = {"Concluído", "Já existente", "Inalterado"}
 
 class DownloadManager:
     def __init__(self, root):
@@ -118,22 +38,23 @@ class DownloadManager:
             self.root.geometry("1200x800")
             
             # Inicializa variáveis antes de criar a interface
-            self.stop_downloads = False
-            self.download_queue = queue.Queue()
             self.downloads_folder = os.path.join(os.path.expanduser("~"), "Downloads")
-            self.history_file = os.path.join(self.downloads_folder, "download_history.json")
-            self.download_history = []
+            # Descoberta, transferência e histórico ficam no motor; os eventos
+            # dele chegam à interface pela fila de eventos
+            self.events = queue.Queue()
+            self.engine = DownloadEngine(self.downloads_folder, on_event=self.events.put)
+            self.history_pages = None
+            self.history_index = {}  # ID da entrada -> entrada do histórico, em ordem
+            self.history_dirty = {}  # IDs pendentes de desenho, em ordem de inserção
+            self.history_lock = threading.Lock()
             self.selected_links = set()
             self.update_pending = False
             self.last_update = 0
             self.update_interval = 100  # ms
-            self.driver = None
-            self.active_downloads = {}  # Armazena informações dos downloads ativos
-            self.download_start_times = {}  # Armazena horário de início dos downloads
-
-            # Inicia thread de monitoramento
-            self.monitor_thread = threading.Thread(target=self.monitor_downloads, daemon=True)
-            self.monitor_thread.start()
+            self.download_thread = None
+            self.closing = False
+            self.links_index = {}  # URL -> {"item": ID na árvore de links, "text": texto do link}
+            self.selected_index = {}  # URL -> ID na árvore de selecionados
 
             # Configura a interface
             self.setup_frames()
@@ -145,6 +66,10 @@ class DownloadManager:
             
             # Configura manipuladores de eventos
             self.setup_event_handlers()
+            self.root.after(EVENT_INTERVAL, self.process_engine_events)
+            
+            # Prepara o Chrome em segundo plano depois que a janela aparecer
+            self.root.after_idle(self.on_window_shown)
             
         except Exception as e:
             logging.error(f"Erro na inicialização: {str(e)}")
@@ -154,10 +79,9 @@ class DownloadManager:
     def setup_variables(self):
         """Inicializa variáveis e estados"""
         self.stop_downloads = False
-        self.download_queue = queue.Queue()
         self.downloads_folder = os.path.join(os.path.expanduser("~"), "Downloads")
-        self.history_file = os.path.join(self.downloads_folder, "download_history.json")
-        self.download_history = []
+        self.history_file = os.path.join(self.downloads_folder, "download_history.db")
+        self.history_index = {}
         self.selected_links = set()
         self.update_pending = False
         self.last_update = 0
@@ -170,12 +94,90 @@ class DownloadManager:
     def setup_event_handlers(self):
         """Configura os manipuladores de eventos"""
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-        
+
+    def on_window_shown(self):
+        """Registra o tempo de abertura e inicia o pré-aquecimento do Chrome e a reverificação dos arquivos"""
+        elapsed_ms = (time.perf_counter() - STARTUP_TIME) * 1000
+        if elapsed_ms > STARTUP_BUDGET_MS:
+            logging.warning(f"Janela aberta em {elapsed_ms:.0f} ms, acima do limite de {STARTUP_BUDGET_MS} ms")
+        else:
+            logging.info(f"Janela aberta em {elapsed_ms:.0f} ms")
+        threading.Thread(target=self.engine.prewarm_driver, daemon=True).start()
+        # Arquivos baixados por versões anteriores ganham hash aos poucos, em segundo plano
+        threading.Thread(target=self.engine.rehash_existing, daemon=True).start()
+
+    def process_engine_events(self):
+        """Aplica na interface os eventos enviados pelas threads do motor"""
+        try:
+            while True:
+                event = self.events.get_nowait()
+                kind = event["event"]
+                if kind == "links":
+                    self.add_found_links(event["rows"])
+                elif kind == "link_info":
+                    self.update_link_info(event["url"], event["size"])
+                elif kind == "progress":
+                    self.update_selected_progress(event["url"], event["progress"], event["status"])
+                elif kind == "segments":
+                    self.update_segment_progress(event["url"], event["segments"])
+                elif kind == "history":
+                    self.record_history_entry(event["entry"])
+                elif kind == "status":
+                    self.status_label.config(text=event["message"])
+                elif kind == "batch":
+                    # O total cresce quando links são acrescentados ao lote em andamento
+                    self.progress['maximum'] = event["total"]
+                    self.progress['value'] = event["done"]
+                elif kind == "rate":
+                    self.update_rate(event["bytes_per_second"])
+                elif kind == "finished":
+                    self.rate_label.config(text="")
+                    self.update_interface(event["downloaded"], event["skipped"], event["failed"],
+                                          event.get("summary"))
+                elif kind == "search_done":
+                    self.finish_search()
+                elif kind == "search_error":
+                    self.show_search_error(event["message"])
+                elif kind == "download_error":
+                    self.show_error(event["message"])
+                elif kind == "warning":
+                    messagebox.showwarning("Aviso", event["message"])
+        except queue.Empty:
+            pass
+        except Exception as e:
+            logging.error(f"Erro ao processar eventos do motor: {str(e)}")
+        if not self.closing:
+            self.root.after(EVENT_INTERVAL, self.process_engine_events)
+
+    def apply_bandwidth_limits(self, *args):
+        """Repassa ao motor os limites de banda digitados, sem esperar o próximo lote"""
+        limits = []
+        for var in (self.limit_global_var, self.limit_host_var, self.limit_download_var):
+            try:
+                limits.append(max(0, int(var.get())) * 1024)
+            except ValueError:
+                # Campo ainda sendo digitado: mantém os limites atuais
+                return
+        self.engine.set_bandwidth_limits(*limits)
+
+    def update_rate(self, bytes_per_second):
+        """Mostra a taxa efetiva de todos os downloads somados"""
+        text = f"Taxa: {format_size(bytes_per_second)}/s"
+        limit = self.limit_global_var.get().strip()
+        if limit not in ("", "0"):
+            text += f" (limite {limit} KB/s)"
+        self.rate_label.config(text=text)
+
     def on_closing(self):
         """Manipula o evento de fechamento da janela"""
         try:
-            self.stop_downloads = True
-            self.close_driver()
+            self.closing = True
+            self.engine.closing = True
+            self.engine.stop_downloads = True
+            # Dá tempo para as transferências gravarem o diário dos arquivos parciais
+            if self.download_thread and self.download_thread.is_alive():
+                self.download_thread.join(timeout=5)
+            self.engine.close()
             self.root.destroy()
         except Exception as e:
             logging.error(f"Erro ao fechar o programa: {str(e)}")
@@ -282,6 +284,149 @@ class DownloadManager:
         )
         self.max_downloads_spinbox.grid(row=2, column=1, sticky="w", padx=5, pady=2)
         
+        # Conexões por arquivo (download segmentado)
+        ttk.Label(self.control_frame, text="Segmentos por Arquivo:").grid(row=2, column=2, padx=5, sticky="w")
+        self.segments_var = tk.StringVar(value="4")
+        self.segments_spinbox = ttk.Spinbox(
+            self.control_frame,
+            from_=1,
+            to=16,
+            width=5,
+            textvariable=self.segments_var
+        )
+        self.segments_spinbox.grid(row=2, column=3, sticky="w", padx=5, pady=2)
+        
+        # Limites de banda em KB/s (0 = sem limite); valem também para os downloads em andamento
+        self.bandwidth_frame = ttk.Frame(self.control_frame)
+        self.bandwidth_frame.grid(row=2, column=4, rowspan=2, sticky="w", padx=5)
+        self.limit_global_var = tk.StringVar(value="0")
+        self.limit_download_var = tk.StringVar(value="0")
+        self.limit_host_var = tk.StringVar(value="0")
+        for column, (label, var) in enumerate((("Limite Global (KB/s):", self.limit_global_var),
+                                               ("Por Download:", self.limit_download_var),
+                                               ("Por Host:", self.limit_host_var))):
+            ttk.Label(self.bandwidth_frame, text=label).grid(row=0, column=column * 2, padx=5, sticky="w")
+            ttk.Spinbox(
+                self.bandwidth_frame,
+                from_=0,
+                to=1000000,
+                increment=100,
+                width=7,
+                textvariable=var
+            ).grid(row=0, column=column * 2 + 1, sticky="w", pady=2)
+            var.trace_add("write", self.apply_bandwidth_limits)
+        
+        # Limite de conexões abertas ao mesmo tempo com cada servidor
+        ttk.Label(self.control_frame, text="Conexões por Host:").grid(row=6, column=0, padx=(0, 5), sticky="w")
+        self.per_host_var = tk.StringVar(value=str(MAX_CONNECTIONS_PER_HOST))
+        self.per_host_spinbox = ttk.Spinbox(
+            self.control_frame,
+            from_=1,
+            to=16,
+            width=5,
+            textvariable=self.per_host_var
+        )
+        self.per_host_spinbox.grid(row=6, column=1, sticky="w", padx=5, pady=2)
+        
+        # Ajuste automático dos downloads simultâneos pela vazão medida; o valor de
+        # "Downloads Simultâneos" vira o ponto de partida
+        self.auto_concurrency_var = tk.BooleanVar(value=False)
+        self.auto_concurrency_check = ttk.Checkbutton(
+            self.control_frame,
+            text="Ajuste automático até:",
+            variable=self.auto_concurrency_var
+        )
+        self.auto_concurrency_check.grid(row=6, column=2, sticky="w", padx=5, pady=2)
+        self.auto_max_var = tk.StringVar(value=str(AUTO_MAX_CONCURRENCY))
+        self.auto_max_spinbox = ttk.Spinbox(
+            self.control_frame,
+            from_=2,
+            to=64,
+            width=5,
+            textvariable=self.auto_max_var
+        )
+        self.auto_max_spinbox.grid(row=6, column=3, sticky="w", padx=5, pady=2)
+        
+        # Transferências em um laço asyncio, para lotes com milhares de arquivos pequenos;
+        # substitui o valor de "Downloads Simultâneos"
+        self.async_var = tk.BooleanVar(value=False)
+        self.async_check = ttk.Checkbutton(
+            self.control_frame,
+            text="Modo assíncrono, downloads simultâneos:",
+            variable=self.async_var
+        )
+        self.async_check.grid(row=7, column=0, columnspan=2, sticky="w", pady=2)
+        self.async_concurrent_var = tk.StringVar(value=str(ASYNC_MAX_CONCURRENT))
+        self.async_concurrent_spinbox = ttk.Spinbox(
+            self.control_frame,
+            from_=1,
+            to=5000,
+            width=5,
+            textvariable=self.async_concurrent_var
+        )
+        self.async_concurrent_spinbox.grid(row=7, column=2, sticky="w", padx=5, pady=2)
+        
+        # Sincronização: arquivos já baixados só são baixados de novo se mudaram no servidor
+        self.sync_var = tk.BooleanVar(value=False)
+        self.sync_check = ttk.Checkbutton(
+            self.control_frame,
+            text="Sincronizar (só novos e alterados)",
+            variable=self.sync_var
+        )
+        self.sync_check.grid(row=7, column=3, columnspan=2, sticky="w", pady=2)
+        
+        # Limite de rolagens para páginas com carregamento infinito
+        ttk.Label(self.control_frame, text="Rolagens Máximas:").grid(row=3, column=0, padx=(0, 5), sticky="w")
+        self.max_scrolls_var = tk.StringVar(value=str(DEFAULT_MAX_SCROLLS))
+        self.max_scrolls_spinbox = ttk.Spinbox(
+            self.control_frame,
+            from_=0,
+            to=1000,
+            width=5,
+            textvariable=self.max_scrolls_var
+        )
+        self.max_scrolls_spinbox.grid(row=3, column=1, sticky="w", padx=5, pady=2)
+        
+        # Consulta o tipo dos links sem extensão conhecida (ex.: /download?id=123)
+        self.probe_links_var = tk.BooleanVar(value=False)
+        self.probe_links_check = ttk.Checkbutton(
+            self.control_frame,
+            text="Verificar tipo dos links",
+            variable=self.probe_links_var
+        )
+        self.probe_links_check.grid(row=3, column=2, columnspan=2, sticky="w", padx=5, pady=2)
+        
+        # Rastreamento de várias páginas (0 = apenas a página da URL)
+        ttk.Label(self.control_frame, text="Profundidade:").grid(row=4, column=0, padx=(0, 5), sticky="w")
+        self.crawl_depth_var = tk.StringVar(value="0")
+        self.crawl_depth_spinbox = ttk.Spinbox(
+            self.control_frame,
+            from_=0,
+            to=10,
+            width=5,
+            textvariable=self.crawl_depth_var
+        )
+        self.crawl_depth_spinbox.grid(row=4, column=1, sticky="w", padx=5, pady=2)
+        
+        ttk.Label(self.control_frame, text="Páginas Máximas:").grid(row=4, column=2, padx=5, sticky="w")
+        self.crawl_pages_var = tk.StringVar(value=str(DEFAULT_CRAWL_PAGES))
+        self.crawl_pages_spinbox = ttk.Spinbox(
+            self.control_frame,
+            from_=1,
+            to=10000,
+            width=5,
+            textvariable=self.crawl_pages_var
+        )
+        self.crawl_pages_spinbox.grid(row=4, column=3, sticky="w", padx=5, pady=2)
+        
+        self.crawl_prefix_var = tk.BooleanVar(value=False)
+        self.crawl_prefix_check = ttk.Checkbutton(
+            self.control_frame,
+            text="Apenas abaixo do caminho da URL",
+            variable=self.crawl_prefix_var
+        )
+        self.crawl_prefix_check.grid(row=5, column=1, columnspan=3, sticky="w", padx=5, pady=2)
+        
         # Botões principais
         self.refresh_button = ttk.Button(self.button_frame, text="Buscar Links", command=self.search_links)
         self.refresh_button.pack(side="left", padx=5)
@@ -293,15 +438,26 @@ class DownloadManager:
                                     command=self.stop_downloads_action, state="disabled")
         self.stop_button.pack(side="left", padx=5)
         
+        # Fixa os itens marcados na lista de selecionados no topo da fila
+        self.pin_button = ttk.Button(self.button_frame, text="Priorizar Selecionados", command=self.pin_selected)
+        self.pin_button.pack(side="left", padx=5)
+        
         # Botão de limpar histórico
         self.clear_history_button = ttk.Button(self.history_header_frame, text="Limpar Histórico", command=self.clear_history)
         self.clear_history_button.pack(side="right", padx=5)
         
+        # Checksums publicados (SHA256SUMS) para conferir os arquivos baixados
+        self.checksums_button = ttk.Button(self.history_header_frame, text="Carregar Checksums",
+                                           command=self.load_checksums)
+        self.checksums_button.pack(side="right", padx=5)
+        
         # Barra de progresso total
         self.progress = ttk.Progressbar(self.progress_frame, mode='determinate')
         self.progress.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
         self.status_label = ttk.Label(self.progress_frame, text="Pronto")
         self.status_label.grid(row=1, column=0, sticky="w", padx=5)
+        self.rate_label = ttk.Label(self.progress_frame, text="")
+        self.rate_label.grid(row=1, column=1, sticky="e", padx=5)
         
     def setup_trees(self):
         """Configura as TreeViews"""
@@ -311,12 +467,13 @@ class DownloadManager:
         links_container.grid_rowconfigure(0, weight=1)
         links_container.grid_columnconfigure(0, weight=1)
         
-        self.links_tree = ttk.Treeview(links_container, columns=("Selecionar", "Link", "Tipo"), 
+        self.links_tree = ttk.Treeview(links_container, columns=("Selecionar", "Link", "Tipo", "Tamanho"), 
                                      show="headings")
         self.setup_tree_columns(self.links_tree, [
             ("Selecionar", 100),
             ("Link", 400),
-            ("Tipo", 100)
+            ("Tipo", 100),
+            ("Tamanho", 100)
         ])
         self.links_tree.grid(row=0, column=0, sticky="nsew")
         
@@ -393,36 +550,16 @@ class DownloadManager:
         
     def schedule_ui_update(self):
         """Agenda atualização da interface se necessário"""
-        if not self.update_pending:
-            current_time = time.time() * 1000
-            if current_time - self.last_update >= self.update_interval:
-                def update():
-                    self.refresh_downloads()
-                self.root.after(0, update)
-                self.last_update = current_time
-                self.update_pending = False
-            else:
-                self.root.after(self.update_interval, self.schedule_ui_update)
-                self.update_pending = True
-
-    def safe_ui_call(self, func, *args, **kwargs):
-        """Executa uma função na thread principal de forma segura"""
-        if threading.current_thread() is threading.main_thread():
-            return func(*args, **kwargs)
-        else:
-            return self.root.after(0, lambda: func(*args, **kwargs))
-            
-    def update_status(self, message):
-        """Atualiza o status de forma segura"""
-        def update():
-            self.status_label.config(text=message)
-        self.safe_ui_call(update)
-        
-    def update_progress(self, value):
-        """Atualiza a barra de progresso de forma segura"""
+        if self.update_pending:
+            return
+        self.update_pending = True
+        current_time = time.time() * 1000
+        delay = max(0, int(self.update_interval - (current_time - self.last_update)))
         def update():
-            self.progress['value'] = value
-        self.safe_ui_call(update)
+            self.update_pending = False
+            self.last_update = time.time() * 1000
+            self.refresh_downloads()
+        self.root.after(delay, update)
 
     def on_tree_click(self, event):
         """Manipula cliques na treeview de links"""
@@ -435,79 +572,142 @@ class DownloadManager:
                     link = values[2]  # URL do link
                     if link in self.selected_links:
                         self.selected_links.remove(link)
-                        self.links_tree.item(item, values=("☐", values[1], link))
+                        self.links_tree.set(item, "Selecionar", "☐")
                         self.remove_from_selected_tree(link)
                     else:
                         self.selected_links.add(link)
-                        self.links_tree.item(item, values=("☑", values[1], link))
+                        self.links_tree.set(item, "Selecionar", "☑")
                         self.add_to_selected_tree(values[1], link)
 
     def add_to_selected_tree(self, name, link):
         """Adiciona um item à árvore de selecionados"""
-        self.selected_tree.insert("", "end", values=(name, "0%", "Pendente"), tags=(link,))
+        filename = self.engine.filename_for(link)
+        # Depois disso o status vem só dos eventos do motor
+        if os.path.exists(os.path.join(self.downloads_folder, filename)):
+            values = (name, "100%", "Concluído")
+        else:
+            values = (name, "0%", "Pendente")
+        self.selected_index[link] = self.selected_tree.insert("", "end", values=values, tags=(link,))
 
     def remove_from_selected_tree(self, link):
         """Remove um item da árvore de selecionados"""
-        for item in self.selected_tree.get_children():
-            if link in self.selected_tree.item(item)["tags"]:
-                self.selected_tree.delete(item)
-                break
+        item = self.selected_index.pop(link, None)
+        if item and self.selected_tree.exists(item):
+            self.selected_tree.delete(item)
+
+    def selected_item(self, link):
+        """Retorna o ID do item selecionado para o link, se ainda existir"""
+        item = self.selected_index.get(link)
+        if item and self.selected_tree.exists(item):
+            return item
+        return None
 
     def update_selected_progress(self, link, progress, status):
         """Atualiza o progresso de um item selecionado"""
-        for item in self.selected_tree.get_children():
-            if link in self.selected_tree.item(item)["tags"]:
-                self.selected_tree.item(item, values=(
-                    self.selected_tree.item(item)["values"][0],
-                    f"{progress}%",
-                    status
-                ))
-                break
+        item = self.selected_item(link)
+        if item:
+            self.selected_tree.set(item, "Progresso", f"{progress}%")
+            self.selected_tree.set(item, "Status", status)
+
+    def update_segment_progress(self, link, segments):
+        """Mostra o progresso de cada segmento como linhas filhas do item selecionado"""
+        item = self.selected_item(link)
+        if not item:
+            return
+        children = self.selected_tree.get_children(item)
+        # Remove linhas de segmentos que não existem mais
+        for child in children[len(segments):]:
+            self.selected_tree.delete(child)
+        for index, (start, end, position) in enumerate(segments):
+            length = max(end - start, 1)
+            values = (
+                f"    Segmento {index + 1}",
+                f"{int((position - start) * 100 / length)}%",
+                f"{format_size(position - start)}/{format_size(end - start)}"
+            )
+            if index < len(children):
+                self.selected_tree.item(children[index], values=values)
+            else:
+                self.selected_tree.insert(item, "end", values=values)
+        self.selected_tree.item(item, open=True)
 
     def load_history(self):
-        """Carrega o histórico de downloads do arquivo JSON"""
+        """Abre o histórico de downloads e carrega as entradas aos poucos"""
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    self.download_history = json.load(f)
-                    # Atualiza entradas antigas que não têm display_name
-                    for entry in self.download_history:
-                        if "display_name" not in entry:
-                            entry["display_name"] = entry["filename"]
-            else:
-                self.download_history = []
+            self.history_pages = self.engine.open_history().iter_pages()
         except Exception as e:
-            self.download_history = []
             logging.error(f"Erro ao carregar histórico: {str(e)}")
             messagebox.showerror("Erro", f"Erro ao carregar histórico: {str(e)}")
+            return
         
-        # Atualiza a interface com o histórico
-        self.refresh_downloads()
+        # Atualiza a interface com o histórico, uma página por ciclo
+        self.load_history_page()
     
-    def save_history(self):
-        """Salva o histórico de downloads no arquivo JSON"""
+    def load_history_page(self):
+        """Carrega a próxima página do histórico e agenda a seguinte"""
+        if self.history_pages is None:
+            return
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.download_history, f, ensure_ascii=False, indent=2)
+            page = next(self.history_pages, None)
         except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao salvar histórico: {str(e)}")
+            logging.error(f"Erro ao carregar histórico: {str(e)}")
+            page = None
+        if not page:
+            self.history_pages = None
+            return
+        
+        with self.history_lock:
+            for entry in page:
+                # Entradas carregadas podem já ter sido alteradas nesta sessão
+                if entry["id"] not in self.history_index:
+                    self.history_index[entry["id"]] = entry
+                    self.history_dirty[entry["id"]] = None
+        self.refresh_downloads()
+        self.root.after(1, self.load_history_page)
+    
+    def record_history_entry(self, entry):
+        """Marca uma entrada nova ou alterada pelo motor para ser redesenhada"""
+        with self.history_lock:
+            self.history_index[entry["id"]] = entry
+            self.history_dirty[entry["id"]] = None
+        self.schedule_ui_update()
+        # O status final do item selecionado é o que o motor gravou no histórico
+        item = self.selected_item(entry["url"])
+        if item and entry["status"] != "Baixando...":
+            if entry["status"] in FINISHED_STATUSES:
+                self.selected_tree.set(item, "Progresso", "100%")
+            self.selected_tree.set(item, "Status", entry["status"])
     
     def refresh_downloads(self):
-        """Atualiza a lista de downloads na interface"""
+        """Atualiza na interface apenas as entradas novas ou alteradas do histórico"""
         try:
-            # Limpar a treeview
-            if hasattr(self, 'tree'):
-                for item in self.tree.get_children():
-                    self.tree.delete(item)
-                
-                # Adicionar downloads do histórico
-                for download in self.download_history:
-                    self.tree.insert("", "end", values=(
-                        download.get("display_name", download["filename"]),
-                        download["status"],
-                        download["date"],
-                        download.get("size", "N/A")
-                    ))
+            if not hasattr(self, 'tree'):
+                return
+            
+            with self.history_lock:
+                entry_ids = list(itertools.islice(self.history_dirty, HISTORY_CHUNK_SIZE))
+                for entry_id in entry_ids:
+                    del self.history_dirty[entry_id]
+                remaining = bool(self.history_dirty)
+            
+            for entry_id in entry_ids:
+                download = self.history_index.get(entry_id)
+                if download is None:
+                    continue
+                values = (
+                    download.get("display_name", download["filename"]),
+                    download["status"],
+                    download["date"],
+                    download.get("size", "N/A")
+                )
+                if self.tree.exists(entry_id):
+                    self.tree.item(entry_id, values=values)
+                else:
+                    self.tree.insert("", "end", iid=entry_id, values=values)
+            
+            # Históricos grandes são desenhados em blocos para não travar a janela
+            if remaining:
+                self.root.after(1, self.refresh_downloads)
         except Exception as e:
             logging.error(f"Erro ao atualizar lista de downloads: {str(e)}")
     
@@ -517,406 +717,216 @@ class DownloadManager:
         if not url:
             messagebox.showwarning("Aviso", "Por favor, insira uma URL válida")
             return
-            
+        
         try:
-            self.status_label.config(text="Buscando links...")
-            self.refresh_button.config(state="disabled")
-            
-            # Limpa a lista de links atual
-            for item in self.links_tree.get_children():
-                self.links_tree.delete(item)
-            
-            # Inicializa o driver se necessário
-            if not self.driver:
-                self.driver = self.setup_driver()
-            
-            # Tenta fazer login se necessário
-            login_result = self.login(self.driver, url)
-            if not login_result and (self.email_entry.get().strip() or self.password_entry.get().strip()):
-                messagebox.showwarning("Aviso", "Não foi possível fazer login. Alguns links podem não estar disponíveis.")
-            
-            # Navega para a URL
-            self.driver.get(url)
-            
-            # Espera página carregar
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            
-            # Tenta rolar a página para carregar mais conteúdo
-            last_height = self.driver.execute_script("return document.body.scrollHeight")
-            while True:
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(1)
-                new_height = self.driver.execute_script("return document.body.scrollHeight")
-                if new_height == last_height:
-                    break
-                last_height = new_height
-            
-            # Encontrar todos os links
-            links = self.driver.find_elements(By.TAG_NAME, "a")
-            found_links = 0
-            
-            # Adicionar links encontrados
-            for link in links:
-                href = link.get_attribute("href")
-                if href and not href.startswith("mailto:"):
-                    link_text = link.text.strip() or "Link sem texto"
-                    if is_downloadable_link(href):
-                        self.links_tree.insert("", "end", values=("☐", link_text, href))
-                        found_links += 1
-            
-            if found_links == 0:
-                self.status_label.config(text="Nenhum link de download encontrado")
+            max_scrolls = max(0, int(self.max_scrolls_var.get()))
+        except:
+            max_scrolls = DEFAULT_MAX_SCROLLS
+        try:
+            depth = max(0, int(self.crawl_depth_var.get()))
+        except:
+            depth = 0
+        try:
+            max_pages = max(1, int(self.crawl_pages_var.get()))
+        except:
+            max_pages = DEFAULT_CRAWL_PAGES
+        scope = CRAWL_SCOPE_PREFIX if self.crawl_prefix_var.get() else CRAWL_SCOPE_HOST
+        email = self.email_entry.get().strip()
+        password = self.password_entry.get().strip()
+        self.engine.probe_links = self.probe_links_var.get()
+            
+        self.status_label.config(text="Buscando links...")
+        self.refresh_button.config(state="disabled")
+        
+        # Limpa a lista de links atual
+        self.links_tree.delete(*self.links_tree.get_children())
+        self.links_index = {}
+        
+        # A busca roda em segundo plano para a lista ser preenchida durante a rolagem
+        thread = threading.Thread(target=self.run_search,
+                                  args=(url, email, password, max_scrolls, depth, max_pages, scope))
+        thread.daemon = True
+        thread.start()
+
+    def run_search(self, url, email, password, max_scrolls, depth=0, max_pages=DEFAULT_CRAWL_PAGES,
+                   scope=CRAWL_SCOPE_HOST):
+        """Busca os links pelo motor; a lista é preenchida pelos eventos durante a busca"""
+        try:
+            if depth > 0:
+                self.engine.crawl(url, depth, max_pages, scope, email, password, max_scrolls)
             else:
-                self.status_label.config(text=f"{found_links} links de download encontrados")
+                self.engine.search(url, email, password, max_scrolls)
+            # Passa pela mesma fila para ser tratado depois dos últimos links
+            self.events.put({"event": "search_done"})
             
         except Exception as e:
             logging.error(f"Erro ao buscar links: {str(e)}")
-            messagebox.showerror("Erro", f"Erro ao buscar links: {str(e)}")
-            self.status_label.config(text="Erro ao buscar links")
-        
-        finally:
-            self.refresh_button.config(state="normal")
+            self.events.put({"event": "search_error", "message": str(e)})
+
+    def finish_search(self):
+        """Mostra quantos links a busca encontrou"""
+        self.refresh_button.config(state="normal")
+        found_links = len(self.links_index)
+        if found_links == 0:
+            self.status_label.config(text="Nenhum link de download encontrado")
+        else:
+            self.status_label.config(text=f"{found_links} links de download encontrados")
+
+    def show_search_error(self, message):
+        """Mostra o erro da busca depois dos links que chegaram antes dele"""
+        self.refresh_button.config(state="normal")
+        self.status_label.config(text="Erro ao buscar links")
+        messagebox.showerror("Erro", f"Erro ao buscar links: {message}")
+
+    def add_found_links(self, rows):
+        """Adiciona links encontrados à árvore de links"""
+        for href, link_text in rows:
+            if href not in self.links_index:
+                item = self.links_tree.insert("", "end", values=("☐", link_text, href, ""))
+                self.links_index[href] = {"item": item, "text": link_text}
+        self.status_label.config(text=f"Buscando links... {len(self.links_index)} encontrados")
+
+    def update_link_info(self, url, size):
+        """Mostra o tamanho informado pelo servidor na árvore de links"""
+        info = self.links_index.get(url)
+        if info and size is not None and self.links_tree.exists(info["item"]):
+            self.links_tree.set(info["item"], "Tamanho", format_size(size))
+
+    def pin_selected(self):
+        """Liga ou desliga a prioridade dos itens marcados na lista de selecionados"""
+        for item in self.selected_tree.selection():
+            tags = self.selected_tree.item(item, "tags")
+            if not tags or tags[0] not in self.selected_index:
+                continue  # Linhas de segmento
+            link = tags[0]
+            pinned = link not in self.engine.pinned
+            self.engine.pin_download(link, pinned)
+            if self.selected_tree.set(item, "Status") in ("Pendente", "Prioritário"):
+                self.selected_tree.set(item, "Status", "Prioritário" if pinned else "Pendente")
 
     def start_downloads(self):
-        """Inicia o processo de download"""
+        """Inicia o processo de download, ou acrescenta os novos links ao lote em andamento"""
         if not self.selected_links:
             messagebox.showwarning("Aviso", "Por favor, selecione pelo menos um link para download")
             return
+        
+        # Lê tudo o que os workers precisam da interface aqui, na thread principal
+        jobs = [(link, self.links_index.get(link, {}).get("text")) for link in self.selected_links]
+        # Mantém a ordem em que os links foram encontrados; a fila do motor reordena por prioridade
+        order = {link: index for index, link in enumerate(self.links_index)}
+        jobs.sort(key=lambda job: order.get(job[0], len(order)))
+        if self.download_thread and self.download_thread.is_alive():
+            if self.engine.enqueue_downloads(jobs):
+                self.status_label.config(text="Links acrescentados à fila")
+            else:
+                # O lote está terminando; os links entram no próximo
+                self.status_label.config(text="Aguarde o fim do lote atual para iniciar outro")
+            return
             
         self.status_label.config(text="Iniciando downloads...")
-        self.start_button.config(state="disabled")
+        self.start_button.config(text="Adicionar à Fila")
         self.stop_button.config(state="normal")
-        self.stop_downloads = False
+        self.engine.stop_downloads = False
+        use_async = self.async_var.get()
+        try:
+            if use_async:
+                max_concurrent = min(max(1, int(self.async_concurrent_var.get())), 5000)
+            else:
+                max_concurrent = min(max(1, int(self.max_downloads_var.get())), 10)
+        except:
+            max_concurrent = ASYNC_MAX_CONCURRENT if use_async else 3
+        try:
+            segments_per_file = min(max(1, int(self.segments_var.get())), 16)
+        except:
+            segments_per_file = 1
+        try:
+            max_per_host = min(max(1, int(self.per_host_var.get())), 16)
+        except:
+            max_per_host = MAX_CONNECTIONS_PER_HOST
+        auto_concurrency = None
+        if self.auto_concurrency_var.get():
+            try:
+                auto_concurrency = min(max(2, int(self.auto_max_var.get())), 64)
+            except:
+                auto_concurrency = AUTO_MAX_CONCURRENCY
+        self.progress['maximum'] = len(jobs)
+        self.progress['value'] = 0
         
         # Iniciar download em uma thread separada
-        thread = threading.Thread(target=self.run_downloads, args=(self.url_entry.get().strip(),))
-        thread.daemon = True
-        thread.start()
+        self.download_thread = threading.Thread(target=self.run_downloads,
+                                                args=(jobs, max_concurrent, segments_per_file, max_per_host,
+                                                      auto_concurrency, use_async, self.sync_var.get()))
+        self.download_thread.daemon = True
+        self.download_thread.start()
     
     def stop_downloads_action(self):
         """Ação para parar os downloads"""
-        self.stop_downloads = True
         self.status_label.config(text="Parando downloads...")
         self.stop_button.config(state="disabled")
-        self.close_driver()
+        self.engine.stop()
     
-    def run_downloads(self, url):
+    def run_downloads(self, jobs, max_concurrent, segments_per_file, max_per_host, auto_concurrency=None,
+                      use_async=False, sync=False):
         """Executa o processo de download e atualiza a interface"""
         try:
-            total_links = len(self.selected_links)
-            downloaded = 0
-            skipped = 0
-            failed = 0
-            
-            self.progress['maximum'] = total_links
-            self.update_progress(0)
-            
-            try:
-                max_concurrent = min(max(1, int(self.max_downloads_var.get())), 10)
-            except:
-                max_concurrent = 3
-            
-            if not self.driver:
-                self.driver = self.setup_driver()
-
-            try:
-                with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
-                    futures = []
-                    
-                    for link in self.selected_links:
-                        if self.stop_downloads:
-                            break
-                        
-                        future = executor.submit(self.process_single_download, link)
-                        futures.append(future)
-                        
-                        active_downloads = len([f for f in futures if not f.done()])
-                        self.update_status(f"Downloads ativos: {active_downloads} / {max_concurrent}")
-                        
-                        time.sleep(0.5)
-                    
-                    for future in futures:
-                        try:
-                            result = future.result()
-                            if result == "downloaded":
-                                downloaded += 1
-                            elif result == "skipped":
-                                skipped += 1
-                            else:
-                                failed += 1
-                                
-                            self.update_progress(downloaded + skipped + failed)
-                            self.schedule_ui_update()
-                            
-                            active_downloads = len([f for f in futures if not f.done()])
-                            self.update_status(f"Downloads ativos: {active_downloads} / {max_concurrent}")
-                            
-                        except Exception as e:
-                            failed += 1
-                            logging.error(f"Erro no download: {str(e)}")
-                            
-            finally:
-                if self.stop_downloads:
-                    self.close_driver()
-            
-            self.save_history()
-            self.update_interface(downloaded, skipped, failed)
-            
+            # O resumo chega pelo evento "finished"; no modo assíncrono o laço asyncio
+            # roda nesta thread e os eventos chegam pela mesma fila
+            self.engine.run_downloads(jobs, max_concurrent, segments_per_file, max_per_host, auto_concurrency,
+                                      use_async, sync)
         except Exception as e:
             logging.error(f"Erro durante downloads: {str(e)}")
-            self.show_error(str(e))
-            self.close_driver()
-
-    def process_single_download(self, link):
-        """Processa um único download"""
-        try:
-            # Encontrar o nome legível do link na árvore de links
-            link_text = None
-            for item in self.links_tree.get_children():
-                values = self.links_tree.item(item)['values']
-                if values[2] == link:  # values[2] contém a URL
-                    link_text = values[1]  # values[1] contém o texto do link
-                    break
-            
-            filename = get_download_filename(link)
-            display_name = link_text if link_text else filename
-            
-            # Verificar se já existe
-            if is_already_downloaded(self.downloads_folder, filename):
-                self.download_history.append({
-                    "filename": filename,
-                    "display_name": display_name,
-                    "status": "Já existente",
-                    "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "size": self.get_file_size(filename)
-                })
-                return "skipped"
-            
-            # Adicionar entrada inicial no histórico
-            download_entry = {
-                "filename": filename,
-                "display_name": display_name,
-                "status": "Baixando...",
-                "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "size": "N/A"
-            }
-            self.download_history.append(download_entry)
-            self.save_history()
-            self.refresh_downloads()
-            
-            try:
-                # Registra início do download
-                self.active_downloads[filename] = {
-                    'url': link,
-                    'display_name': display_name,
-                    'status': 'Iniciando...'
-                }
-                self.download_start_times[filename] = time.time()
-                
-                # Usar o driver compartilhado para fazer o download
-                self.driver.get(link)
-                
-                # Esperar download completar
-                if is_download_complete(self.downloads_folder, filename):
-                    download_entry["status"] = "Concluído"
-                    download_entry["size"] = self.get_file_size(filename)
-                    # Remove do monitoramento
-                    if filename in self.active_downloads:
-                        del self.active_downloads[filename]
-                    if filename in self.download_start_times:
-                        del self.download_start_times[filename]
-                    return "downloaded"
-                else:
-                    download_entry["status"] = "Erro no download"
-                    return "failed"
-                    
-            except Exception as e:
-                download_entry["status"] = f"Erro: {str(e)}"
-                return "failed"
-                
-        except Exception as e:
-            print(f"Erro ao processar download de {link}: {str(e)}")
-            return "failed"
-    
-    def get_file_size(self, filename):
-        """Retorna o tamanho do arquivo em formato legível"""
-        try:
-            file_path = os.path.join(self.downloads_folder, filename)
-            if os.path.exists(file_path):
-                size = os.path.getsize(file_path)
-                if size < 1024:
-                    return f"{size} B"
-                elif size < 1024 * 1024:
-                    return f"{size/1024:.1f} KB"
-                elif size < 1024 * 1024 * 1024:
-                    return f"{size/(1024*1024):.1f} MB"
-                else:
-                    return f"{size/(1024*1024*1024):.1f} GB"
-            return "N/A"
-        except:
-            return "N/A"
+            self.events.put({"event": "download_error", "message": str(e)})
+            self.engine.close_driver()
 
     def show_error(self, error_message):
-        """Mostra mensagem de erro de forma segura"""
-        def show():
-            messagebox.showerror("Erro", error_message)
-            self.status_label.config(text="Erro durante os downloads")
-            self.start_button.config(state="normal")
-            self.stop_button.config(state="disabled")
-        self.safe_ui_call(show)
-
-    def update_interface(self, downloaded, skipped, failed):
+        """Mostra o erro que interrompeu o lote de downloads"""
+        self.status_label.config(text="Erro durante os downloads")
+        self.start_button.config(text="Iniciar Downloads")
+        self.stop_button.config(state="disabled")
+        messagebox.showerror("Erro", error_message)
+
+    def update_interface(self, downloaded, skipped, failed, summary=None):
         """Atualiza a interface após os downloads"""
-        def update():
-            self.refresh_downloads()
+        self.refresh_downloads()
+        if summary:
+            self.status_label.config(text=f"Sincronização concluída: {summary}")
+        else:
             self.status_label.config(text=f"Downloads concluídos: {downloaded} | Ignorados: {skipped} | Falhas: {failed}")
-            self.start_button.config(state="normal")
-            self.stop_button.config(state="disabled")
-        self.safe_ui_call(update)
+        self.start_button.config(text="Iniciar Downloads")
+        self.stop_button.config(state="disabled")
+
+    def load_checksums(self):
+        """Carrega uma lista de SHA-256 publicada para conferir os downloads"""
+        path = filedialog.askopenfilename(title="Arquivo de checksums (SHA256SUMS)")
+        if not path:
+            return
+        try:
+            count = self.engine.load_checksums(path)
+            self.status_label.config(text=f"{count} checksums carregados")
+        except Exception as e:
+            logging.error(f"Erro ao carregar checksums: {str(e)}")
+            messagebox.showerror("Erro", f"Erro ao carregar checksums: {str(e)}")
 
     def clear_history(self):
         """Limpa o histórico de downloads"""
         if messagebox.askyesno("Confirmar", "Tem certeza que deseja limpar todo o histórico de downloads?"):
             # Limpa apenas o histórico de downloads
-            self.download_history = []
-            self.save_history()
+            with self.history_lock:
+                self.history_index = {}
+                self.history_dirty = {}
+            self.history_pages = None
+            if self.engine.history_store:
+                self.engine.history_store.clear()
             
             # Limpa apenas a árvore de histórico de downloads
-            for item in self.tree.get_children():
-                self.tree.delete(item)
+            self.tree.delete(*self.tree.get_children())
                 
             self.status_label.config(text="Histórico de downloads limpo")
 
-    def setup_driver(self):
-        """Configura o driver do Chrome com opções otimizadas"""
-        chrome_options = Options()
-        chrome_options.add_experimental_option("prefs", {
-            "download.default_directory": self.downloads_folder,
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True,
-            "safebrowsing.enabled": True
-        })
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-notifications")
-        chrome_options.add_argument("--disable-popup-blocking")
-        
-        service = Service(ChromeDriverManager().install())
-        return webdriver.Chrome(service=service, options=chrome_options)
-
-    def login(self, driver, url):
-        """Tenta fazer login no site se as credenciais forem fornecidas"""
-        try:
-            email = self.email_entry.get().strip()
-            password = self.password_entry.get().strip()
-            
-            # Se não houver credenciais, assume que não precisa de login
-            if not email and not password:
-                logging.info("Nenhuma credencial fornecida, tentando acessar diretamente")
-                return True
-
-            # Tenta encontrar o formulário de login
-            driver.get(url)
-            time.sleep(2)  # Espera a página carregar
-            
-            # Procura por campos de login comuns
-            email_fields = driver.find_elements(By.CSS_SELECTOR, 'input[type="email"], input[name="email"]')
-            password_fields = driver.find_elements(By.CSS_SELECTOR, 'input[type="password"]')
-            submit_buttons = driver.find_elements(By.CSS_SELECTOR, 'button[type="submit"], input[type="submit"]')
-            
-            if email_fields and password_fields and submit_buttons:
-                email_fields[0].send_keys(email)
-                password_fields[0].send_keys(password)
-                submit_buttons[0].click()
-                time.sleep(3)  # Espera o login processar
-                return True
-            
-            return True  # Retorna True se não encontrar formulário de login
-            
-        except Exception as e:
-            logging.error(f"Erro ao tentar fazer login: {str(e)}")
-            return False
-
-    def close_driver(self):
-        """Fecha o driver do Chrome de forma segura"""
-        try:
-            if self.driver:
-                self.driver.quit()
-                self.driver = None
-        except Exception as e:
-            logging.error(f"Erro ao fechar driver: {str(e)}")
-
     def __del__(self):
         """Destrutor da classe"""
-        self.close_driver()
-
-    def monitor_downloads(self):
-        """Monitora o progresso dos downloads ativos"""
-        while True:
-            try:
-                if self.stop_downloads:
-                    break
-
-                # Lista todos os arquivos .crdownload na pasta de downloads
-                crdownload_files = [f for f in os.listdir(self.downloads_folder) if f.endswith('.crdownload')]
-                
-                # Atualiza o progresso para cada item selecionado
-                for item in self.selected_tree.get_children():
-                    values = self.selected_tree.item(item)["values"]
-                    tags = self.selected_tree.item(item)["tags"]
-                    if not tags:
-                        continue
-                        
-                    url = tags[0]
-                    filename = get_download_filename(url)
-                    file_path = os.path.join(self.downloads_folder, filename)
-                    temp_path = file_path + '.crdownload'
-                    
-                    # Verifica se o arquivo já foi completamente baixado
-                    if os.path.exists(file_path):
-                        self.selected_tree.item(item, values=(values[0], "100%", "Concluído"))
-                        continue
-                        
-                    # Verifica se o arquivo está sendo baixado
-                    if os.path.exists(temp_path):
-                        try:
-                            temp_size = os.path.getsize(temp_path)
-                            # Tenta ler o tamanho total do arquivo do .crdownload
-                            with open(temp_path, 'rb') as f:
-                                f.seek(-8, 2)  # O Chrome armazena o tamanho total no final do arquivo
-                                total_size = int.from_bytes(f.read(8), byteorder='little')
-                                
-                            if total_size > 0:
-                                progress = int((temp_size / total_size) * 100)
-                                self.selected_tree.item(item, values=(
-                                    values[0],
-                                    f"{progress}%",
-                                    f"Baixando - {self.format_size(temp_size)}/{self.format_size(total_size)}"
-                                ))
-                            else:
-                                self.selected_tree.item(item, values=(values[0], "0%", "Iniciando..."))
-                        except:
-                            self.selected_tree.item(item, values=(values[0], "0%", "Calculando..."))
-                    elif filename not in [f[:-10] for f in crdownload_files]:  # Verifica se não há download em andamento
-                        if values[2] != "Concluído" and values[2] != "Erro":
-                            self.selected_tree.item(item, values=(values[0], "0%", "Pendente"))
-
-                time.sleep(0.5)  # Evita uso excessivo de CPU
-                
-            except Exception as e:
-                logging.error(f"Erro no monitoramento: {str(e)}")
-                time.sleep(1)
-
-    def format_size(self, size):
-        """Formata o tamanho do arquivo"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024:
-                return f"{size:.1f} {unit}"
-            size /= 1024
-        return f"{size:.1f} TB"
+        if hasattr(self, 'engine'):
+            self.engine.close_driver()
 
     def format_time(self, seconds):
         """Formata o tempo restante"""
@@ -929,26 +939,6 @@ class DownloadManager:
             minutes = int((seconds % 3600)/60)
             return f"{hours}h {minutes}m"
 
-    def get_total_size(self, filename):
-        """Tenta obter o tamanho total do arquivo"""
-        try:
-            file_path = os.path.join(self.downloads_folder, filename)
-            temp_path = file_path + '.crdownload'
-            
-            # Tenta ler o tamanho do arquivo temporário
-            if os.path.exists(temp_path):
-                with open(temp_path, 'rb') as f:
-                    f.seek(-8, 2)  # Chrome stores file size at the end
-                    return int.from_bytes(f.read(8), byteorder='little')
-            
-            # Se o arquivo já existe, usa seu tamanho
-            if os.path.exists(file_path):
-                return os.path.getsize(file_path)
-                
-        except:
-            pass
-        return None
-
 if __name__ == "__main__":
     try:
         root = tk.Tk()
@@ -0,0 +1,146 @@
+import hashlib
+import http.server
+import threading
+import urllib.parse
+
+
+class LocalHandler(http.server.BaseHTTPRequestHandler):
+    """Responde às rotas do LocalServer com HTTP/1.1 e keep-alive"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.route()
+
+    def do_GET(self):
+        self.route()
+
+    def route(self):
+        server = self.server.owner
+        path = urllib.parse.urlsplit(self.path).path
+        with server.lock:
+            server.requests.append((self.command, path, self.headers, self.client_address[1]))
+            content = server.files.get(path)
+        if content is not None:
+            self.send_file(server, path, content)
+        elif path == "/chunked":
+            self.send_chunked([b"primeira parte, ", b"segunda parte"])
+        elif path == "/close":
+            self.send_until_close(b"corpo delimitado pelo fechamento da conexao")
+        elif path == "/empty":
+            self.send_response(204)
+            self.end_headers()
+        elif path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/cookie")
+            self.send_header("Set-Cookie", "sessao=abc123; Path=/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif path == "/cookie":
+            self.send_body(self.headers.get("Cookie", "").encode())
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def send_body(self, body, status=200, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_file(self, server, path, content):
+        etag = server.etag(path)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+        requested = self.headers.get("Range", "")
+        if_range = self.headers.get("If-Range")
+        if not requested.startswith("bytes=") or (if_range and if_range != etag):
+            self.send_body(content, headers=headers)
+            return
+        first, _, last = requested[len("bytes="):].partition("-")
+        start = int(first)
+        end = min(int(last) + 1 if last else len(content), len(content))
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(content)}"
+        self.send_body(content[start:end], status=206, headers=headers)
+
+    def send_chunked(self, parts):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Trailer", "X-Checksum")
+        self.end_headers()
+        for part in parts:
+            self.wfile.write(f"{len(part):x}\r\n".encode() + part + b"\r\n")
+        self.wfile.write(b"0\r\nX-Checksum: " + hashlib.md5(b"".join(parts)).hexdigest().encode() + b"\r\n\r\n")
+
+    def send_until_close(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+
+class QuietServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Os testes interrompem transferências no meio; a conexão fechada não é erro
+        pass
+
+
+class LocalServer:
+    """Servidor HTTP local, em uma thread, para os testes que precisam de rede.
+
+    Serve os arquivos de files com ETag, Range/If-Range e If-None-Match, além
+    de rotas fixas: /chunked (com trailers), /close (corpo até o fechamento
+    da conexão), /empty (204), /redirect (define um cookie e redireciona
+    para /cookie, que devolve o cabeçalho Cookie recebido). Cada requisição
+    fica registrada em requests como (método, caminho, cabeçalhos, porta do
+    cliente).
+    """
+
+    def __init__(self, files=None):
+        self.files = dict(files or {})
+        self.requests = []
+        self.lock = threading.Lock()
+        self.httpd = QuietServer(("127.0.0.1", 0), LocalHandler)
+        self.httpd.owner = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05},
+                                       daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    def etag(self, path):
+        with self.lock:
+            return '"' + hashlib.md5(self.files[path]).hexdigest() + '"'
+
+    def set_file(self, path, content):
+        with self.lock:
+            self.files[path] = content
+
+    def requests_for(self, path, method="GET"):
+        with self.lock:
+            return [r for r in self.requests if r[1] == path and r[0] == method]
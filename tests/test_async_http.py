@@ -0,0 +1,151 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from download_engine import (
+    AsyncConnectionPool, AsyncHttpDownloader, HttpDownloader, NotModified, connection_key
+)
+from local_server import LocalServer
+
+CONTENT = os.urandom(1000)
+
+
+class AsyncHttpTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({"/a.bin": CONTENT})
+        self.server.__enter__()
+        self.key = connection_key(self.server.url("/"))
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def run_client(self, scenario):
+        """Executa scenario(downloader, pool) em um laço novo e fecha o pool no fim"""
+        async def main():
+            pool = AsyncConnectionPool(max_per_host=4, max_total=8)
+            try:
+                return await scenario(AsyncHttpDownloader(HttpDownloader(), pool), pool)
+            finally:
+                pool.close()
+        return asyncio.run(main())
+
+    async def read_all(self, response):
+        body = b""
+        while True:
+            chunk = await response.read()
+            if not chunk:
+                return body
+            body += chunk
+
+    def ports(self):
+        return [port for _, _, _, port in self.server.requests]
+
+    def test_content_length_body_returns_connection(self):
+        async def scenario(downloader, pool):
+            response = await downloader.open(self.server.url("/a.bin"))
+            self.assertEqual(await self.read_all(response), CONTENT)
+            self.assertTrue(response.finished and response.keep_alive)
+            response.close()
+            self.assertEqual(len(pool.idle[self.key]), 1)
+            response = await downloader.open(self.server.url("/a.bin"))
+            self.assertEqual(await self.read_all(response), CONTENT)
+            response.close()
+        self.run_client(scenario)
+        self.assertEqual(len(set(self.ports())), 1)
+
+    def test_chunked_body_skips_trailers(self):
+        async def scenario(downloader, pool):
+            response = await downloader.open(self.server.url("/chunked"))
+            self.assertEqual(await self.read_all(response), b"primeira parte, segunda parte")
+            self.assertTrue(response.finished and response.keep_alive)
+            response.close()
+            # Os trailers foram consumidos: a próxima resposta começa no lugar certo
+            response = await downloader.open(self.server.url("/a.bin"))
+            self.assertEqual(response.status, 200)
+            self.assertEqual(await self.read_all(response), CONTENT)
+            response.close()
+        self.run_client(scenario)
+        self.assertEqual(len(set(self.ports())), 1)
+
+    def test_close_delimited_body_is_not_reused(self):
+        async def scenario(downloader, pool):
+            response = await downloader.open(self.server.url("/close"))
+            self.assertFalse(response.keep_alive)
+            self.assertEqual(await self.read_all(response), b"corpo delimitado pelo fechamento da conexao")
+            self.assertTrue(response.finished)
+            response.close()
+            self.assertFalse(pool.idle.get(self.key))
+        self.run_client(scenario)
+
+    def test_responses_without_body(self):
+        async def scenario(downloader, pool):
+            response = await downloader.open(self.server.url("/empty"))
+            self.assertEqual(response.status, 204)
+            self.assertTrue(response.finished)
+            self.assertEqual(await response.read(), b"")
+            response.close()
+
+            response = await downloader.open(self.server.url("/a.bin"), method="HEAD")
+            self.assertEqual(response.headers["Content-Length"], str(len(CONTENT)))
+            self.assertTrue(response.finished)
+            response.close()
+
+            response = await downloader.open(self.server.url("/a.bin"),
+                                             headers={"If-None-Match": self.server.etag("/a.bin")})
+            self.assertEqual(response.status, 304)
+            self.assertTrue(response.finished)
+            response.close()
+
+            self.assertEqual(len(pool.idle[self.key]), 1)
+            response = await downloader.open(self.server.url("/a.bin"))
+            self.assertEqual(await self.read_all(response), CONTENT)
+            response.close()
+        self.run_client(scenario)
+        self.assertEqual(len(set(self.ports())), 1)
+
+    def test_discard_reuses_only_finished_responses(self):
+        async def scenario(downloader, pool):
+            response = await downloader.open(self.server.url("/a.bin"))
+            await response.discard()
+            self.assertEqual(len(pool.idle[self.key]), 1)
+
+            # Um corpo em partes de tamanho desconhecido não é lido só para reaproveitar a conexão
+            response = await downloader.open(self.server.url("/chunked"))
+            await response.discard()
+            self.assertFalse(response.finished)
+            self.assertFalse(pool.idle.get(self.key))
+        self.run_client(scenario)
+
+    def test_redirect_keeps_cookie_and_connection(self):
+        async def scenario(downloader, pool):
+            response = await downloader.open(self.server.url("/redirect"))
+            self.assertEqual(response.url, self.server.url("/cookie"))
+            self.assertEqual(await self.read_all(response), b"sessao=abc123")
+            response.close()
+            self.assertIn("sessao", [cookie.name for cookie in downloader.session.cookie_jar])
+        self.run_client(scenario)
+        self.assertEqual([path for _, path, _, _ in self.server.requests], ["/redirect", "/cookie"])
+        self.assertEqual(len(set(self.ports())), 1)
+
+    def test_download_with_validators(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, "a.bin")
+            validators = {}
+
+            async def scenario(downloader, pool):
+                received = await downloader.download(self.server.url("/a.bin"), file_path, validators=validators)
+                self.assertEqual(received, len(CONTENT))
+                with self.assertRaises(NotModified):
+                    await downloader.download(self.server.url("/a.bin"), file_path, validators=dict(validators))
+            self.run_client(scenario)
+
+            with open(file_path, 'rb') as f:
+                self.assertEqual(f.read(), CONTENT)
+            self.assertEqual(validators["etag"], self.server.etag("/a.bin"))
+            self.assertEqual(validators["size"], len(CONTENT))
+            self.assertFalse(os.path.exists(file_path + '.part'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import download_engine
+from download_engine import ADAPT_INTERVAL, ConcurrencyController, DownloadEngine
+
+
+def close_window(controller, transferred, active):
+    """Encerra a janela de medição atual sem esperar ADAPT_INTERVAL"""
+    controller.last_time -= ADAPT_INTERVAL
+    return controller.update(transferred, active)
+
+
+class ConcurrencyControllerTest(unittest.TestCase):
+    def test_grows_when_slots_were_full_during_window(self):
+        controller = ConcurrencyController(1, 8, 1)
+        controller.update(0, 0)
+        # O agendador só chama update depois de retirar o download que terminou
+        controller.occupy(1)
+        self.assertTrue(close_window(controller, 100000, 0))
+        self.assertEqual(controller.limit, 2)
+        controller.occupy(2)
+        self.assertTrue(close_window(controller, 300000, 1))
+        self.assertEqual(controller.limit, 3)
+
+    def test_keeps_limit_when_slots_were_not_full(self):
+        controller = ConcurrencyController(1, 8, 4)
+        controller.update(0, 0)
+        controller.occupy(2)
+        self.assertFalse(close_window(controller, 100000, 1))
+        self.assertEqual(controller.limit, 4)
+
+    def test_peak_is_reset_after_each_window(self):
+        controller = ConcurrencyController(1, 8, 2)
+        controller.update(0, 0)
+        controller.occupy(2)
+        close_window(controller, 100000, 0)
+        self.assertEqual(controller.limit, 3)
+        self.assertFalse(close_window(controller, 1000000, 1))
+        self.assertEqual(controller.limit, 3)
+
+    def test_throttle_halves_limit(self):
+        controller = ConcurrencyController(1, 32, 16)
+        controller.update(0, 0)
+        controller.throttle()
+        self.assertTrue(close_window(controller, 100000, 16))
+        self.assertEqual(controller.limit, 8)
+
+    def test_limit_respects_ceiling(self):
+        controller = ConcurrencyController(1, 32, 16)
+        controller.update(0, 0)
+        controller.last_time -= ADAPT_INTERVAL
+        controller.update(100000, 16, ceiling=4)
+        self.assertEqual(controller.limit, 4)
+
+
+class AutoConcurrencyBatchTest(unittest.TestCase):
+    def test_thread_batch_raises_limit_while_downloads_finish(self):
+        """Downloads que terminam a todo momento não podem travar o limite no valor inicial"""
+        with tempfile.TemporaryDirectory() as folder:
+            engine = DownloadEngine(folder, headless=True)
+            lock = threading.Lock()
+            state = {"active": 0, "peak": 0}
+
+            def fake_download(link, link_text=None):
+                with lock:
+                    state["active"] += 1
+                    state["peak"] = max(state["peak"], state["active"])
+                time.sleep(0.02)
+                with lock:
+                    state["active"] -= 1
+                    engine.bandwidth.transferred += 10000
+                return "downloaded"
+
+            jobs = [(f"http://example.com/f{i}.bin", None) for i in range(150)]
+            with mock.patch.object(download_engine, "ADAPT_INTERVAL", 0.1), \
+                    mock.patch.object(engine, "process_single_download", fake_download):
+                result = engine.run_downloads(jobs, 1, max_per_host=8, auto_concurrency=8)
+            engine.close()
+        self.assertEqual(result, (150, 0, 0))
+        self.assertGreaterEqual(state["peak"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import tempfile
+import unittest
+
+from download_engine import DownloadEngine, numbered_filename, qualified_filename
+
+
+class UniqueFilenamesTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.engine = DownloadEngine(self.folder.name, headless=True)
+
+    def tearDown(self):
+        self.engine.close()
+        self.folder.cleanup()
+
+    def test_helpers(self):
+        self.assertEqual(qualified_filename("http://h/docs/v2/a.pdf", "a.pdf"), "docs_v2_a.pdf")
+        self.assertEqual(qualified_filename("http://h/a.pdf", "a.pdf"), "a.pdf")
+        self.assertEqual(numbered_filename("a.tar.gz", 2), "a.tar (2).gz")
+
+    def test_shortest_path_keeps_original_name(self):
+        links = ["http://h/sub/small0.pdf", "http://h/small0.pdf", "http://h/other.pdf"]
+        self.engine.assign_unique_filenames(links)
+        self.assertEqual(self.engine.filename_for("http://h/small0.pdf"), "small0.pdf")
+        self.assertEqual(self.engine.filename_for("http://h/sub/small0.pdf"), "sub_small0.pdf")
+        self.assertEqual(self.engine.filename_for("http://h/other.pdf"), "other.pdf")
+
+    def test_same_path_gets_number(self):
+        links = ["http://h/dl?id=1", "http://h/dl?id=2"]
+        for link in links:
+            self.engine.link_filenames[link] = "report.pdf"
+        self.engine.assign_unique_filenames(links)
+        names = {self.engine.filename_for(link) for link in links}
+        self.assertEqual(names, {"report.pdf", "report (2).pdf"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import tempfile
+import unittest
+import zlib
+
+from download_engine import ContentHasher, DownloadEngine, parse_checksums
+from local_server import LocalServer
+
+FIRST = os.urandom(50000)
+SECOND = os.urandom(30000)
+
+
+class ContentHasherTest(unittest.TestCase):
+    def test_incremental_update_matches_whole_content(self):
+        hasher = ContentHasher(fast=True)
+        for start in range(0, len(FIRST), 4096):
+            hasher.update(FIRST[start:start + 4096])
+        self.assertEqual(hasher.hexdigest(), hashlib.sha256(FIRST).hexdigest())
+        self.assertEqual(hasher.fast_digest(), f"{zlib.crc32(FIRST):08x}")
+        self.assertEqual(hasher.size, len(FIRST))
+
+    def test_update_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "a.bin")
+            with open(path, 'wb') as f:
+                f.write(FIRST)
+            hasher = ContentHasher().update_file(path)
+        self.assertEqual(hasher.hexdigest(), hashlib.sha256(FIRST).hexdigest())
+        self.assertIsNone(hasher.fast_digest())
+
+    def test_parse_checksums_formats(self):
+        first, second = hashlib.sha256(FIRST).hexdigest(), hashlib.sha256(SECOND).hexdigest()
+        text = "\n".join([
+            f"{first}  a.bin",
+            f"{second.upper()} *dir/b.bin",
+            f"SHA256 (c.bin) = {first}",
+            "linha que não é checksum",
+        ])
+        self.assertEqual(parse_checksums(text), {"a.bin": first, "b.bin": second, "c.bin": first})
+
+
+class ContentCheckTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.server = LocalServer({"/a.bin": FIRST, "/b.bin": SECOND, "/copia.bin": FIRST})
+        self.server.__enter__()
+        self.engine = DownloadEngine(self.folder.name, headless=True, browser_fallback=False)
+        self.engine.open_history()
+
+    def tearDown(self):
+        self.engine.close()
+        self.server.__exit__(None, None, None)
+        self.folder.cleanup()
+
+    def path(self, filename):
+        return os.path.join(self.folder.name, filename)
+
+    def test_checksum_mismatch_deletes_only_new_download(self):
+        with open(self.path("anterior.bin"), 'wb') as f:
+            f.write(SECOND)
+        checksums = (f"{hashlib.sha256(FIRST).hexdigest()}  a.bin\n"
+                     f"{hashlib.sha256(b'outro conteudo').hexdigest()}  b.bin\n")
+        self.server.set_file("/SHA256SUMS", checksums.encode())
+        self.assertEqual(self.engine.load_checksums(self.server.url("/SHA256SUMS")), 2)
+
+        jobs = [(self.server.url("/a.bin"), None), (self.server.url("/b.bin"), None)]
+        self.assertEqual(self.engine.run_downloads(jobs, 2), (1, 0, 1))
+        self.assertTrue(os.path.exists(self.path("a.bin")))
+        self.assertFalse(os.path.exists(self.path("b.bin")))
+        self.assertTrue(os.path.exists(self.path("anterior.bin")))
+        entry = self.engine.latest_entry(self.server.url("/b.bin"), "b.bin")
+        self.assertEqual(entry["status"], "Erro: checksum não confere")
+
+    def test_duplicate_content_is_hardlinked(self):
+        jobs = [(self.server.url("/a.bin"), None), (self.server.url("/copia.bin"), None)]
+        self.assertEqual(self.engine.run_downloads(jobs, 1), (2, 0, 0))
+        self.assertEqual(os.stat(self.path("a.bin")).st_ino, os.stat(self.path("copia.bin")).st_ino)
+
+    def test_known_url_under_new_name_is_linked_without_download(self):
+        url = self.server.url("/a.bin")
+        self.assertEqual(self.engine.run_downloads([(url, None)], 1), (1, 0, 0))
+        # O servidor passou a sugerir outro nome para o mesmo link
+        self.engine.link_filenames[url] = "renomeado.bin"
+        self.assertEqual(self.engine.run_downloads([(url, None)], 1), (0, 1, 0))
+        self.assertEqual(os.stat(self.path("a.bin")).st_ino, os.stat(self.path("renomeado.bin")).st_ino)
+        self.assertEqual(len(self.server.requests_for("/a.bin")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
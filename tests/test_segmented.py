@@ -0,0 +1,199 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from download_engine import (
+    MIN_SEGMENT_SIZE, ConnectionPool, DownloadCancelled, HttpDownloader, Segment, SegmentedTransfer,
+    TransferJournal
+)
+from local_server import LocalServer
+
+MB = 1024 * 1024
+
+
+class FakeResponse:
+    """Resposta 206 que entrega o corpo em blocos e chama on_read a cada leitura"""
+
+    def __init__(self, body, status=206, block=10, on_read=None):
+        self.body = body
+        self.status = status
+        self.block = block
+        self.on_read = on_read
+        self.reads = 0
+
+    def read(self, amount=None):
+        if self.on_read:
+            self.on_read(self.reads)
+        self.reads += 1
+        data, self.body = self.body[:self.block], self.body[self.block:]
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeDownloader:
+    def __init__(self, response):
+        self.response = response
+        self.headers = None
+
+    def open(self, url, headers=None):
+        self.headers = headers
+        return self.response
+
+
+def stop_after(calls):
+    """should_stop que interrompe a transferência depois de algumas consultas"""
+    lock = threading.Lock()
+    count = [0]
+
+    def should_stop():
+        with lock:
+            count[0] += 1
+            return count[0] > calls
+    return should_stop
+
+
+class TransferJournalTest(unittest.TestCase):
+    def test_add_range_merges_adjacent_and_overlapping(self):
+        journal = TransferJournal("x.part", "http://h/x", 100)
+        journal.add_range(20, 30)
+        journal.add_range(0, 10)
+        journal.add_range(10, 20)
+        self.assertEqual(journal.ranges, [[0, 30]])
+        journal.add_range(25, 40)
+        journal.add_range(60, 70)
+        journal.add_range(50, 50)
+        self.assertEqual(journal.ranges, [[0, 40], [60, 70]])
+        self.assertEqual(journal.completed_bytes(), 50)
+
+    def test_missing_ranges(self):
+        journal = TransferJournal("x.part", "http://h/x", 100, ranges=[[50, 60], [10, 20]])
+        self.assertEqual(journal.missing_ranges(), [(0, 10), (20, 50), (60, 100)])
+        journal.ranges = [[0, 100]]
+        self.assertEqual(journal.missing_ranges(), [])
+
+    def test_matches_rejects_changed_validators(self):
+        journal = TransferJournal("x.part", "http://h/x", 100, etag='"a"')
+        info = {"size": 100, "accept_ranges": True, "etag": '"a"', "last_modified": None}
+        self.assertTrue(journal.matches("http://h/x", info))
+        self.assertFalse(journal.matches("http://h/x", dict(info, etag='"b"')))
+        self.assertFalse(journal.matches("http://h/x", dict(info, size=101)))
+        self.assertFalse(journal.matches("http://h/x", dict(info, accept_ranges=False)))
+
+
+class SegmentedTransferTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.folder.name, "arquivo.bin")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def make_transfer(self, size, downloader=None, connections=2, etag='"v1"'):
+        journal = TransferJournal(self.file_path + '.part', "http://h/x", size, etag=etag)
+        with open(journal.temp_path, 'wb') as f:
+            f.truncate(size)
+        return SegmentedTransfer(downloader, "http://h/x", self.file_path, journal, connections)
+
+    def test_next_segment_steals_half_of_largest_remaining(self):
+        transfer = self.make_transfer(8 * MB)
+        transfer.pending = [Segment(0, 8 * MB)]
+        first = transfer.next_segment()
+        self.assertEqual((first.start, first.end), (0, 8 * MB))
+        first.position = 2 * MB
+        stolen = transfer.next_segment()
+        self.assertEqual((stolen.start, stolen.end), (5 * MB, 8 * MB))
+        self.assertEqual(first.end, 5 * MB)
+
+    def test_next_segment_does_not_split_small_remainder(self):
+        transfer = self.make_transfer(8 * MB)
+        transfer.pending = [Segment(0, 8 * MB)]
+        first = transfer.next_segment()
+        first.position = 8 * MB - 2 * MIN_SEGMENT_SIZE + 1
+        self.assertIsNone(transfer.next_segment())
+
+    def test_fetch_stops_at_shrunk_segment_end(self):
+        body = bytes(range(100))
+        segment = Segment(0, 100)
+
+        def shrink(reads):
+            # Outra conexão roubou o fim da faixa durante a transferência
+            if reads == 1:
+                segment.end = 25
+
+        downloader = FakeDownloader(FakeResponse(body, on_read=shrink))
+        transfer = self.make_transfer(100, downloader)
+        transfer.fetch(segment)
+        self.assertEqual(downloader.headers["Range"], "bytes=0-99")
+        self.assertEqual(downloader.headers["If-Range"], '"v1"')
+        self.assertEqual(segment.written, 25)
+        with open(transfer.temp_path, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data[:25], body[:25])
+        self.assertEqual(data[25:], bytes(75))
+
+    def test_fetch_rejects_full_response_to_if_range(self):
+        downloader = FakeDownloader(FakeResponse(bytes(100), status=200))
+        transfer = self.make_transfer(100, downloader)
+        with self.assertRaisesRegex(IOError, "O servidor ignorou o cabeçalho Range"):
+            transfer.fetch(Segment(0, 100))
+
+
+class SegmentedResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.folder.name, "grande.bin")
+        self.content = os.urandom(6 * MB)
+        self.server = LocalServer({"/grande.bin": self.content}).__enter__()
+        self.url = self.server.url("/grande.bin")
+        self.downloader = HttpDownloader(pool=ConnectionPool())
+
+    def tearDown(self):
+        self.downloader.pool.close()
+        self.server.__exit__(None, None, None)
+        self.folder.cleanup()
+
+    def interrupted_download(self):
+        with self.assertRaises(DownloadCancelled):
+            self.downloader.download(self.url, self.file_path, should_stop=stop_after(10), connections=3)
+        journal = TransferJournal.load(self.file_path + '.part')
+        self.assertIsNotNone(journal)
+        self.assertGreater(journal.completed_bytes(), 0)
+        self.assertLess(journal.completed_bytes(), len(self.content))
+        return journal
+
+    def test_resumes_stopped_transfer(self):
+        journal = self.interrupted_download()
+        before = len(self.server.requests_for("/grande.bin"))
+        received = self.downloader.download(self.url, self.file_path, connections=3)
+        self.assertEqual(received, len(self.content))
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.path.exists(journal.path))
+        self.assertFalse(os.path.exists(journal.temp_path))
+        # A retomada só pede as faixas que faltavam
+        requested = 0
+        for _, _, headers, _ in self.server.requests_for("/grande.bin")[before:]:
+            self.assertEqual(headers["If-Range"], journal.etag)
+            first, last = headers["Range"][len("bytes="):].split("-")
+            requested += int(last) + 1 - int(first)
+        self.assertEqual(requested, len(self.content) - journal.completed_bytes())
+
+    def test_changed_etag_discards_partial_file(self):
+        self.interrupted_download()
+        new_content = os.urandom(len(self.content))
+        self.server.set_file("/grande.bin", new_content)
+        received = self.downloader.download(self.url, self.file_path, connections=3)
+        self.assertEqual(received, len(new_content))
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(f.read(), new_content)
+        self.assertFalse(os.path.exists(self.file_path + '.part.json'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from download_manager import STARTUP_BUDGET_MS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importa os módulos em um processo novo e relata o tempo e os módulos carregados
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import download_manager, download_engine
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({
+    "elapsed_ms": elapsed,
+    "selenium": "selenium" in sys.modules,
+    "webdriver_manager": "webdriver_manager" in sys.modules,
+}))
+"""
+
+
+class StartupImportTest(unittest.TestCase):
+    def test_import_does_not_load_browser_modules(self):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT],
+            cwd=ROOT, capture_output=True, text=True, timeout=60
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertFalse(report["selenium"])
+        self.assertFalse(report["webdriver_manager"])
+        self.assertLess(report["elapsed_ms"], STARTUP_BUDGET_MS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from download_engine import DownloadEngine
+from local_server import LocalServer
+
+FILES = {f"/arquivo{i}.bin": os.urandom(20000 + i) for i in range(3)}
+
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.server = LocalServer(FILES)
+        self.server.__enter__()
+        self.events = []
+        self.engine = DownloadEngine(self.folder.name, on_event=self.events.append, headless=True,
+                                     browser_fallback=False)
+        self.engine.open_history()
+        self.jobs = [(self.server.url(path), None) for path in FILES]
+
+    def tearDown(self):
+        self.engine.close()
+        self.server.__exit__(None, None, None)
+        self.folder.cleanup()
+
+    def history_rows(self):
+        self.engine.history_store.flush()
+        return [entry for page in self.engine.history_store.iter_pages() for entry in page]
+
+    def sync(self):
+        """Sincroniza o lote e retorna o resumo do evento "finished" como (novos, alterados, inalterados)"""
+        self.engine.run_downloads(self.jobs, 2, sync=True)
+        finished = [event for event in self.events if event["event"] == "finished"][-1]
+        return finished["new"], finished["changed"], finished["unchanged"]
+
+    def entry(self, path):
+        return self.engine.latest_entry(self.server.url(path), os.path.basename(path))
+
+    def test_sync_downloads_only_changed_files(self):
+        self.assertEqual(self.engine.run_downloads(self.jobs, 2), (3, 0, 0))
+        rows = self.history_rows()
+        ids = {path: self.entry(path)["id"] for path in FILES}
+
+        self.assertEqual(self.sync(), (0, 0, 3))
+        self.assertEqual(len(self.history_rows()), len(rows))
+        for path in FILES:
+            entry = self.entry(path)
+            self.assertEqual(entry["status"], "Inalterado")
+            self.assertEqual(entry["id"], ids[path])
+            # A requisição foi condicional e o servidor respondeu 304
+            self.assertEqual(self.server.requests_for(path)[-1][2]["If-None-Match"], self.server.etag(path))
+
+        changed = "/arquivo1.bin"
+        new_content = os.urandom(len(FILES[changed]))
+        self.server.set_file(changed, new_content)
+        self.assertEqual(self.sync(), (0, 1, 2))
+        self.assertEqual(len(self.history_rows()), len(rows))
+        self.assertEqual(self.entry(changed)["status"], "Concluído")
+        self.assertEqual(self.entry(changed)["id"], ids[changed])
+        with open(os.path.join(self.folder.name, "arquivo1.bin"), 'rb') as f:
+            self.assertEqual(f.read(), new_content)
+
+    def test_sync_counts_missing_files_as_new(self):
+        self.assertEqual(self.engine.run_downloads(self.jobs[:2], 2), (2, 0, 0))
+        self.assertEqual(self.sync(), (1, 0, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()